@@ -2,12 +2,15 @@
 import pandas as pd
 import asyncio
 import os
+from decimal import Decimal
+from typing import Dict, NamedTuple
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from datetime import datetime, timedelta
-from sqlalchemy import func
+from sqlalchemy import case, func
 from server.models import User, Task, TaskStatus, WalletTransaction
-from server.database import get_session
+from server.database import get_session, async_session
+from server.services.reference_data import reference_data, TaskTypeId
 
 async def export_tables_to_excel():
     print("Текущая рабочая директория:", os.getcwd())
@@ -60,213 +63,139 @@ async def export_tables_to_excel():
         print("Экспорт таблиц завершен.")
 
 
-async def get_user_statistics():
-    async for session in get_session():
-        # Общее количество пользователей
-        total_users = await session.execute(select(func.count(User.id)))
-        total_users_count = total_users.scalar()
-
-        # Количество пользователей, присоединившихся за последние сутки
-        one_day_ago = datetime.utcnow() - timedelta(days=1)
-        recent_users = await session.execute(
-            select(func.count(User.id)).where(User.created_at >= one_day_ago)
-        )
-        recent_users_count = recent_users.scalar()
-
-        # Количество премиум пользователей
-        premium_users = await session.execute(
-            select(func.count(User.id)).where(User.is_premium == True)
-        )
-        premium_users_count = premium_users.scalar()
-
-        # Количество пользователей с языком 'RU'
-        ru_users = await session.execute(
-            select(func.count(User.id)).where(User.language_code == 'RU')
-        )
-        ru_users_count = ru_users.scalar()
-
-        # Количество пользователей с языком 'EN'
-        en_users = await session.execute(
-            select(func.count(User.id)).where(User.language_code == 'EN')
-        )
-        en_users_count = en_users.scalar()
-
-        # Количество пользователей, пришедших по реферальной ссылке
-        referral_users = await session.execute(
-            select(func.count(User.id)).where(User.referral_id != None)
-        )
-        referral_users_count = referral_users.scalar()
-
-    return {
-        'total_users': total_users_count,
-        'recent_users': recent_users_count,
-        'premium_users': premium_users_count,
-        'ru_users': ru_users_count,
-        'en_users': en_users_count,
-        'referral_users': referral_users_count
-    }
-
-async def get_task_statistics():
-    async for session in get_session():
-        # Общее количество задач
-        total_tasks = await session.execute(select(func.count(Task.id)))
-        total_tasks_count = total_tasks.scalar()
-
-        # Количество задач по статусам
-        status_counts = await session.execute(
-            select(TaskStatus.status, func.count(Task.id))
-            .join(Task, Task.status_id == TaskStatus.id)
-            .group_by(TaskStatus.status)
-        )
-        status_counts_result = status_counts.all()
-        task_statuses = {status: count for status, count in status_counts_result}
-
-        # Количество задач типа 'Bot' (id=1)
-        tasks_type1 = await session.execute(
-            select(func.count(Task.id)).where(Task.task_type_id == 1)
-        )
-        tasks_type1_count = tasks_type1.scalar()
-
-        # Количество задач типа 'Subscribe to Channel' (id=2)
-        tasks_type2 = await session.execute(
-            select(func.count(Task.id)).where(Task.task_type_id == 2)
-        )
-        tasks_type2_count = tasks_type2.scalar()
-
-    return {
-        'total_tasks': total_tasks_count,
-        'task_statuses': task_statuses,
-        'tasks_type1': tasks_type1_count,
-        'tasks_type2': tasks_type2_count
-    }
-
-async def get_wallet_statistics():
-    async for session in get_session():
-        one_day_ago = datetime.utcnow() - timedelta(days=1)
-
-        # Общее количество транзакций
-        total_transactions = await session.execute(select(func.count(WalletTransaction.id)))
-        total_transactions_count = total_transactions.scalar()
-
-        # Количество транзакций за последние сутки
-        recent_transactions = await session.execute(
-            select(func.count(WalletTransaction.id))
-            .where(WalletTransaction.created_at >= one_day_ago)
-        )
-        recent_transactions_count = recent_transactions.scalar()
-
-        # Количество депозитов (только со статусом 'completed')
-        deposit_transactions = await session.execute(
-            select(func.count(WalletTransaction.id))
-            .where(
-                WalletTransaction.transaction_type == 'deposit',
-                WalletTransaction.status == 'completed'
+class UserStatistics(NamedTuple):
+    total_users: int
+    recent_users: int
+    premium_users: int
+    ru_users: int
+    en_users: int
+    referral_users: int
+
+
+class TaskStatistics(NamedTuple):
+    total_tasks: int
+    # Название статуса -> количество задач
+    task_statuses: Dict[str, int]
+    tasks_type1: int
+    tasks_type2: int
+
+
+class WalletStatistics(NamedTuple):
+    total_transactions: int
+    recent_transactions: int
+    deposit_transactions: int
+    recent_deposit_transactions: int
+    withdrawal_transactions: int
+    recent_withdrawal_transactions: int
+    total_amount_deposited: Decimal
+    recent_total_amount_deposited: Decimal
+    total_amount_withdrawn: Decimal
+    recent_total_amount_withdrawn: Decimal
+    transaction_statuses: Dict[str, int]
+    recent_transaction_statuses: Dict[str, int]
+
+
+class Statistics(NamedTuple):
+    users: UserStatistics
+    tasks: TaskStatistics
+    wallet: WalletStatistics
+
+
+def _count_if(condition):
+    # Условная агрегация: все метрики таблицы считаются за один проход
+    return func.sum(case((condition, 1), else_=0))
+
+
+async def get_user_statistics(one_day_ago: datetime) -> UserStatistics:
+    async with async_session() as session:
+        row = (await session.execute(
+            select(
+                func.count(User.id),
+                _count_if(User.created_at >= one_day_ago),
+                _count_if(User.is_premium == True),
+                _count_if(User.language_code == 'RU'),
+                _count_if(User.language_code == 'EN'),
+                _count_if(User.referral_id != None),
             )
-        )
-        deposit_transactions_count = deposit_transactions.scalar()
-
-        # Количество депозитов за последние сутки (только со статусом 'completed')
-        recent_deposit_transactions = await session.execute(
-            select(func.count(WalletTransaction.id))
-            .where(
-                WalletTransaction.transaction_type == 'deposit',
-                WalletTransaction.status == 'completed',
-                WalletTransaction.created_at >= one_day_ago
+        )).one()
+    return UserStatistics(*(int(value or 0) for value in row))
+
+
+async def get_task_statistics() -> TaskStatistics:
+    await reference_data.ensure_loaded()
+    async with async_session() as session:
+        # Один проход по tasks: счётчики по паре (статус, тип), остальное сворачивается в Python
+        rows = (await session.execute(
+            select(Task.status_id, Task.task_type_id, func.count(Task.id))
+            .group_by(Task.status_id, Task.task_type_id)
+        )).all()
+
+    task_statuses: Dict[str, int] = {}
+    tasks_by_type: Dict[int, int] = {}
+    for status_id, task_type_id, count in rows:
+        # Названия статусов из справочника в памяти, без JOIN
+        status = reference_data.status_name(status_id) or str(status_id)
+        task_statuses[status] = task_statuses.get(status, 0) + count
+        tasks_by_type[task_type_id] = tasks_by_type.get(task_type_id, 0) + count
+    return TaskStatistics(
+        total_tasks=sum(tasks_by_type.values()),
+        task_statuses=task_statuses,
+        tasks_type1=tasks_by_type.get(TaskTypeId.BOT, 0),
+        tasks_type2=tasks_by_type.get(TaskTypeId.CHANNEL_SUBSCRIPTION, 0),
+    )
+
+
+async def get_wallet_statistics(one_day_ago: datetime) -> WalletStatistics:
+    async with async_session() as session:
+        # Один проход по wallet_transactions: по паре (статус, тип) количество и сумма, всего и за сутки
+        is_recent = WalletTransaction.created_at >= one_day_ago
+        rows = (await session.execute(
+            select(
+                WalletTransaction.status,
+                WalletTransaction.transaction_type,
+                func.count(WalletTransaction.id),
+                _count_if(is_recent),
+                func.coalesce(func.sum(WalletTransaction.amount), 0),
+                func.coalesce(func.sum(case((is_recent, WalletTransaction.amount), else_=0)), 0),
             )
-        )
-        recent_deposit_transactions_count = recent_deposit_transactions.scalar()
-
-        # Количество выводов (только со статусом 'completed')
-        withdrawal_transactions = await session.execute(
-            select(func.count(WalletTransaction.id))
-            .where(
-                WalletTransaction.transaction_type == 'withdrawal',
-                WalletTransaction.status == 'completed'
-            )
-        )
-        withdrawal_transactions_count = withdrawal_transactions.scalar()
-
-        # Количество выводов за последние сутки (только со статусом 'completed')
-        recent_withdrawal_transactions = await session.execute(
-            select(func.count(WalletTransaction.id))
-            .where(
-                WalletTransaction.transaction_type == 'withdrawal',
-                WalletTransaction.status == 'completed',
-                WalletTransaction.created_at >= one_day_ago
-            )
-        )
-        recent_withdrawal_transactions_count = recent_withdrawal_transactions.scalar()
-
-        # Общая сумма депозитов (только со статусом 'completed')
-        total_amount_deposited = await session.execute(
-            select(func.sum(WalletTransaction.amount))
-            .where(
-                WalletTransaction.transaction_type == 'deposit',
-                WalletTransaction.status == 'completed'
-            )
-        )
-        total_amount_deposited_value = total_amount_deposited.scalar() or 0
-
-        # Общая сумма депозитов за последние сутки (только со статусом 'completed')
-        recent_total_amount_deposited = await session.execute(
-            select(func.sum(WalletTransaction.amount))
-            .where(
-                WalletTransaction.transaction_type == 'deposit',
-                WalletTransaction.status == 'completed',
-                WalletTransaction.created_at >= one_day_ago
-            )
-        )
-        recent_total_amount_deposited_value = recent_total_amount_deposited.scalar() or 0
-
-        # Общая сумма выводов (только со статусом 'completed')
-        total_amount_withdrawn = await session.execute(
-            select(func.sum(WalletTransaction.amount))
-            .where(
-                WalletTransaction.transaction_type == 'withdrawal',
-                WalletTransaction.status == 'completed'
-            )
-        )
-        total_amount_withdrawn_value = total_amount_withdrawn.scalar() or 0
-
-        # Общая сумма выводов за последние сутки (только со статусом 'completed')
-        recent_total_amount_withdrawn = await session.execute(
-            select(func.sum(WalletTransaction.amount))
-            .where(
-                WalletTransaction.transaction_type == 'withdrawal',
-                WalletTransaction.status == 'completed',
-                WalletTransaction.created_at >= one_day_ago
-            )
-        )
-        recent_total_amount_withdrawn_value = recent_total_amount_withdrawn.scalar() or 0
-
-        # Количество транзакций по статусам
-        status_counts = await session.execute(
-            select(WalletTransaction.status, func.count(WalletTransaction.id))
-            .group_by(WalletTransaction.status)
-        )
-        status_counts_result = status_counts.all()
-        transaction_statuses = {status: count for status, count in status_counts_result}
-
-        # Количество транзакций по статусам за последние сутки
-        recent_status_counts = await session.execute(
-            select(WalletTransaction.status, func.count(WalletTransaction.id))
-            .where(WalletTransaction.created_at >= one_day_ago)
-            .group_by(WalletTransaction.status)
-        )
-        recent_status_counts_result = recent_status_counts.all()
-        recent_transaction_statuses = {status: count for status, count in recent_status_counts_result}
-
-    return {
-        'total_transactions': total_transactions_count,
-        'recent_transactions': recent_transactions_count,
-        'deposit_transactions': deposit_transactions_count,
-        'recent_deposit_transactions': recent_deposit_transactions_count,
-        'withdrawal_transactions': withdrawal_transactions_count,
-        'recent_withdrawal_transactions': recent_withdrawal_transactions_count,
-        'total_amount_deposited': total_amount_deposited_value,
-        'recent_total_amount_deposited': recent_total_amount_deposited_value,
-        'total_amount_withdrawn': total_amount_withdrawn_value,
-        'recent_total_amount_withdrawn': recent_total_amount_withdrawn_value,
-        'transaction_statuses': transaction_statuses,
-        'recent_transaction_statuses': recent_transaction_statuses
-    }
+            .group_by(WalletTransaction.status, WalletTransaction.transaction_type)
+        )).all()
+
+    groups = {(status, transaction_type): (int(count), int(recent or 0), Decimal(amount), Decimal(recent_amount))
+              for status, transaction_type, count, recent, amount, recent_amount in rows}
+    empty = (0, 0, Decimal(0), Decimal(0))
+    deposits = groups.get(('completed', 'deposit'), empty)
+    withdrawals = groups.get(('completed', 'withdrawal'), empty)
+
+    transaction_statuses: Dict[str, int] = {}
+    recent_transaction_statuses: Dict[str, int] = {}
+    for (status, _), (count, recent, _, _) in groups.items():
+        transaction_statuses[status] = transaction_statuses.get(status, 0) + count
+        if recent:
+            recent_transaction_statuses[status] = recent_transaction_statuses.get(status, 0) + recent
+
+    return WalletStatistics(
+        total_transactions=sum(group[0] for group in groups.values()),
+        recent_transactions=sum(group[1] for group in groups.values()),
+        deposit_transactions=deposits[0],
+        recent_deposit_transactions=deposits[1],
+        withdrawal_transactions=withdrawals[0],
+        recent_withdrawal_transactions=withdrawals[1],
+        total_amount_deposited=deposits[2],
+        recent_total_amount_deposited=deposits[3],
+        total_amount_withdrawn=withdrawals[2],
+        recent_total_amount_withdrawn=withdrawals[3],
+        transaction_statuses=transaction_statuses,
+        recent_transaction_statuses=recent_transaction_statuses,
+    )
+
+
+async def get_statistics() -> Statistics:
+    # Таблицы сканируются параллельно на отдельных соединениях: время /stat - самый медленный скан, а не их сумма
+    one_day_ago = datetime.utcnow() - timedelta(days=1)
+    users, tasks, wallet = await asyncio.gather(
+        get_user_statistics(one_day_ago),
+        get_task_statistics(),
+        get_wallet_statistics(one_day_ago),
+    )
+    return Statistics(users, tasks, wallet)
@@ -61,6 +61,8 @@ const App: React.FC = () => {
               },
             });
             console.log('Authentication response:', response.data);
+            // Сессионный токен избавляет сервер от поиска пользователя на каждый запрос
+            axios.defaults.headers.common['Authorization'] = `Bearer ${response.data.session_token}`;
             if (isMounted) {
               setUser(response.data);
               sendLog('User authenticated successfully.');
@@ -31,31 +31,35 @@ const Home: React.FC<HomeProps> = ({ user }) => {
   const balance = `${user.points} Points`;
 
   const [newsItems, setNewsItems] = useState<NewsItem[]>([]);
+  const [nextCursor, setNextCursor] = useState<string | null>(null); // Курсор следующей страницы из X-Next-Cursor
   const [selectedNewsItem, setSelectedNewsItem] = useState<NewsItem | null>(null);
   const [isModalOpen, setIsModalOpen] = useState(false);
   const [isCreateModalOpen, setIsCreateModalOpen] = useState(false);
 
   const API_BASE_URL = 'https://nollab.ru:8000';
+  const PAGE_SIZE = 20;
 
   // Список ID администраторов
   const ADMIN_IDS = [7154683616, 1801021065]; // Замените на реальные ID администраторов
   const isAdmin = ADMIN_IDS.includes(user.telegram_id);
 
-  // Функция для получения новостей с бэкенда
-  useEffect(() => {
-    const fetchNewsItems = async () => {
-      try {
-        const response = await axios.get<NewsItem[]>(`${API_BASE_URL}/api/news/get_all_news/`, {
-          headers: {
-            'X-Telegram-ID': user.telegram_id.toString(),
-          },
-        });
-        setNewsItems(response.data);
-      } catch (error) {
-        console.error('Ошибка при получении новостей:', error);
-      }
-    };
+  // Функция для получения новостей с бэкенда: без курсора - первая страница, с курсором - дописываем
+  const fetchNewsItems = async (cursor?: string) => {
+    try {
+      const response = await axios.get<NewsItem[]>(`${API_BASE_URL}/api/news/get_all_news/`, {
+        headers: {
+          'X-Telegram-ID': user.telegram_id.toString(),
+        },
+        params: { limit: PAGE_SIZE, cursor },
+      });
+      setNewsItems((prevItems) => (cursor ? [...prevItems, ...response.data] : response.data));
+      setNextCursor(response.headers['x-next-cursor'] ?? null);
+    } catch (error) {
+      console.error('Ошибка при получении новостей:', error);
+    }
+  };
 
+  useEffect(() => {
     fetchNewsItems();
   }, [user.telegram_id]);
 
@@ -229,6 +233,16 @@ const Home: React.FC<HomeProps> = ({ user }) => {
                 )}
               </div>
             ))}
+            {nextCursor && (
+              <div className="flex justify-center">
+                <button
+                  onClick={() => fetchNewsItems(nextCursor)}
+                  className="bg-gray-800 hover:bg-gray-700 text-white py-2 px-4 rounded"
+                >
+                  Load more
+                </button>
+              </div>
+            )}
           </div>
         </section>
       </div>
@@ -44,7 +44,10 @@ const MyTask: React.FC<MyTaskProps> = ({ user, updatePoints }) => {
   const [errorMessage, setErrorMessage] = useState<string | null>(null); // Состояние для хранения текста ошибки
   const [isAlertVisible, setIsAlertVisible] = useState<boolean>(false); // Состояние для видимости алерта
 
+  const [nextCursor, setNextCursor] = useState<string | null>(null); // Курсор следующей страницы из X-Next-Cursor
+
   const API_BASE_URL = 'https://nollab.ru:8000';
+  const PAGE_SIZE = 20;
 
   // Вызов функции обновления баланса при переходе на эту страницу
   useEffect(() => {
@@ -66,42 +69,47 @@ const MyTask: React.FC<MyTaskProps> = ({ user, updatePoints }) => {
       }
     }, []);
 
+  // Загрузка страницы задач: без курсора - первая страница, с курсором - дописываем к списку
+  const fetchTaskPage = async (endpoint: string, cursor?: string) => {
+    const response = await axios.get<Task[]>(`${API_BASE_URL}/api/task/${endpoint}`, {
+      headers: {
+        'ngrok-skip-browser-warning': 'true',
+        'X-Telegram-ID': user.telegram_id.toString(),
+      },
+      params: { limit: PAGE_SIZE, cursor },
+    });
+    setTasks((prevTasks) => (cursor ? [...prevTasks, ...response.data] : response.data));
+    setNextCursor(response.headers['x-next-cursor'] ?? null);
+  };
+
   // Функция для загрузки активных задач пользователя
-  const fetchActiveTasks = async () => {
+  const fetchActiveTasks = async (cursor?: string) => {
     try {
-      const response = await axios.get<Task[]>(
-        `${API_BASE_URL}/api/task/get_active_tasks`,
-        {
-          headers: {
-            'ngrok-skip-browser-warning': 'true',
-            'X-Telegram-ID': user.telegram_id.toString(),
-          },
-        }
-      );
-      setTasks(response.data);
+      await fetchTaskPage('get_active_tasks', cursor);
     } catch (error) {
       console.error('Ошибка при получении активных задач:', error);
     }
   };
 
   // Функция для загрузки архивных задач пользователя
-  const fetchArchivedTasks = async () => {
+  const fetchArchivedTasks = async (cursor?: string) => {
     try {
-      const response = await axios.get<Task[]>(
-        `${API_BASE_URL}/api/task/get_archived_tasks`,
-        {
-          headers: {
-            'ngrok-skip-browser-warning': 'true',
-            'X-Telegram-ID': user.telegram_id.toString(),
-          },
-        }
-      );
-      setTasks(response.data);
+      await fetchTaskPage('get_archived_tasks', cursor);
     } catch (error) {
       console.error('Ошибка при получении архивных задач:', error);
     }
   };
 
+  // Следующая страница текущего списка
+  const loadMoreTasks = () => {
+    if (!nextCursor) return;
+    if (isArchivedView) {
+      fetchArchivedTasks(nextCursor);
+    } else {
+      fetchActiveTasks(nextCursor);
+    }
+  };
+
   // Функция для завершения задачи
   const handleFinishTask = async (taskId: number) => {
     const isConfirmed = window.confirm(
@@ -131,6 +139,7 @@ const MyTask: React.FC<MyTaskProps> = ({ user, updatePoints }) => {
   useEffect(() => {
     // Очищаем задачи при изменении вида
     setTasks([]);
+    setNextCursor(null);
     if (!isArchivedView) {
       fetchActiveTasks(); // Загрузить активные задачи при загрузке страницы
     } else {
@@ -409,6 +418,16 @@ const MyTask: React.FC<MyTaskProps> = ({ user, updatePoints }) => {
                   )}
                 </div>
               ))}
+              {nextCursor && (
+                <div className="flex justify-center">
+                  <button
+                    className="bg-gray-200 dark:bg-gray-800 border border-black dark:border-white px-4 py-2 rounded hover:bg-yellow-500 transition text-black dark:text-white"
+                    onClick={loadMoreTasks}
+                  >
+                    Load more
+                  </button>
+                </div>
+              )}
             </div>
           )}
         </div>
@@ -2,11 +2,14 @@ import asyncio
 from server.database import engine, async_session  
 from server.models import Base
 from server.models import User, Language, TaskType, Task, TaskStatus, Referral, WalletTransaction, Log, BotText, TaskClick   # Import all your models
+from server.migrations import stamp_head
 
 async def recreate_database():
     async with engine.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
         await conn.run_sync(Base.metadata.create_all)
+    # Свежая схема уже содержит все индексы из миграций
+    await stamp_head(engine)
     
     async with async_session() as session:
         async with session.begin():
@@ -0,0 +1,105 @@
+# server/cache.py
+import itertools
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+
+# Все именованные кэши процесса (любой объект с методом stats()), чтобы отдавать их счётчики одним эндпоинтом
+caches: Dict[str, Any] = {}
+
+_versions = itertools.count(1)
+
+
+class TTLCache:
+    """Ограниченный LRU-кэш с TTL и версионной инвалидацией.
+
+    Загрузчик берёт ``version(key)`` до запроса в БД и передаёт её в ``set``:
+    если за время запроса ключ был инвалидирован, устаревшее значение
+    не попадёт в кэш.
+    """
+
+    def __init__(self, name: str, maxsize: int, ttl: float):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        # key -> версия последней инвалидации (тоже ограничено maxsize)
+        self._invalidated: "OrderedDict[Hashable, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        caches[name] = self
+
+    def version(self, key: Hashable) -> int:
+        return next(_versions)
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, version: Optional[int] = None) -> bool:
+        if version is not None and self._invalidated.get(key, 0) > version:
+            return False
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+        return True
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+        self._invalidated[key] = next(_versions)
+        self._invalidated.move_to_end(key)
+        if len(self._invalidated) > self.maxsize:
+            self._invalidated.popitem(last=False)
+        self.invalidations += 1
+
+    def put(self, key: Hashable, value: Any) -> None:
+        # Свежее значение после коммита: отменяет все незавершённые загрузки
+        self.invalidate(key)
+        self.set(key, value)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._invalidated.clear()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+# telegram_id -> UserResponse. Запросы с Bearer-токеном берут пользователя из токена и кэш не читают;
+# он обслуживает только запасной путь по X-Telegram-ID (get_current_user)
+user_cache = TTLCache("users", USER_CACHE_SIZE, USER_CACHE_TTL)
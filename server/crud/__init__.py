@@ -2,11 +2,18 @@
 from .user import (
     get_user_by_telegram_id,
     create_user,
+    signup_user,
     update_user,
     delete_user,
     get_user_by_referral_code,
-    generate_unique_referral_code,
+    generate_referral_code,
     increment_user_points,
     add_referral_record,
     get_users_referrals
-)
\ No newline at end of file
+)
+from .points import (
+    PointsReason,
+    post_points,
+    post_points_many,
+    get_balance_as_of
+)
@@ -3,8 +3,9 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
-from ..models.language import Language
+from ..models import Language
 from ..schemas.language import LanguageCreate, LanguageUpdate
+from ..services.reference_data import reference_data
 
 async def get_language(db: AsyncSession, code: str):
     try:
@@ -19,6 +20,7 @@ async def create_language(db: AsyncSession, language: LanguageCreate):
         db.add(new_language)
         await db.commit()
         await db.refresh(new_language)
+        await reference_data.reload()
         return new_language
     except SQLAlchemyError as e:
         await db.rollback()
@@ -35,6 +37,7 @@ async def update_language(db: AsyncSession, code: str, language_update: Language
     try:
         await db.commit()
         await db.refresh(language)
+        await reference_data.reload()
         return language
     except SQLAlchemyError as e:
         await db.rollback()
@@ -48,6 +51,7 @@ async def delete_language(db: AsyncSession, code: str):
     try:
         await db.delete(language)
         await db.commit()
+        await reference_data.reload()
         return {"message": "Language deleted successfully"}
     except SQLAlchemyError as e:
         await db.rollback()
@@ -0,0 +1,117 @@
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import case, func, insert, literal, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.models import PointsLedger, PointsSnapshot, Task, User
+
+logger = logging.getLogger(__name__)
+
+# Доля награды за клик, которую получает исполнитель, в процентах: начисление целое, без float
+CLAIM_REWARD_PERCENT = 70
+
+
+class PointsReason:
+    # Коды причин в points_ledger.reason
+    OPENING_BALANCE = "opening_balance"
+    TASK_CREATE = "task_create"
+    TASK_CLAIM = "task_claim"
+    TASK_REFUND = "task_refund"
+    REFERRAL_BONUS = "referral_bonus"
+    WALLET_DEPOSIT = "wallet_deposit"
+    ADJUSTMENT = "adjustment"
+
+
+# (telegram_id, delta, reason, ref_id)
+LedgerEntry = Tuple[int, int, str, Optional[int]]
+
+
+def claim_reward(reward_per_click: int) -> int:
+    return reward_per_click * CLAIM_REWARD_PERCENT // 100
+
+
+def claim_reward_sql(reward_per_click):
+    return (reward_per_click * CLAIM_REWARD_PERCENT).op("DIV")(100)
+
+
+async def post_points(
+    db: AsyncSession,
+    telegram_id: int,
+    delta: int,
+    reason: str,
+    ref_id: Optional[int] = None,
+    require_funds: bool = False
+) -> bool:
+    """Движение баллов: атомарный инкремент users.points и запись в журнал.
+
+    Не коммитит - выполняется в транзакции вызывающего. Возвращает False,
+    если пользователя нет или (при require_funds) баланса не хватает.
+    """
+    if delta == 0:
+        return True
+    query = update(User).where(User.telegram_id == telegram_id)
+    if require_funds:
+        # Проверка и списание одним UPDATE, без чтения баланса заранее
+        query = query.where(User.points + delta >= 0)
+    result = await db.execute(query.values(points=User.points + delta))
+    if result.rowcount == 0:
+        return False
+    await db.execute(insert(PointsLedger).values(user_id=telegram_id, delta=delta, reason=reason, ref_id=ref_id))
+    return True
+
+
+async def post_points_many(db: AsyncSession, entries: Iterable[LedgerEntry]) -> None:
+    # Пачка движений: один сгруппированный UPDATE балансов и один multi-row INSERT в журнал
+    entries = [entry for entry in entries if entry[1]]
+    if not entries:
+        return
+    deltas = Counter()
+    for telegram_id, delta, _, _ in entries:
+        deltas[telegram_id] += delta
+    await db.execute(
+        update(User)
+        .where(User.telegram_id.in_(list(deltas)))
+        .values(points=User.points + case(deltas, value=User.telegram_id))
+        .execution_options(synchronize_session=False)
+    )
+    await db.execute(insert(PointsLedger).values([
+        {"user_id": telegram_id, "delta": delta, "reason": reason, "ref_id": ref_id}
+        for telegram_id, delta, reason, ref_id in entries
+    ]))
+
+
+async def post_claim_reward(db: AsyncSession, task_id: int, telegram_id: int) -> None:
+    # Баланс уже увеличен multi-table UPDATE в claim; сумма для журнала берётся из той же строки задачи
+    await db.execute(insert(PointsLedger).from_select(
+        ["user_id", "delta", "reason", "ref_id"],
+        select(
+            literal(telegram_id),
+            claim_reward_sql(Task.reward_per_click),
+            literal(PointsReason.TASK_CLAIM),
+            Task.id
+        ).where(Task.id == task_id)
+    ))
+
+
+async def get_balance_as_of(db: AsyncSession, telegram_id: int, as_of: datetime) -> int:
+    # Последний снапшот не позже as_of плюс хвост журнала после него - без полного прохода по журналу
+    snapshot = (await db.execute(
+        select(PointsSnapshot.ledger_id, PointsSnapshot.balance)
+        .where(PointsSnapshot.user_id == telegram_id, PointsSnapshot.created_at <= as_of)
+        .order_by(PointsSnapshot.created_at.desc(), PointsSnapshot.ledger_id.desc())
+        .limit(1)
+    )).first()
+    ledger_id, balance = snapshot if snapshot else (0, 0)
+
+    tail = (await db.execute(
+        select(func.coalesce(func.sum(PointsLedger.delta), 0))
+        .where(
+            PointsLedger.user_id == telegram_id,
+            PointsLedger.id > ledger_id,
+            PointsLedger.created_at <= as_of
+        )
+    )).scalar_one()
+    return int(balance) + int(tail)
@@ -1,12 +1,28 @@
 import logging
+import random
+import time
 
 from typing import Optional
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, exists
-from server.models import Task, User, TaskClick
+from sqlalchemy import select, update, insert
+from sqlalchemy.exc import IntegrityError
+from server.models import Task, User, TaskClick, TaskClickShard
 from server.schemas.task import TaskCreate
+from server.cache import user_cache
+from server.pagination import paginate, DEFAULT_PAGE_SIZE
+from server.services.task_catalog import task_catalog
+from server.services.reference_data import reference_data, TaskStatusId
+from server.services.claimed_tasks import claimed_task_index
+from server.services.feed_scheduler import feed_scheduler
+from server.services.hot_counters import hot_counters, fold_counter_shards, apply_shard_counts
+from server.crud.points import PointsReason, post_points, post_claim_reward, claim_reward_sql
 from fastapi import HTTPException
 
+logger = logging.getLogger(__name__)
+
+# Код ошибки MySQL ER_DUP_ENTRY
+MYSQL_DUPLICATE_ENTRY = 1062
+
 async def create_task(db: AsyncSession, user_id: int, task_data: TaskCreate):
     # Получаем пользователя
     result = await db.execute(select(User).where(User.telegram_id == user_id))
@@ -14,24 +30,23 @@ async def create_task(db: AsyncSession, user_id: int, task_data: TaskCreate):
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
+    if not reference_data.is_task_type(task_data.task_type_id):
+        raise HTTPException(status_code=400, detail="Unknown task type")
+
     # Вычисляем общую стоимость
     total_cost = task_data.total_clicks * task_data.reward_per_click
 
-    # Проверяем, хватает ли у пользователя баллов
+    # Быстрый отказ без записи; окончательная проверка - в условии списания ниже
     if user.points < total_cost:
         raise HTTPException(status_code=400, detail="Insufficient points to create this task.")
 
-    # Списываем баллы со счета пользователя
-    user.points -= total_cost
-    db.add(user)
-
     # Создаем новое задание
     new_task = Task(
         user_id=user_id,
         task_type_id=task_data.task_type_id,
         name=task_data.name,
         link=task_data.link,
-        status_id=1,
+        status_id=TaskStatusId.ACTIVE,
         total_clicks=task_data.total_clicks,
         reward_per_click=task_data.reward_per_click,
         completed_clicks=0,
@@ -39,163 +54,275 @@ async def create_task(db: AsyncSession, user_id: int, task_data: TaskCreate):
     )
 
     db.add(new_task)
+    await db.flush()
+
+    # Списываем баллы со счета пользователя: UPDATE с проверкой баланса и запись в журнал
+    if not await post_points(db, user_id, -total_cost, PointsReason.TASK_CREATE, new_task.id, require_funds=True):
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Insufficient points to create this task.")
+
     await db.commit()
+    user_cache.invalidate(user_id)
     await db.refresh(new_task)
+    task_catalog.upsert(new_task)
     return new_task
 
-async def get_archived_tasks_by_user_id(db: AsyncSession, user_id: int):
+async def get_archived_tasks_by_user_id(
+    db: AsyncSession,
+    user_id: int,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+):
     try:
-        # Извлекаем задачи, которые завершены (status_id = 3) или в архиве (status_id = 2)
-        result = await db.execute(
-            select(Task).where(Task.user_id == user_id, Task.status_id.in_([2, 3]))
-        )
-        tasks = result.scalars().all()
-        return tasks
+        # Извлекаем задачи, которые выполнены или остановлены
+        query = select(Task).where(Task.user_id == user_id, Task.status_id.in_(TaskStatusId.ARCHIVED))
+        tasks, next_cursor = await paginate(db, query, Task, cursor, limit)
+        await apply_shard_counts(db, tasks)
+        return tasks, next_cursor
     except Exception as e:
-        logging.error(f"Error fetching archived tasks for user {user_id}: {e}")
+        logger.error(f"Error fetching archived tasks for user {user_id}: {e}")
         raise e
 
 
-async def get_active_tasks_by_user_id(db: AsyncSession, user_id: int):
+async def get_active_tasks_by_user_id(
+    db: AsyncSession,
+    user_id: int,
+    task_type_id: Optional[int] = None,
+    cursor: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE
+):
     try:
-        # Извлекаем задачи с активным статусом (status_id = 1)
-        result = await db.execute(
-            select(Task).where(Task.user_id == user_id, Task.status_id == 1)
-        )
-        tasks = result.scalars().all()
-        return tasks
+        # Извлекаем задачи с активным статусом
+        query = select(Task).where(Task.user_id == user_id, Task.status_id == TaskStatusId.ACTIVE)
+        if task_type_id is not None:
+            query = query.where(Task.task_type_id == task_type_id)
+        tasks, next_cursor = await paginate(db, query, Task, cursor, limit)
+        await apply_shard_counts(db, tasks)
+        return tasks, next_cursor
     except Exception as e:
-        logging.error(f"Error fetching active tasks for user {user_id}: {e}")
+        logger.error(f"Error fetching active tasks for user {user_id}: {e}")
         raise e
 
-async def get_tasks_with_type(db: AsyncSession, current_user_id: int, task_type_id: Optional[int] = None):
-    # Формируем подзапрос для проверки, кликал ли пользователь по задаче
-    subquery = (
-        select(TaskClick.task_id)
-        .where(TaskClick.user_id == current_user_id)
-        .where(TaskClick.task_id == Task.id)
-    )
-
-    # Формируем основной запрос для задач, которые не принадлежат текущему пользователю
-    query = (
-        select(Task)
-        .where(Task.user_id != current_user_id)
-        .where(~exists(subquery))  # Исключаем задачи, по которым пользователь уже кликнул
+async def get_tasks_with_type(
+    db: AsyncSession,
+    current_user_id: int,
+    task_type_id: Optional[int] = None,
+    is_premium: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = 10
+):
+    # Фильтрация по создателю, типу и премиум-доступу - в памяти, по колонкам каталога
+    candidates = task_catalog.candidate_ids(current_user_id, is_premium, task_type_id)
+    if len(candidates) == 0:
+        return [], None
+
+    # Задачи, по которым пользователь уже кликнул (in-memory индекс), исключает планировщик после ранжирования
+    claimed = await claimed_task_index.get(db, current_user_id)
+
+    # Порядок выдачи: награда и остаток кликов, с квотой на создателя и разнообразием для пользователя
+    page_ids, next_cursor = feed_scheduler.page(candidates, claimed, current_user_id, cursor, limit)
+    if not page_ids:
+        return [], None
+
+    # Из БД читаем только итоговую страницу; статус перепроверяем на случай устаревшего каталога
+    result = await db.execute(
+        select(Task).where(
+            Task.id.in_(page_ids),
+            Task.status_id == TaskStatusId.ACTIVE,
+            Task.completed_clicks < Task.total_clicks
+        )
     )
-    
-    # Если указан task_type_id, добавляем фильтр по типу задачи
-    if task_type_id is not None:
-        query = query.where(Task.task_type_id == task_type_id)
-    
-    query = query.limit(10)  # Ограничиваем результат 10 задачами
-
-    result = await db.execute(query)
-    tasks = result.scalars().all()
-    
-    return tasks
+    found = result.scalars().all()
+    await apply_shard_counts(db, found)
+    tasks_by_id = {task.id: task for task in found if task.completed_clicks < task.total_clicks}
+    tasks = [tasks_by_id[task_id] for task_id in page_ids if task_id in tasks_by_id]
+    return tasks, next_cursor
 
 async def archive_task(db: AsyncSession, task_id: int, user_id: int):
+    # Возврат считается от completed_clicks, поэтому клики из слотов сначала переносим в строку задачи
+    await fold_counter_shards(db, task_id)
     result = await db.execute(select(Task).where(Task.id == task_id, Task.user_id == user_id))
     task = result.scalar_one_or_none()
 
     if not task:
         raise HTTPException(status_code=404, detail="Task not found")
 
-    user = await db.execute(select(User).where(User.telegram_id == user_id))
-    user = user.scalar_one_or_none()
-
     # Вернуть баллы за невыполненные клики
     unused_points = task.reserved_points - task.completed_clicks * task.reward_per_click
-    user.points += unused_points
-    db.add(user)
+    await post_points(db, user_id, unused_points, PointsReason.TASK_REFUND, task.id)
 
     await db.commit()
+    user_cache.invalidate(user_id)
+    task_catalog.remove(task.id)
     return task
 
-async def claim_task_in_db(db: AsyncSession, task_id: int, telegram_id: int):
+async def _claim_failure_reason(db: AsyncSession, task_id: int, telegram_id: int) -> str:
+    # Медленный путь только для отказов: объясняем, почему условный UPDATE не сработал
+    task = (await db.execute(select(Task).where(Task.id == task_id))).scalar_one_or_none()
+    if not task:
+        return f"Task with id {task_id} not found"
+    user_exists = (await db.execute(select(User.id).where(User.telegram_id == telegram_id))).first()
+    if not user_exists:
+        return f"User {telegram_id} not found"
+    if task.status_id != TaskStatusId.ACTIVE:
+        return f"Task {task_id} is not active"
+    return f"Task {task_id} has no clicks left"
+
+
+async def apply_claim(db: AsyncSession, task_id: int, telegram_id: int):
+    # Запись одного claim в БД: фиксированный набор запросов и один коммит
+    # 1. Уникальный ключ (task_id, user_id) сам отсекает повторный клик
     try:
-        result_task = await db.execute(select(Task).where(Task.id == int(task_id)))
-        task = result_task.scalar_one_or_none()
-        
-        result_user = await db.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result_user.scalar_one_or_none()
-
-        if not user:
-            raise ValueError(f"User {telegram_id} not found")
-        if not task:
-            raise ValueError(f"Task with id {task_id} not found")
+        await db.execute(insert(TaskClick).values(task_id=task_id, user_id=telegram_id))
+    except IntegrityError as e:
+        await db.rollback()
+        if e.orig.args and e.orig.args[0] == MYSQL_DUPLICATE_ENTRY:
+            claimed_task_index.record(telegram_id, task_id)
+            raise ValueError(f"Task {task_id} already claimed by user {telegram_id}")
+        # Нарушение внешнего ключа: нет задачи или пользователя
+        raise ValueError(await _claim_failure_reason(db, task_id, telegram_id))
+
+    # 2. Счётчик кликов задачи и баланс исполнителя
+    started = time.monotonic()
+    credited = await _credit_claim(db, task_id, telegram_id)
+    hot_counters.observe(task_id, (time.monotonic() - started) * 1000)
+    if not credited:
+        reason = await _claim_failure_reason(db, task_id, telegram_id)
+        await db.rollback()
+        raise ValueError(reason)
+    await post_claim_reward(db, task_id, telegram_id)
+
+    # 3. Актуальное состояние задачи для ответа
+    task = (await db.execute(
+        select(Task).where(Task.id == task_id).execution_options(populate_existing=True)
+    )).scalar_one()
+    await apply_shard_counts(db, [task])
+    await db.commit()
+    user_cache.invalidate(telegram_id)
+    return task
 
-        logging.info(f"Claiming task: {task.id}, total clicks: {task.total_clicks}, completed clicks: {task.completed_clicks}")
 
-        # Проверка, захватывал ли уже пользователь эту задачу
-        task_click_exists = await db.execute(select(TaskClick).where(TaskClick.task_id == task_id, TaskClick.user_id == telegram_id))
-        if task_click_exists.scalar_one_or_none():
-            raise ValueError(f"Task {task_id} already claimed by user {telegram_id}")
+async def _claim_on_task_row(db: AsyncSession, task_id: int, telegram_id: int) -> bool:
+    # Один multi-table UPDATE: счётчик кликов задачи и баланс исполнителя.
+    # Условие в WHERE не даёт превысить total_clicks даже при сотнях одновременных claim.
+    result = await db.execute(
+        update(Task)
+        .where(
+            Task.id == task_id,
+            Task.status_id == TaskStatusId.ACTIVE,
+            Task.counter_shards == 0,
+            Task.completed_clicks < Task.total_clicks,
+            User.telegram_id == telegram_id
+        )
+        .values({
+            Task.completed_clicks: Task.completed_clicks + 1,
+            User.points: User.points + claim_reward_sql(Task.reward_per_click),
+        })
+    )
+    return result.rowcount > 0
 
-        # Добавление новой записи в таблицу TaskClick
-        new_click = TaskClick(task_id=task_id, user_id=telegram_id)
-        db.add(new_click)
 
-        # Обновление количества выполненных кликов
-        task.completed_clicks += 1
-        logging.info(f"Updated completed clicks for task {task_id}: {task.completed_clicks}/{task.total_clicks}")
+async def _claim_on_shards(db: AsyncSession, task_id: int, telegram_id: int, shards: int) -> bool:
+    # Горячая задача: клик уходит в случайный слот, строка задачи только читается.
+    # Исчерпанный слот пропускаем и пробуем следующий.
+    for shard in random.sample(range(shards), shards):
+        result = await db.execute(
+            update(TaskClickShard)
+            .where(
+                TaskClickShard.task_id == task_id,
+                TaskClickShard.shard == shard,
+                TaskClickShard.clicks < TaskClickShard.budget,
+                Task.id == task_id,
+                Task.status_id == TaskStatusId.ACTIVE,
+                User.telegram_id == telegram_id
+            )
+            .values({
+                TaskClickShard.clicks: TaskClickShard.clicks + 1,
+                User.points: User.points + claim_reward_sql(Task.reward_per_click),
+            })
+        )
+        if result.rowcount > 0:
+            return True
+    return False
+
+
+async def _credit_claim(db: AsyncSession, task_id: int, telegram_id: int) -> bool:
+    shards = hot_counters.shards_of(task_id)
+    for _ in range(2):
+        if shards:
+            if await _claim_on_shards(db, task_id, telegram_id, shards):
+                return True
+        elif await _claim_on_task_row(db, task_id, telegram_id):
+            return True
+        # Слоты могли включить или свернуть в другом воркере - сверяемся с БД и пробуем ещё раз
+        actual = (await db.execute(select(Task.counter_shards).where(Task.id == task_id))).scalar_one_or_none() or 0
+        if actual == shards:
+            return False
+        if actual:
+            hot_counters.mark_sharded(task_id, actual)
+        else:
+            hot_counters.forget(task_id)
+        shards = actual
+    return False
 
-         # Вернуть баллы за невыполненные клики
-        added_points =  task.reward_per_click * 0.7
-        user.points += added_points
 
-        # Сохранение изменений
-        await db.commit()
-        await db.refresh(task)
-        await db.refresh(user)
+async def claim_task_in_db(db: AsyncSession, task_id: int, telegram_id: int):
+    task_id = int(task_id)
+    try:
+        # Проверка, захватывал ли уже пользователь эту задачу (без запроса, если индекс загружен)
+        claimed = claimed_task_index.peek(telegram_id)
+        if claimed is not None and task_id in claimed:
+            raise ValueError(f"Task {task_id} already claimed by user {telegram_id}")
 
+        task = await apply_claim(db, task_id, telegram_id)
+        task_catalog.record_claim(task_id)
+        claimed_task_index.record(telegram_id, task_id)
 
-        logging.info(f"Task {task_id} successfully claimed by user {telegram_id}")
+        logger.info("Task %s claimed by user %s", task_id, telegram_id)
         return task
 
     except Exception as e:
-        logging.error(f"Error claiming task {task_id} for user {telegram_id}: {e}")
+        logger.error(f"Error claiming task {task_id} for user {telegram_id}: {e}")
         await db.rollback()
         raise
 
 
 async def finish_task_in_db(db: AsyncSession, task_id: int, telegram_id: int):
     try:
-        # Получаем задачу
+        # Возврат считается от completed_clicks, поэтому клики из слотов сначала переносим в строку задачи
+        await fold_counter_shards(db, task_id)
+        # Получаем задачу; блокировка строки не даёт claim изменить completed_clicks до возврата
         result = await db.execute(
-            select(Task).where(Task.id == task_id, Task.user_id == telegram_id)
+            select(Task).where(Task.id == task_id, Task.user_id == telegram_id).with_for_update()
         )
         task = result.scalar_one_or_none()
 
         if not task:
             raise ValueError(f"Task with id {task_id} not found for user {telegram_id}")
 
-        if task.status_id == 3:
+        # Переход из active - условный UPDATE: повторный или параллельный finish не вернёт баллы дважды
+        result = await db.execute(
+            update(Task)
+            .where(Task.id == task_id, Task.status_id == TaskStatusId.ACTIVE)
+            .values(status_id=TaskStatusId.STOPPED)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
             raise ValueError(f"Task {task_id} is already completed")
 
         # Вычисляем и возвращаем неиспользованные поинты
         unused_points = task.reserved_points - (task.completed_clicks * task.reward_per_click)
-        
-        # Обновляем баланс пользователя, добавляя неиспользованные поинты
-        result_user = await db.execute(select(User).where(User.telegram_id == telegram_id))
-        user = result_user.scalar_one_or_none()
-        
-        if user:
-            user.points += unused_points
-            db.add(user)
-        
-        # Обновляем статус задачи на "завершенную" (например, status_id = 3)
-        task.status_id = 3
-        db.add(task)
-        
+        await post_points(db, telegram_id, unused_points, PointsReason.TASK_REFUND, task.id)
+
         # Сохраняем изменения
         await db.commit()
+        user_cache.invalidate(telegram_id)
+        task_catalog.remove(task.id)
         await db.refresh(task)
-        await db.refresh(user)
 
         return task
 
     except Exception as e:
-        logging.error(f"Error finishing task {task_id} for user {telegram_id}: {e}")
+        logger.error(f"Error finishing task {task_id} for user {telegram_id}: {e}")
         await db.rollback()
         raise
\ No newline at end of file
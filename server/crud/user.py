@@ -1,17 +1,22 @@
 import logging
-import random
-import string
-from typing import List
+from typing import List, Optional
+from sqlalchemy.dialects.mysql import insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.exc import SQLAlchemyError
 from fastapi import HTTPException
 from server.models import User, Referral
-from server.schemas.user import UserCreate, UserUpdate
+from server.schemas.user import UserCreate, UserUpdate, UserResponse
 from server.schemas.refferals import ReferralResponse
+from server.cache import user_cache
+from server.security import encode_referral_code, decode_referral_code
+from server.crud.points import PointsReason, post_points
 
 logger = logging.getLogger(__name__)
 
+# Бонус рефереру за приглашённого пользователя
+REFERRAL_BONUS = 100
+
 
 async def get_user_by_telegram_id(db: AsyncSession, telegram_id: int):
     try:
@@ -29,10 +34,48 @@ async def create_user(db: AsyncSession, user: UserCreate):
         return new_user
     except Exception as e:
         await db.rollback()
-        logging.error(f"Database error {e}")
+        logger.error(f"Database error {e}")
 
         raise HTTPException(status_code=500, detail=str(e))
 
+async def signup_user(db: AsyncSession, user: UserCreate, referrer: Optional[User] = None):
+    # Вся регистрация - одна транзакция: пользователь, запись о реферале и бонус рефереру.
+    # Повторная регистрация того же telegram_id (две вкладки) не падает на уникальном ключе.
+    bonus_paid = False
+    try:
+        values = user.dict()
+        values['referral_id'] = referrer.id if referrer else None
+        # INSERT IGNORE вместо ON DUPLICATE KEY UPDATE: драйвер подключается с CLIENT_FOUND_ROWS,
+        # и upsert без изменений вернул бы rowcount 1, как вставка. Здесь 1 - вставлен, 0 - уже был.
+        result = await db.execute(insert(User).prefix_with('IGNORE').values(**values))
+        inserted = result.rowcount == 1
+
+        if inserted:
+            user_id = result.lastrowid
+            if referrer:
+                # referrals.referred_id уникален: бонус начисляется только победителю гонки
+                referral_result = await db.execute(
+                    insert(Referral).prefix_with('IGNORE').values(referrer_id=referrer.id, referred_id=user_id)
+                )
+                if referral_result.rowcount == 1:
+                    await post_points(db, referrer.telegram_id, REFERRAL_BONUS, PointsReason.REFERRAL_BONUS, user_id)
+                    bonus_paid = True
+            result = await db.execute(select(User).where(User.id == user_id))
+        else:
+            # Пользователь уже зарегистрирован: ни записи о реферале, ни бонуса
+            result = await db.execute(select(User).where(User.telegram_id == user.telegram_id))
+        new_user = result.scalar_one()
+        await db.commit()
+    except SQLAlchemyError as e:
+        await db.rollback()
+        logger.error(f"Database error during signup_user: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+    if bonus_paid:
+        user_cache.invalidate(referrer.telegram_id)
+        logger.info(f"Added {REFERRAL_BONUS} points to referrer with ID {referrer.id}")
+    return new_user
+
 async def update_user(db: AsyncSession, user_id: int, user_update: UserUpdate):
     user = await get_user_by_telegram_id(db, user_id)
     if not user:
@@ -44,6 +87,7 @@ async def update_user(db: AsyncSession, user_id: int, user_update: UserUpdate):
     try:
         await db.commit()
         await db.refresh(user)
+        user_cache.put(user.telegram_id, UserResponse.from_orm(user))
         return user
     except SQLAlchemyError as e:
         await db.rollback()
@@ -57,28 +101,30 @@ async def delete_user(db: AsyncSession, user_id: int):
     try:
         await db.delete(user)
         await db.commit()
+        user_cache.invalidate(user_id)
         return {"message": "User deleted successfully"}
     except SQLAlchemyError as e:
         await db.rollback
 
-async def generate_unique_referral_code(db: AsyncSession):
-    while True:
-        try:
-            code = ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
-            result = await db.execute(select(User).where(User.referral_code == code))
-            existing_user = result.scalar_one_or_none()
-            if not existing_user:
-                return code
-        except SQLAlchemyError as e:
-            logger.error(f"Database error during referral code generation: {e}")
-            raise HTTPException(status_code=500, detail="Internal server error")
-        except Exception as e:
-            logger.error(f"Unexpected error during referral code generation: {e}")
-            raise HTTPException(status_code=500, detail="Internal server error")
+def generate_referral_code(telegram_id: int) -> str:
+    # Код уникален по построению: это обратимая перестановка telegram_id, запрос к БД не нужен
+    return encode_referral_code(telegram_id)
 
 
 async def get_user_by_referral_code(db: AsyncSession, referral_code: str):
     try:
+        telegram_id = decode_referral_code(referral_code)
+        if telegram_id is not None:
+            # Новый формат: точечный поиск по уникальному telegram_id
+            result = await db.execute(select(User).where(User.telegram_id == telegram_id))
+            user = result.scalar_one_or_none()
+            if user and user.referral_code == referral_code.upper():
+                return user
+            # Код разбирается как новый, но выдан иначе (другой секрет или формат) - ищем по сохранённому коду
+            result = await db.execute(select(User).where(User.referral_code == referral_code.upper()))
+            return result.scalar_one_or_none()
+
+        # Старые случайные 8-символьные коды
         result = await db.execute(select(User).where(User.referral_code == referral_code))
         return result.scalar_one_or_none()
     except SQLAlchemyError as e:
@@ -103,10 +149,10 @@ async def increment_user_points(db: AsyncSession, user_id: int, points: int):
         result = await db.execute(select(User).where(User.id == user_id))
         user = result.scalar_one_or_none()
         if user:
-            user.points += points
-            db.add(user)
+            await post_points(db, user.telegram_id, points, PointsReason.ADJUSTMENT)
             await db.commit()
             await db.refresh(user)
+            user_cache.put(user.telegram_id, UserResponse.from_orm(user))
             # return user
         else:
             raise HTTPException(status_code=404, detail="User not found")
@@ -0,0 +1,112 @@
+import logging
+import os
+from decimal import Decimal
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.cache import user_cache
+from server.crud.points import PointsReason, post_points_many
+from server.models import User, WalletTransaction
+
+logger = logging.getLogger(__name__)
+
+
+def _parse_tiers(value: str) -> Dict[Decimal, int]:
+    # "3:1500,10:5000" -> {Decimal('3'): 1500, Decimal('10'): 5000}
+    tiers = {}
+    for item in value.split(","):
+        amount, points = item.split(":")
+        tiers[Decimal(amount.strip())] = int(points)
+    return tiers
+
+
+# Сумма пополнения -> баллы; переопределяется WALLET_POINTS_TIERS="сумма:баллы,..."
+WALLET_POINTS_TIERS = _parse_tiers(os.getenv("WALLET_POINTS_TIERS", "3:1500,10:5000,50:25000"))
+
+
+def points_for_amount(amount) -> Optional[int]:
+    # Decimal('3.00000000') == Decimal('3') и хэшируются одинаково, так что DECIMAL(18, 8) из БД находится в таблице
+    if amount is None:
+        return None
+    return WALLET_POINTS_TIERS.get(Decimal(amount))
+
+
+async def settle_wallet_transactions(
+    db: AsyncSession,
+    transaction_ids: Sequence[int],
+    transaction_hashes: Sequence[str],
+    status: str
+) -> List[dict]:
+    """Set-based проведение пачки транзакций в одной транзакции БД.
+
+    Строки блокируются одним SELECT ... FOR UPDATE, статусы меняются одним
+    UPDATE, баллы начисляются одним сгруппированным UPDATE через журнал.
+    Уже проведённые транзакции пропускаются. Результат - по элементу на
+    каждый id/hash из запроса, в том же порядке.
+    """
+    conditions = []
+    if transaction_ids:
+        conditions.append(WalletTransaction.id.in_(list(transaction_ids)))
+    if transaction_hashes:
+        conditions.append(WalletTransaction.transaction_hash.in_(list(transaction_hashes)))
+    if not conditions:
+        return []
+
+    rows = (await db.execute(
+        select(
+            WalletTransaction.id,
+            WalletTransaction.transaction_hash,
+            WalletTransaction.amount,
+            WalletTransaction.status,
+            User.telegram_id
+        )
+        .join(User, User.id == WalletTransaction.user_id)
+        .where(or_(*conditions))
+        .with_for_update()
+    )).all()
+    by_id = {row.id: row for row in rows}
+    by_hash = {row.transaction_hash: row for row in rows if row.transaction_hash}
+
+    outcomes = {}
+    to_settle = []
+    credits = []
+    for row in rows:
+        if row.status == 'completed':
+            outcomes[row.id] = ('already_completed', 0)
+            continue
+        points = 0
+        if status == 'completed':
+            points = points_for_amount(row.amount)
+            if points is None:
+                # Сумма вне тарифной сетки - оставляем на ручной разбор
+                outcomes[row.id] = ('no_tier', 0)
+                continue
+            credits.append((row.telegram_id, points, PointsReason.WALLET_DEPOSIT, row.id))
+        to_settle.append(row.id)
+        outcomes[row.id] = ('settled', points)
+
+    if to_settle:
+        await db.execute(
+            update(WalletTransaction)
+            .where(WalletTransaction.id.in_(to_settle), WalletTransaction.status != 'completed')
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        await post_points_many(db, credits)
+    await db.commit()
+
+    for telegram_id, _, _, _ in credits:
+        user_cache.invalidate(telegram_id)
+
+    results = []
+    requested = [(str(transaction_id), by_id.get(transaction_id)) for transaction_id in transaction_ids]
+    requested += [(transaction_hash, by_hash.get(transaction_hash)) for transaction_hash in transaction_hashes]
+    for key, row in requested:
+        if row is None:
+            results.append({"key": key, "transaction_id": None, "result": "not_found", "points": 0})
+            continue
+        result, points = outcomes[row.id]
+        results.append({"key": key, "transaction_id": row.id, "result": result, "points": points})
+    return results
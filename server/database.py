@@ -1,14 +1,18 @@
 import os
 import logging
+import time
 
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, create_async_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from dotenv import load_dotenv
 
+from server.cache import caches
+
 # Настройка логирования
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Загрузка переменных окружения из файла .env
 load_dotenv()
@@ -23,11 +27,130 @@ DATABASE_NAME = os.getenv("DATABASE_NAME", "bot")
 # Формирование URL для подключения к базе данных
 DATABASE_URL = f"mysql+aiomysql://{DATABASE_USER}:{DATABASE_PASSWORD}@{DATABASE_HOST}:{DATABASE_PORT}/{DATABASE_NAME}"
 
+# Профили движка. Размер пула задаётся на воркер: при N воркерах к MySQL идёт до N * (pool_size + max_overflow) соединений.
+# statement_timeout_ms - MySQL max_execution_time (действует на SELECT), 0 - без ограничения.
+DATABASE_PROFILES = {
+    "dev": {
+        "pool_size": 5, "max_overflow": 5, "pool_timeout": 30, "pool_recycle": 3600,
+        "pool_pre_ping": True, "statement_timeout_ms": 0, "echo": True,
+    },
+    "prod": {
+        "pool_size": 10, "max_overflow": 20, "pool_timeout": 10, "pool_recycle": 1800,
+        "pool_pre_ping": True, "statement_timeout_ms": 10000, "echo": False,
+    },
+    # Нагрузочные прогоны: большой пул, без pre-ping (лишний round-trip на каждую выдачу), без SQL-лога
+    "bench": {
+        "pool_size": 50, "max_overflow": 50, "pool_timeout": 5, "pool_recycle": 1800,
+        "pool_pre_ping": False, "statement_timeout_ms": 0, "echo": False,
+    },
+}
+DATABASE_PROFILE = os.getenv("DATABASE_PROFILE", "prod")
+if DATABASE_PROFILE not in DATABASE_PROFILES:
+    raise ValueError(f"Unknown DATABASE_PROFILE: {DATABASE_PROFILE}")
+
+
+def _profile_setting(name: str):
+    # Любой параметр профиля переопределяется переменной DATABASE_<ПАРАМЕТР>, например DATABASE_POOL_SIZE=20
+    default = DATABASE_PROFILES[DATABASE_PROFILE][name]
+    value = os.getenv(f"DATABASE_{name.upper()}")
+    if value is None:
+        return default
+    if isinstance(default, bool):
+        return value.lower() in ("1", "true", "yes")
+    return type(default)(value)
+
+
+DATABASE_SETTINGS = {name: _profile_setting(name) for name in DATABASE_PROFILES[DATABASE_PROFILE]}
+
+
+class PoolStats:
+    """Счётчики выдачи соединений из пула: время ожидания, занятость, overflow и таймауты."""
+
+    def __init__(self, profile: str, settings: dict):
+        self.profile = profile
+        self.settings = settings
+        self.pool = None
+        self.checkouts = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.max_in_use = 0
+        self.max_overflow_used = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        caches["db_pool"] = self
+
+    def record_checkout(self, wait_ms: float) -> None:
+        self.checkouts += 1
+        self.wait_ms_total += wait_ms
+        self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+        self.max_in_use = max(self.max_in_use, self.pool.checkedout())
+        self.max_overflow_used = max(self.max_overflow_used, self.pool.overflow())
+
+    def stats(self) -> dict:
+        return {
+            "profile": self.profile,
+            "settings": self.settings,
+            "in_use": self.pool.checkedout() if self.pool else 0,
+            "idle": self.pool.checkedin() if self.pool else 0,
+            "overflow": max(self.pool.overflow(), 0) if self.pool else 0,
+            "max_in_use": self.max_in_use,
+            "max_overflow_used": max(self.max_overflow_used, 0),
+            "checkouts": self.checkouts,
+            "wait_ms_avg": round(self.wait_ms_total / self.checkouts, 3) if self.checkouts else 0.0,
+            "wait_ms_max": round(self.wait_ms_max, 3),
+            "timeouts": self.timeouts,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+        }
+
+
+pool_stats = PoolStats(DATABASE_PROFILE, DATABASE_SETTINGS)
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    # connect() - единственная точка выдачи соединения движку; замер включает ожидание свободного слота и pre-ping
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_stats.timeouts += 1
+            raise
+        pool_stats.record_checkout((time.perf_counter() - started) * 1000)
+        return connection
+
+
+connect_args = {}
+if DATABASE_SETTINGS["statement_timeout_ms"]:
+    connect_args["init_command"] = f"SET SESSION max_execution_time={int(DATABASE_SETTINGS['statement_timeout_ms'])}"
+
 # Создание асинхронного движка
 engine: AsyncEngine = create_async_engine(
     DATABASE_URL,
-    echo=True,  # Для вывода SQL-запросов в логах, можно отключить в production
+    poolclass=InstrumentedPool,
+    pool_size=DATABASE_SETTINGS["pool_size"],
+    max_overflow=DATABASE_SETTINGS["max_overflow"],
+    pool_timeout=DATABASE_SETTINGS["pool_timeout"],
+    pool_recycle=DATABASE_SETTINGS["pool_recycle"],
+    pool_pre_ping=DATABASE_SETTINGS["pool_pre_ping"],
+    connect_args=connect_args,
 )
+pool_stats.pool = engine.sync_engine.pool
+
+# SQL-лог идёт через общую очередь логирования, а не через отдельный синхронный обработчик echo=True
+if DATABASE_SETTINGS["echo"]:
+    logging.getLogger("sqlalchemy.engine").setLevel(logging.INFO)
+
+
+@event.listens_for(engine.sync_engine, "connect")
+def _on_connect(dbapi_connection, connection_record):
+    pool_stats.connects += 1
+
+
+@event.listens_for(engine.sync_engine, "invalidate")
+def _on_invalidate(dbapi_connection, connection_record, exception):
+    pool_stats.invalidations += 1
 
 # Создание асинхронной сессии
 async_session = sessionmaker(
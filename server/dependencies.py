@@ -2,10 +2,33 @@
 
 from fastapi import Depends, HTTPException, Request
 from server.crud.user import get_user_by_telegram_id
-from server.schemas.user import UserResponse
-from server.routers.logs import logging
+from server.schemas.user import UserResponse, SessionUser
+import logging
+import os
+from server.security import decode_session_token
+from server.cache import caches, user_cache
 from sqlalchemy.ext.asyncio import AsyncSession
-from server.database import get_session
+from server.database import get_session, async_session
+
+logger = logging.getLogger(__name__)
+
+# Вход по заголовку X-Telegram-ID без подписи - только для старых клиентов без токена, по умолчанию выключен
+LEGACY_TELEGRAM_ID_AUTH = os.getenv("LEGACY_TELEGRAM_ID_AUTH", "0") == "1"
+
+
+class LegacyAuthCounter:
+    # Сколько запросов пришло без Bearer-токена: пора ли выключать запасной путь
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self.accepted = 0
+        self.rejected = 0
+        caches["legacy_auth"] = self
+
+    def stats(self) -> dict:
+        return {"enabled": self.enabled, "accepted": self.accepted, "rejected": self.rejected}
+
+
+legacy_auth = LegacyAuthCounter(LEGACY_TELEGRAM_ID_AUTH)
 
 async def get_current_user(
     request: Request,
@@ -13,12 +36,45 @@ async def get_current_user(
 ) -> UserResponse:
     # Предполагается, что вы передаете telegram_id в заголовке запроса
     telegram_id = request.headers.get('X-Telegram-ID')
-    logging.info(f"Received X-Telegram-ID: {telegram_id}")
+    logger.debug("Received X-Telegram-ID: %s", telegram_id)
     if not telegram_id:
         raise HTTPException(status_code=401, detail="User not authenticated")
 
-    user = await get_user_by_telegram_id(db, int(telegram_id))
+    telegram_id = int(telegram_id)
+    cached_user = user_cache.get(telegram_id)
+    if cached_user is not None:
+        return cached_user
+
+    version = user_cache.version(telegram_id)
+    user = await get_user_by_telegram_id(db, telegram_id)
     if not user:
         raise HTTPException(status_code=401, detail="User not authenticated")
 
-    return UserResponse.from_orm(user)
+    user_response = UserResponse.from_orm(user)
+    user_cache.set(telegram_id, user_response, version)
+    return user_response
+
+
+async def get_session_user(request: Request) -> SessionUser:
+    # Быстрый путь: подписанный токен из /api/auth/telegram, без обращения к БД
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        session_user = decode_session_token(authorization[7:])
+        if not session_user:
+            raise HTTPException(status_code=401, detail="Invalid or expired session token")
+        return session_user
+
+    # Старые клиенты без токена: ищем пользователя по X-Telegram-ID, если это явно разрешено
+    if not legacy_auth.enabled:
+        legacy_auth.rejected += 1
+        raise HTTPException(status_code=401, detail="User not authenticated")
+    legacy_auth.accepted += 1
+    logger.info("Legacy X-Telegram-ID auth used by %s", request.headers.get('X-Telegram-ID'))
+    async with async_session() as db:
+        user = await get_current_user(request, db)
+    return SessionUser(
+        id=user.id,
+        telegram_id=user.telegram_id,
+        is_premium=user.is_premium,
+        language_code=user.language_code,
+    )
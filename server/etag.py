@@ -0,0 +1,24 @@
+# server/etag.py
+import hashlib
+import json
+from typing import Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+
+def serialize_with_etag(value) -> Tuple[bytes, str]:
+    # Тело ответа сериализуется один раз; сильный ETag - хэш этих байтов
+    body = json.dumps(jsonable_encoder(value), ensure_ascii=False, separators=(",", ":")).encode()
+    return body, '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def etag_response(request: Request, body: bytes, etag: str, headers: Optional[dict] = None) -> Response:
+    # Клиент с актуальной копией получает 304 без тела
+    headers = {**(headers or {}), "ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
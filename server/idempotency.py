@@ -0,0 +1,231 @@
+# server/idempotency.py
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, NamedTuple, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from server.cache import TTLCache
+from server.database import async_session
+from server.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+# Ставится на ответ, отданный из хранилища, а не выполненный заново
+IDEMPOTENT_REPLAY_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 64
+
+# Сколько хранится результат первого запроса (секунды)
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("IDEMPOTENCY_CACHE_SIZE", "10000"))
+# Сколько повтор ждёт запрос, который выполняется в другом воркере (секунды)
+IDEMPOTENCY_WAIT_TIMEOUT = float(os.getenv("IDEMPOTENCY_WAIT_TIMEOUT", "10"))
+IDEMPOTENCY_POLL_INTERVAL = 0.05
+# Заглушка без результата старше этого срока осталась от упавшего воркера (секунды)
+IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT", "60"))
+IDEMPOTENCY_PURGE_INTERVAL = float(os.getenv("IDEMPOTENCY_PURGE_INTERVAL", "600"))
+
+
+class StoredResponse(NamedTuple):
+    fingerprint: str
+    status_code: int
+    body: Any
+
+
+StoreKey = Tuple[int, str]
+
+# (user_id, key) -> StoredResponse
+idempotency_cache = TTLCache("idempotency", IDEMPOTENCY_CACHE_SIZE, IDEMPOTENCY_TTL)
+# Запросы, которые выполняются в этом процессе прямо сейчас
+_in_flight: Dict[StoreKey, "asyncio.Future[StoredResponse]"] = {}
+
+
+def request_fingerprint(scope: str, payload: Any) -> str:
+    raw = json.dumps([scope, jsonable_encoder(payload)], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def _replay(stored: StoredResponse, fingerprint: str) -> JSONResponse:
+    if stored.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail=f"{IDEMPOTENCY_HEADER} was already used for a different request")
+    return JSONResponse(
+        status_code=stored.status_code,
+        content=stored.body,
+        headers={IDEMPOTENT_REPLAY_HEADER: "true"}
+    )
+
+
+async def _reserve(store_key: StoreKey, fingerprint: str) -> Optional[StoredResponse]:
+    # Строка-заглушка без status_code: ключ занят, запрос выполняется.
+    # Возвращает сохранённый ответ, если первый запрос уже завершился.
+    user_id, key = store_key
+    deadline = asyncio.get_running_loop().time() + IDEMPOTENCY_WAIT_TIMEOUT
+    while True:
+        async with async_session() as db:
+            try:
+                # created_at пишется явно в UTC: с ним сравнивается utcnow() ниже, а CURRENT_TIMESTAMP
+                # был бы в часовом поясе сессии MySQL
+                now = datetime.utcnow()
+                await db.execute(insert(IdempotencyKey).values(
+                    user_id=user_id,
+                    key=key,
+                    fingerprint=fingerprint,
+                    created_at=now,
+                    expires_at=now + timedelta(seconds=IDEMPOTENCY_TTL)
+                ))
+                await db.commit()
+                return None
+            except IntegrityError:
+                await db.rollback()
+
+            row = (await db.execute(
+                select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            )).scalar_one_or_none()
+            now = datetime.utcnow()
+            abandoned = row is not None and row.status_code is None and \
+                row.created_at < now - timedelta(seconds=IDEMPOTENCY_LOCK_TIMEOUT)
+            if row is not None and (row.expires_at < now or abandoned):
+                # Истёкший или брошенный ключ можно использовать заново
+                await db.execute(delete(IdempotencyKey).where(
+                    IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+                ))
+                await db.commit()
+                continue
+            if row is not None and row.status_code is not None:
+                return StoredResponse(row.fingerprint, row.status_code, json.loads(row.response))
+
+        # Первый запрос выполняется в другом воркере - ждём его результата
+        if asyncio.get_running_loop().time() >= deadline:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress")
+        await asyncio.sleep(IDEMPOTENCY_POLL_INTERVAL)
+
+
+async def _record(store_key: StoreKey, stored: StoredResponse) -> None:
+    user_id, key = store_key
+    async with async_session() as db:
+        await db.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+            .values(status_code=stored.status_code, response=json.dumps(stored.body))
+        )
+        await db.commit()
+
+
+async def _release(store_key: StoreKey) -> None:
+    # Ошибка сервера не сохраняется: повтор должен выполниться заново
+    user_id, key = store_key
+    async with async_session() as db:
+        await db.execute(delete(IdempotencyKey).where(
+            IdempotencyKey.user_id == user_id, IdempotencyKey.key == key
+        ))
+        await db.commit()
+
+
+async def _execute(
+    store_key: StoreKey,
+    fingerprint: str,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int
+) -> Tuple[StoredResponse, bool]:
+    stored = await _reserve(store_key, fingerprint)
+    if stored is not None:
+        return stored, True
+
+    try:
+        result = await handler()
+        stored = StoredResponse(fingerprint, status_code, jsonable_encoder(result))
+    except HTTPException as e:
+        if e.status_code >= 500:
+            await _release(store_key)
+            raise
+        # Отказ бизнес-логики (400, 403, 404) - тоже результат первого запроса
+        stored = StoredResponse(fingerprint, e.status_code, {"detail": e.detail})
+    except BaseException:
+        await _release(store_key)
+        raise
+
+    await _record(store_key, stored)
+    return stored, False
+
+
+async def run_idempotent(
+    key: Optional[str],
+    user_id: int,
+    scope: str,
+    payload: Any,
+    handler: Callable[[], Awaitable[Any]],
+    status_code: int = 200
+):
+    """Выполняет handler не больше одного раза на (user_id, Idempotency-Key).
+
+    Без ключа handler просто вызывается. С ключом результат первого
+    запроса (успех или 4xx) сохраняется в in-process LRU и в таблице
+    idempotency_keys, а повторы получают его без повторного выполнения.
+    Одновременный повтор в этом процессе ждёт тот же future, в другом
+    воркере - опрашивает строку-заглушку в БД. handler должен вернуть
+    значение, пригодное для jsonable_encoder (ORM-объекты - через схему).
+    """
+    if key is None:
+        return await handler()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be 1-{MAX_KEY_LENGTH} characters")
+
+    store_key = (user_id, key)
+    fingerprint = request_fingerprint(scope, payload)
+
+    stored = idempotency_cache.get(store_key)
+    if stored is not None:
+        return _replay(stored, fingerprint)
+
+    in_flight = _in_flight.get(store_key)
+    if in_flight is not None:
+        stored = await asyncio.shield(in_flight)
+        return _replay(stored, fingerprint)
+
+    future = asyncio.get_running_loop().create_future()
+    _in_flight[store_key] = future
+    try:
+        stored, replayed = await _execute(store_key, fingerprint, handler, status_code)
+        future.set_result(stored)
+    except Exception as e:
+        future.set_exception(e)
+        raise
+    finally:
+        _in_flight.pop(store_key, None)
+        if not future.done():
+            future.cancel()
+        # Исключение, которое никто не ждал, не должно попасть в лог asyncio
+        if future.done() and not future.cancelled():
+            future.exception()
+
+    idempotency_cache.set(store_key, stored)
+    if replayed:
+        return _replay(stored, fingerprint)
+    return JSONResponse(status_code=stored.status_code, content=stored.body)
+
+
+async def purge_expired_keys() -> int:
+    async with async_session() as db:
+        result = await db.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at < datetime.utcnow()))
+        await db.commit()
+        return result.rowcount
+
+
+async def purge_expired_keys_forever() -> None:
+    while True:
+        await asyncio.sleep(IDEMPOTENCY_PURGE_INTERVAL)
+        try:
+            purged = await purge_expired_keys()
+            if purged:
+                logger.info(f"Purged {purged} expired idempotency keys")
+        except Exception as e:
+            logger.error(f"Error purging idempotency keys: {e}")
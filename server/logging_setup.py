@@ -0,0 +1,170 @@
+# server/logging_setup.py
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import traceback
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+from server.cache import caches
+
+# Общий уровень и переопределения по модулям: LOG_LEVELS="server.crud.task=WARNING,sqlalchemy.engine=WARNING"
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_LEVELS = os.getenv("LOG_LEVELS", "")
+# json - одна JSON-запись на строку, text - привычный человекочитаемый вид для локальной разработки
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")
+# Доля сохраняемых INFO/DEBUG-записей: LOG_SAMPLE_RATES="server.routers.task=0.1"; WARNING и выше не сэмплируются
+LOG_SAMPLE_RATES = os.getenv("LOG_SAMPLE_RATES", "")
+# Предел очереди записей; при переполнении запись отбрасывается, а не блокирует event loop
+LOG_QUEUE_MAX_SIZE = int(os.getenv("LOG_QUEUE_MAX_SIZE", "10000"))
+
+# Атрибуты LogRecord, которые не являются пользовательскими полями из extra=
+_RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+
+_listener: Optional[QueueListener] = None
+# Трейсбек в том же виде, что у стандартного Formatter
+_EXCEPTION_FORMATTER = logging.Formatter()
+
+
+def _parse_pairs(value: str) -> Dict[str, str]:
+    # "a=1,b=2" -> {"a": "1", "b": "2"}
+    pairs = {}
+    for item in value.split(","):
+        if "=" in item:
+            name, setting = item.split("=", 1)
+            pairs[name.strip()] = setting.strip()
+    return pairs
+
+
+class JsonFormatter(logging.Formatter):
+    """Структурированная запись: время, уровень, логгер, сообщение и поля из extra=."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = "".join(traceback.format_exception(*record.exc_info))
+        elif record.exc_text:
+            # Трейсбек уже собран в NonBlockingQueueHandler.prepare
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    # Срезает долю INFO/DEBUG по префиксу имени логгера до того, как запись попадёт в очередь
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        # Длинные префиксы проверяются первыми: server.crud.task точнее, чем server.crud
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+        self.sampled_out = 0
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.INFO or not self.rates:
+            return True
+        for prefix, rate in self.rates:
+            if record.name == prefix or record.name.startswith(prefix + "."):
+                if random.random() < rate:
+                    return True
+                self.sampled_out += 1
+                return False
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """QueueHandler, который не блокирует вызывающий поток.
+
+    Как и стандартный prepare(), сообщение (msg % args) и трейсбек
+    собираются ещё в потоке запроса: аргументы могут измениться, а
+    exc_info - перестать быть актуальным к моменту, когда запись дойдёт
+    до потока QueueListener. В отличие от стандартного, поля из extra=
+    сохраняются - их выводит JsonFormatter. Переполненная очередь не
+    блокирует, запись отбрасывается и учитывается в счётчике.
+    """
+
+    def __init__(self, log_queue: "queue.Queue"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Копия: другие обработчики того же логгера должны видеть исходную запись
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = _EXCEPTION_FORMATTER.formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def stats(self) -> dict:
+        return {
+            "queue_depth": self.queue.qsize(),
+            "dropped": self.dropped,
+            "sampled_out": sum(f.sampled_out for f in self.filters if isinstance(f, SamplingFilter)),
+        }
+
+
+def setup_logging() -> None:
+    # Единая настройка для всего процесса; повторный вызов ничего не делает
+    global _listener
+    if _listener is not None:
+        return
+
+    if LOG_FORMAT == "json":
+        formatter = JsonFormatter()
+    else:
+        formatter = logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+
+    log_queue = queue.Queue(LOG_QUEUE_MAX_SIZE)
+    queue_handler = NonBlockingQueueHandler(log_queue)
+    queue_handler.addFilter(SamplingFilter({name: float(rate) for name, rate in _parse_pairs(LOG_SAMPLE_RATES).items()}))
+
+    caches["logging"] = queue_handler
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(queue_handler)
+    root.setLevel(LOG_LEVEL.upper())
+    for name, level in _parse_pairs(LOG_LEVELS).items():
+        logging.getLogger(name).setLevel(level.upper())
+
+    # uvicorn ставит свои обработчики с синхронной записью в stdout - переводим его логгеры на общую очередь
+    for name in ("uvicorn", "uvicorn.error", "uvicorn.access"):
+        uvicorn_logger = logging.getLogger(name)
+        uvicorn_logger.handlers.clear()
+        uvicorn_logger.propagate = True
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(stop_logging)
+
+
+def stop_logging() -> None:
+    # Дописывает оставшиеся в очереди записи и останавливает поток; вызывается из atexit,
+    # после того как отработали все логгеры, включая завершение uvicorn
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
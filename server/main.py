@@ -1,11 +1,58 @@
 # app/main.py
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi.routing import APIRoute
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from server.routers import logs, telegram, task, users, news, wallet_transactions
-from fastapi.staticfiles import StaticFiles
+from server.routers import logs, telegram, task, users, news, wallet_transactions, internal, texts
+from server.static_assets import static_bundle
+from server.services.task_catalog import task_catalog
+from server.services.claim_buffer import claim_buffer
+from server.services.log_ingest import log_ingestor
+from server.services.hot_counters import hot_counters
+from server.services.task_lifecycle import task_lifecycle
+from server.services.points_snapshots import points_snapshotter
+from server.services.text_catalog import text_catalog
+from server.services.reference_data import reference_data
+from server.pagination import NEXT_CURSOR_HEADER
+from server.idempotency import IDEMPOTENT_REPLAY_HEADER, purge_expired_keys_forever
+from server.logging_setup import setup_logging
+
+# Записи логов уходят в очередь, в stdout их пишет отдельный поток
+setup_logging()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Фоновые задачи живут столько же, сколько приложение
+    # Манифест бандла со сжатыми вариантами строится один раз, вне event loop
+    await asyncio.to_thread(static_bundle.load)
+    await reference_data.load()
+    await task_catalog.load()
+    await hot_counters.load()
+    await text_catalog.load()
+    claim_flusher = asyncio.create_task(claim_buffer.run())
+    log_flusher = asyncio.create_task(log_ingestor.run())
+    background_tasks = [
+        asyncio.create_task(task_catalog.refresh_forever()),
+        asyncio.create_task(hot_counters.maintain_forever()),
+        asyncio.create_task(task_lifecycle.run_forever()),
+        asyncio.create_task(purge_expired_keys_forever()),
+        asyncio.create_task(points_snapshotter.run_forever()),
+        asyncio.create_task(text_catalog.refresh_forever()),
+        asyncio.create_task(reference_data.refresh_forever()),
+    ]
+    yield
+    # Подтверждённые, но ещё не записанные claim дописываются до остановки
+    await claim_buffer.close(claim_flusher)
+    await log_ingestor.close(log_flusher)
+    for background_task in background_tasks:
+        background_task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # CORS settings
 origins = [
@@ -19,6 +66,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, IDEMPOTENT_REPLAY_HEADER, "ETag"],
 )
 # Подключение модульных роутеров
 app.include_router(logs, prefix="/api/logs", tags=["logs"])
@@ -27,11 +75,13 @@ app.include_router(task, prefix="/api/task", tags=["task"])
 app.include_router(users, prefix="/api/users", tags=["users"])
 app.include_router(news, prefix="/api/news", tags=["news"])
 app.include_router(wallet_transactions, prefix="/api/wallet", tags=["wallet"])
+app.include_router(internal, prefix="/api/internal", tags=["internal"])
+app.include_router(texts, prefix="/api/texts", tags=["texts"])
 
 # app.include_router(admin, prefix="/api/admin", tags=["admin"])
 
 
-app.mount("/", StaticFiles(directory="server/static", html=True), name="static")
+app.mount("/", static_bundle, name="static")
 
 for route in app.routes:
     if isinstance(route, APIRoute):
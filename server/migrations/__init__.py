@@ -0,0 +1,121 @@
+# server/migrations/__init__.py
+import importlib
+import logging
+import pkgutil
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from server.migrations import versions
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_TABLE = "schema_migrations"
+
+
+def load_migrations():
+    # Каждый модуль в versions/ объявляет VERSION, NAME и async upgrade(conn)
+    migrations = []
+    for module_info in pkgutil.iter_modules(versions.__path__):
+        module = importlib.import_module(f"{versions.__name__}.{module_info.name}")
+        migrations.append(module)
+    migrations.sort(key=lambda module: module.VERSION)
+
+    seen = set()
+    for module in migrations:
+        if module.VERSION in seen:
+            raise RuntimeError(f"Duplicate migration version {module.VERSION}")
+        seen.add(module.VERSION)
+    return migrations
+
+
+async def _ensure_migrations_table(conn: AsyncConnection) -> None:
+    await conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {MIGRATIONS_TABLE} ("
+        " version INT PRIMARY KEY,"
+        " name VARCHAR(255) NOT NULL,"
+        " applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP"
+        ")"
+    ))
+
+
+async def _applied_versions(conn: AsyncConnection) -> set:
+    result = await conn.execute(text(f"SELECT version FROM {MIGRATIONS_TABLE}"))
+    return set(result.scalars().all())
+
+
+async def _record(conn: AsyncConnection, module) -> None:
+    await conn.execute(
+        text(f"INSERT INTO {MIGRATIONS_TABLE} (version, name) VALUES (:version, :name)"),
+        {"version": module.VERSION, "name": module.NAME}
+    )
+
+
+async def run_migrations(engine: AsyncEngine) -> list:
+    applied_now = []
+    async with engine.begin() as conn:
+        await _ensure_migrations_table(conn)
+        applied = await _applied_versions(conn)
+
+    for module in load_migrations():
+        if module.VERSION in applied:
+            continue
+        logger.info(f"Applying migration {module.VERSION}: {module.NAME}")
+        # DDL в MySQL коммитится неявно, поэтому каждая миграция идемпотентна сама по себе
+        async with engine.begin() as conn:
+            await module.upgrade(conn)
+            await _record(conn, module)
+        applied_now.append(module.VERSION)
+    return applied_now
+
+
+async def stamp_head(engine: AsyncEngine) -> None:
+    # Схема создана через metadata.create_all и уже содержит всё из миграций
+    async with engine.begin() as conn:
+        await _ensure_migrations_table(conn)
+        applied = await _applied_versions(conn)
+        for module in load_migrations():
+            if module.VERSION not in applied:
+                await _record(conn, module)
+
+
+async def index_exists(conn: AsyncConnection, table: str, index_name: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM information_schema.statistics"
+            " WHERE table_schema = DATABASE() AND table_name = :table AND index_name = :index_name"
+            " LIMIT 1"
+        ),
+        {"table": table, "index_name": index_name}
+    )
+    return result.first() is not None
+
+
+async def column_exists(conn: AsyncConnection, table: str, column_name: str) -> bool:
+    result = await conn.execute(
+        text(
+            "SELECT 1 FROM information_schema.columns"
+            " WHERE table_schema = DATABASE() AND table_name = :table AND column_name = :column_name"
+            " LIMIT 1"
+        ),
+        {"table": table, "column_name": column_name}
+    )
+    return result.first() is not None
+
+
+async def create_index_if_missing(
+    conn: AsyncConnection,
+    table: str,
+    index_name: str,
+    columns: list,
+    unique: bool = False
+) -> None:
+    if await index_exists(conn, table, index_name):
+        logger.info(f"Index {index_name} on {table} already exists, skipping")
+        return
+    kind = "UNIQUE INDEX" if unique else "INDEX"
+    # ALGORITHM=INPLACE, LOCK=NONE: индекс строится без блокировки записи в таблицу
+    await conn.execute(text(
+        f"ALTER TABLE {table} ADD {kind} {index_name} ({', '.join(columns)}),"
+        " ALGORITHM=INPLACE, LOCK=NONE"
+    ))
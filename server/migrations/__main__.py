@@ -0,0 +1,20 @@
+# python -m server.migrations
+import asyncio
+import logging
+
+from server.database import engine
+from server.migrations import run_migrations
+
+
+async def main():
+    applied = await run_migrations(engine)
+    if applied:
+        print(f"Applied migrations: {', '.join(str(version) for version in applied)}")
+    else:
+        print("Database schema is up to date")
+    await engine.dispose()
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main())
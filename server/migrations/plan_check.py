@@ -0,0 +1,95 @@
+# python -m server.migrations.plan_check
+#
+# Прогоняет EXPLAIN для горячих запросов из server/crud на локальной БД
+# и завершается с кодом 1, если хоть один из них читает таблицу целиком.
+# Запускать на базе с данными, близкими к боевым: на пустых таблицах
+# оптимизатор MySQL охотно выбирает полный скан.
+import asyncio
+import sys
+from datetime import datetime
+
+from sqlalchemy import select, func, text
+from sqlalchemy.dialects import mysql
+
+from server.database import engine
+from server.models import User, Task, TaskClick, Referral, WalletTransaction, PointsLedger, PointsSnapshot
+from server.services.reference_data import TaskStatusId, TaskTypeId
+
+SAMPLE_TELEGRAM_ID = 7154683616
+SAMPLE_USER_ID = 1
+SAMPLE_TASK_IDS = [1, 2, 3]
+SAMPLE_CREATED_AT = datetime(2024, 1, 1)
+
+# type из EXPLAIN, означающие чтение всей таблицы или всего индекса
+FULL_SCAN_TYPES = {"ALL", "index"}
+
+
+def hot_queries():
+    return {
+        "get_user_by_telegram_id": select(User).where(User.telegram_id == SAMPLE_TELEGRAM_ID),
+        "get_user_by_referral_code": select(User).where(User.referral_code == "ABCDEFGH"),
+        "task_catalog.load": select(Task).where(Task.status_id == TaskStatusId.ACTIVE, Task.completed_clicks < Task.total_clicks),
+        "get_tasks_with_type.hydrate": select(Task).where(
+            Task.id.in_(SAMPLE_TASK_IDS), Task.status_id == TaskStatusId.ACTIVE, Task.completed_clicks < Task.total_clicks
+        ),
+        "claimed_task_index.get": select(TaskClick.task_id).where(TaskClick.user_id == SAMPLE_TELEGRAM_ID),
+        "claim_task_in_db.duplicate_check": select(TaskClick).where(
+            TaskClick.task_id == SAMPLE_TASK_IDS[0], TaskClick.user_id == SAMPLE_TELEGRAM_ID
+        ),
+        "get_active_tasks_by_user_id": select(Task)
+            .where(Task.user_id == SAMPLE_TELEGRAM_ID, Task.status_id == TaskStatusId.ACTIVE, Task.task_type_id == TaskTypeId.BOT)
+            .order_by(Task.created_at.desc(), Task.id.desc()).limit(21),
+        "get_archived_tasks_by_user_id": select(Task)
+            .where(Task.user_id == SAMPLE_TELEGRAM_ID, Task.status_id.in_(TaskStatusId.ARCHIVED))
+            .order_by(Task.created_at.desc(), Task.id.desc()).limit(21),
+        "get_wallet_transactions": select(WalletTransaction)
+            .where(WalletTransaction.user_id == SAMPLE_USER_ID, WalletTransaction.created_at < SAMPLE_CREATED_AT)
+            .order_by(WalletTransaction.created_at.desc(), WalletTransaction.id.desc()).limit(21),
+        "task_lifecycle.page": select(Task.id, Task.created_at)
+            .where(Task.status_id == TaskStatusId.ACTIVE, Task.created_at > SAMPLE_CREATED_AT)
+            .order_by(Task.created_at, Task.id).limit(200),
+        "task_lifecycle.recent_click": select(TaskClick.id)
+            .where(TaskClick.task_id == SAMPLE_TASK_IDS[0], TaskClick.clicked_at >= SAMPLE_CREATED_AT).limit(1),
+        "get_balance_as_of.snapshot": select(PointsSnapshot.ledger_id, PointsSnapshot.balance)
+            .where(PointsSnapshot.user_id == SAMPLE_TELEGRAM_ID, PointsSnapshot.created_at <= SAMPLE_CREATED_AT)
+            .order_by(PointsSnapshot.created_at.desc(), PointsSnapshot.ledger_id.desc()).limit(1),
+        "get_balance_as_of.tail": select(func.sum(PointsLedger.delta))
+            .where(PointsLedger.user_id == SAMPLE_TELEGRAM_ID, PointsLedger.id > 0, PointsLedger.created_at <= SAMPLE_CREATED_AT),
+        "get_users_referrals": select(User.username)
+            .join(Referral, Referral.referred_id == User.id)
+            .where(Referral.referrer_id == SAMPLE_USER_ID),
+    }
+
+
+def compile_query(query) -> str:
+    return str(query.compile(dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}))
+
+
+async def check_plans() -> list:
+    failures = []
+    async with engine.connect() as conn:
+        for name, query in hot_queries().items():
+            result = await conn.execute(text(f"EXPLAIN {compile_query(query)}"))
+            for row in result.mappings().all():
+                scan_type = row.get("type")
+                status = "FULL SCAN" if scan_type in FULL_SCAN_TYPES else "ok"
+                print(f"[{status}] {name}: table={row.get('table')} type={scan_type} key={row.get('key')} rows={row.get('rows')}")
+                if scan_type in FULL_SCAN_TYPES:
+                    failures.append((name, row.get("table")))
+    await engine.dispose()
+    return failures
+
+
+def main() -> int:
+    failures = asyncio.run(check_plans())
+    if failures:
+        print(f"\n{len(failures)} hot queries fall back to a full scan:")
+        for name, table in failures:
+            print(f"  {name} ({table})")
+        return 1
+    print("\nAll hot queries use indexes")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
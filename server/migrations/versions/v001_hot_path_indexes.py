@@ -0,0 +1,28 @@
+# Составные индексы под горячие запросы из server/crud
+from sqlalchemy import text
+
+from server.migrations import create_index_if_missing, index_exists
+
+VERSION = 1
+NAME = "hot_path_indexes"
+
+
+async def upgrade(conn):
+    # Индекс claimed-задач пользователя и проверка повторного клика
+    await create_index_if_missing(conn, "task_clicks", "ix_task_clicks_user_task", ["user_id", "task_id"])
+    # Каталог активных заданий и фильтр ленты по типу
+    await create_index_if_missing(conn, "tasks", "ix_tasks_status_type_user", ["status_id", "task_type_id", "user_id"])
+    # Списки "мои активные/архивные" с keyset-пагинацией по (created_at, id)
+    await create_index_if_missing(conn, "tasks", "ix_tasks_user_status_created", ["user_id", "status_id", "created_at"])
+    await create_index_if_missing(conn, "wallet_transactions", "ix_wallet_transactions_user_created", ["user_id", "created_at"])
+    await create_index_if_missing(conn, "users", "ix_users_created_at", ["created_at"])
+    await create_index_if_missing(conn, "referrals", "ix_referrals_referrer", ["referrer_id"])
+    # Приглашённый пользователь учитывается один раз (см. signup_user)
+    if not await index_exists(conn, "referrals", "uq_referrals_referred"):
+        # Повторные приглашения, которые успела записать старая гонка в регистрации, - оставляем самое раннее
+        await conn.execute(text(
+            "DELETE newer FROM referrals newer"
+            " JOIN referrals older"
+            " ON older.referred_id = newer.referred_id AND older.id < newer.id"
+        ))
+        await create_index_if_missing(conn, "referrals", "uq_referrals_referred", ["referred_id"], unique=True)
@@ -0,0 +1,19 @@
+# Уникальность клика (task_id, user_id) для атомарного claim_task_in_db
+from sqlalchemy import text
+
+from server.migrations import create_index_if_missing, index_exists
+
+VERSION = 2
+NAME = "task_clicks_unique"
+
+
+async def upgrade(conn):
+    if await index_exists(conn, "task_clicks", "uq_task_clicks_task_user"):
+        return
+    # Повторные клики, которые успела записать старая гонка в claim, - оставляем самый ранний
+    await conn.execute(text(
+        "DELETE newer FROM task_clicks newer"
+        " JOIN task_clicks older"
+        " ON older.task_id = newer.task_id AND older.user_id = newer.user_id AND older.id < newer.id"
+    ))
+    await create_index_if_missing(conn, "task_clicks", "uq_task_clicks_task_user", ["task_id", "user_id"], unique=True)
@@ -0,0 +1,25 @@
+# Шардированный счётчик кликов для горячих задач (server/services/hot_counters.py)
+from sqlalchemy import text
+
+from server.migrations import column_exists
+
+VERSION = 3
+NAME = "task_counter_shards"
+
+
+async def upgrade(conn):
+    if not await column_exists(conn, "tasks", "counter_shards"):
+        # INSTANT: новая колонка с DEFAULT добавляется без перестройки таблицы
+        await conn.execute(text(
+            "ALTER TABLE tasks ADD COLUMN counter_shards INT NOT NULL DEFAULT 0, ALGORITHM=INSTANT"
+        ))
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS task_click_shards ("
+        " task_id INT NOT NULL,"
+        " shard INT NOT NULL,"
+        " budget INT NOT NULL,"
+        " clicks INT NOT NULL DEFAULT 0,"
+        " PRIMARY KEY (task_id, shard),"
+        " CONSTRAINT fk_task_click_shards_task FOREIGN KEY (task_id) REFERENCES tasks (id) ON DELETE CASCADE"
+        ")"
+    ))
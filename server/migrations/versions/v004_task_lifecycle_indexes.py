@@ -0,0 +1,12 @@
+# Индексы для фонового sweeper'а жизненного цикла задач (server/services/task_lifecycle.py)
+from server.migrations import create_index_if_missing
+
+VERSION = 4
+NAME = "task_lifecycle_indexes"
+
+
+async def upgrade(conn):
+    # Обход активных задач пачками по (created_at, id)
+    await create_index_if_missing(conn, "tasks", "ix_tasks_status_created", ["status_id", "created_at"])
+    # Был ли клик по задаче после порога простоя
+    await create_index_if_missing(conn, "task_clicks", "ix_task_clicks_task_clicked", ["task_id", "clicked_at"])
@@ -0,0 +1,21 @@
+# Хранилище результатов запросов с заголовком Idempotency-Key (server/idempotency.py)
+from sqlalchemy import text
+
+VERSION = 5
+NAME = "idempotency_keys"
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS idempotency_keys ("
+        " user_id BIGINT NOT NULL,"
+        " `key` VARCHAR(64) NOT NULL,"
+        " fingerprint VARCHAR(64) NOT NULL,"
+        " status_code INT NULL,"
+        " response TEXT NULL,"
+        " created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        " expires_at TIMESTAMP NOT NULL,"
+        " PRIMARY KEY (user_id, `key`),"
+        " INDEX ix_idempotency_keys_expires_at (expires_at)"
+        ")"
+    ))
@@ -0,0 +1,43 @@
+# Журнал движения баллов и снапшоты балансов (server/crud/points.py)
+from sqlalchemy import text
+
+VERSION = 6
+NAME = "points_ledger"
+
+OPENING_BALANCE = "opening_balance"
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS points_ledger ("
+        " id BIGINT NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        " user_id BIGINT NOT NULL,"
+        " delta BIGINT NOT NULL,"
+        " reason VARCHAR(32) NOT NULL,"
+        " ref_id BIGINT NULL,"
+        " created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        " INDEX ix_points_ledger_user_id (user_id, id)"
+        ")"
+    ))
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS points_snapshots ("
+        " user_id BIGINT NOT NULL,"
+        " ledger_id BIGINT NOT NULL,"
+        " balance BIGINT NOT NULL,"
+        " created_at TIMESTAMP NOT NULL,"
+        " PRIMARY KEY (user_id, ledger_id),"
+        " INDEX ix_points_snapshots_user_created (user_id, created_at),"
+        " INDEX ix_points_snapshots_ledger (ledger_id)"
+        ")"
+    ))
+    # Текущие балансы становятся первой записью журнала: сумма журнала = users.points.
+    # Миграцию запускать до выкладки кода, который пишет в журнал.
+    existing = await conn.execute(text("SELECT 1 FROM points_ledger WHERE reason = :reason LIMIT 1"), {"reason": OPENING_BALANCE})
+    if existing.first() is None:
+        await conn.execute(
+            text(
+                "INSERT INTO points_ledger (user_id, delta, reason)"
+                " SELECT telegram_id, points, :reason FROM users WHERE points IS NOT NULL AND points <> 0"
+            ),
+            {"reason": OPENING_BALANCE}
+        )
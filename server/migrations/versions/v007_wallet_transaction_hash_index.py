@@ -0,0 +1,9 @@
+# Поиск транзакций по hash при пакетном проведении (server/crud/wallet.py)
+from server.migrations import create_index_if_missing
+
+VERSION = 7
+NAME = "wallet_transaction_hash_index"
+
+
+async def upgrade(conn):
+    await create_index_if_missing(conn, "wallet_transactions", "ix_wallet_transactions_hash", ["transaction_hash"])
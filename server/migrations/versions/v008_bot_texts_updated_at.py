@@ -0,0 +1,16 @@
+# Штамп версии каталога текстов (server/services/text_catalog.py)
+from sqlalchemy import text
+
+from server.migrations import column_exists
+
+VERSION = 8
+NAME = "bot_texts_updated_at"
+
+
+async def upgrade(conn):
+    if not await column_exists(conn, "bot_texts", "updated_at"):
+        # Таблица маленькая, перестройка ради DEFAULT CURRENT_TIMESTAMP дешёвая
+        await conn.execute(text(
+            "ALTER TABLE bot_texts ADD COLUMN updated_at TIMESTAMP NOT NULL"
+            " DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP"
+        ))
@@ -0,0 +1,22 @@
+# Подтверждённые клиенту claim из буфера write-behind, которые не удалось применить (server/services/claim_buffer.py)
+from sqlalchemy import text
+
+VERSION = 9
+NAME = "claim_dead_letters"
+
+
+async def upgrade(conn):
+    await conn.execute(text(
+        "CREATE TABLE IF NOT EXISTS claim_dead_letters ("
+        " id INT NOT NULL AUTO_INCREMENT PRIMARY KEY,"
+        " task_id INT NOT NULL,"
+        " user_id BIGINT NOT NULL,"
+        " points INT NOT NULL,"
+        " attempts INT NOT NULL,"
+        " error VARCHAR(32) NOT NULL,"
+        " details TEXT NULL,"
+        " accepted_at TIMESTAMP NOT NULL,"
+        " created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,"
+        " INDEX ix_claim_dead_letters_user_id (user_id)"
+        ")"
+    ))
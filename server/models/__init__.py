@@ -7,6 +7,10 @@ from .wallet_transactions import WalletTransaction
 from .log import Log
 from .bot_texts import BotText
 from .task_clicks import TaskClick
+from .task_click_shards import TaskClickShard
 from .task_status import TaskStatus
 from .task_types import TaskType
-from .news import News
\ No newline at end of file
+from .news import News
+from .idempotency_keys import IdempotencyKey
+from .points_ledger import PointsLedger, PointsSnapshot
+from .claim_dead_letters import ClaimDeadLetter
@@ -12,6 +12,12 @@ class BotText(Base):
     message_key = Column(String(100), nullable=False)
     language_code = Column(String(5), ForeignKey('languages.code'), nullable=False)
     text_content = Column(Text, nullable=False)
+    # Вместе с COUNT(*) и MAX(id) даёт штамп версии каталога текстов
+    updated_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP')
+    )
 
     language = relationship("Language", back_populates="bot_texts")
 
@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, TIMESTAMP, text, Index
+
+from .base import Base
+
+class ClaimDeadLetter(Base):
+    __tablename__ = 'claim_dead_letters'
+
+    id = Column(Integer, primary_key=True)
+    task_id = Column(Integer, nullable=False)  # Задача из подтверждённого клиенту claim
+    user_id = Column(BigInteger, nullable=False)  # telegram_id пользователя
+    points = Column(Integer, nullable=False)  # Награда, обещанная при подтверждении
+    attempts = Column(Integer, nullable=False)  # Сколько раз claim пытались применить
+    error = Column(String(32), nullable=False)  # rejected - квота или дубль, failed - ошибки БД исчерпали повторы
+    details = Column(Text)  # Текст последней ошибки
+    accepted_at = Column(TIMESTAMP, nullable=False)  # Когда claim был подтверждён клиенту (UTC)
+    created_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP')
+    )
+
+    __table_args__ = (
+        # Разбор по пользователю при ручной сверке
+        Index('ix_claim_dead_letters_user_id', 'user_id'),
+    )
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Text, BigInteger, TIMESTAMP, text, Index
+
+from .base import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = 'idempotency_keys'
+
+    user_id = Column(BigInteger, primary_key=True)  # telegram_id автора запроса
+    key = Column(String(64), primary_key=True)  # Значение заголовка Idempotency-Key
+    fingerprint = Column(String(64), nullable=False)  # sha256 эндпоинта и тела первого запроса
+    status_code = Column(Integer, nullable=True)  # NULL, пока первый запрос выполняется
+    response = Column(Text, nullable=True)  # JSON-тело ответа первого запроса
+    created_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP')
+    )
+    expires_at = Column(TIMESTAMP, nullable=False)
+
+    __table_args__ = (
+        # Очистка истёкших ключей
+        Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
@@ -0,0 +1,38 @@
+from sqlalchemy import Column, BigInteger, String, TIMESTAMP, text, Index
+
+from .base import Base
+
+class PointsLedger(Base):
+    __tablename__ = 'points_ledger'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    user_id = Column(BigInteger, nullable=False)  # telegram_id; без внешнего ключа, журнал переживает удаление пользователя
+    delta = Column(BigInteger, nullable=False)  # Изменение баланса в целых баллах
+    reason = Column(String(32), nullable=False)  # Код причины (см. server/crud/points.py)
+    ref_id = Column(BigInteger, nullable=True)  # Задача, транзакция или приглашённый пользователь
+    created_at = Column(
+        TIMESTAMP,
+        nullable=False,
+        server_default=text('CURRENT_TIMESTAMP')
+    )
+
+    __table_args__ = (
+        # Хвост журнала пользователя после снапшота
+        Index('ix_points_ledger_user_id', 'user_id', 'id'),
+    )
+
+
+class PointsSnapshot(Base):
+    __tablename__ = 'points_snapshots'
+
+    user_id = Column(BigInteger, primary_key=True)  # telegram_id
+    ledger_id = Column(BigInteger, primary_key=True)  # Последняя запись журнала, вошедшая в баланс
+    balance = Column(BigInteger, nullable=False)  # Баланс после записи ledger_id
+    created_at = Column(TIMESTAMP, nullable=False)  # Время записи ledger_id
+
+    __table_args__ = (
+        # Последний снапшот пользователя на момент времени
+        Index('ix_points_snapshots_user_created', 'user_id', 'created_at'),
+        # Граница уже свёрнутой части журнала
+        Index('ix_points_snapshots_ledger', 'ledger_id'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, TIMESTAMP, text, BigInteger
+from sqlalchemy import Column, Integer, ForeignKey, TIMESTAMP, text, BigInteger, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -17,3 +17,9 @@ class Referral(Base):
 
     referrer = relationship("User", back_populates="referrals_record", foreign_keys=[referrer_id])
     referred = relationship("User", back_populates="referrals_received", foreign_keys=[referred_id])  # Добавлено back_populates
+
+    __table_args__ = (
+        Index('ix_referrals_referrer', 'referrer_id'),
+        # Пользователя можно пригласить только один раз
+        UniqueConstraint('referred_id', name='uq_referrals_referred'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Date, TIMESTAMP, text, BigInteger
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Text, Date, TIMESTAMP, text, BigInteger, Index
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -16,6 +16,7 @@ class Task(Base):
     reward_per_click = Column(Integer, nullable=False)  # Сколько платит создатель задачи за клик
     status_id = Column(Integer, ForeignKey('task_status.id', ondelete='SET NULL'))  # Статус задачи (может стать NULL при удалении статуса)
     is_premium_only = Column(Boolean, default=False)  # Задача доступна только премиум-пользователям
+    counter_shards = Column(Integer, nullable=False, default=0, server_default=text('0'))  # Число слотов счётчика кликов (0 - счётчик в completed_clicks)
     reserved_points = Column(Integer, nullable=False)  # Зарезервированные баллы для задачи
     created_at = Column(
         TIMESTAMP,
@@ -33,3 +34,13 @@ class Task(Base):
     task_type = relationship("TaskType", back_populates="tasks")
     status = relationship("TaskStatus", back_populates="tasks")  # Обратная связь с TaskStatus
     task_clicks = relationship("TaskClick", back_populates="task", cascade="all, delete-orphan")  # Обратная связь с TaskClick
+    click_shards = relationship("TaskClickShard", back_populates="task", cascade="all, delete-orphan")  # Слоты счётчика горячей задачи
+
+    __table_args__ = (
+        # Каталог активных заданий и фильтр ленты по типу
+        Index('ix_tasks_status_type_user', 'status_id', 'task_type_id', 'user_id'),
+        # Списки заданий пользователя с keyset-пагинацией по (created_at, id)
+        Index('ix_tasks_user_status_created', 'user_id', 'status_id', 'created_at'),
+        # Обход активных задач фоновым sweeper'ом по (created_at, id)
+        Index('ix_tasks_status_created', 'status_id', 'created_at'),
+    )
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, ForeignKey
+from sqlalchemy.orm import relationship
+
+from .base import Base
+
+class TaskClickShard(Base):
+    __tablename__ = 'task_click_shards'
+
+    task_id = Column(Integer, ForeignKey('tasks.id', ondelete='CASCADE'), primary_key=True)  # Горячая задача
+    shard = Column(Integer, primary_key=True)  # Номер слота счётчика
+    budget = Column(Integer, nullable=False)  # Сколько кликов может принять этот слот
+    clicks = Column(Integer, nullable=False, default=0)  # Сколько кликов слот уже принял
+
+    task = relationship("Task", back_populates="click_shards")
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BigInteger, ForeignKey, TIMESTAMP, text
+from sqlalchemy import Column, Integer, BigInteger, ForeignKey, TIMESTAMP, text, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -14,3 +14,11 @@ class TaskClick(Base):
     # Отношения с другими таблицами
     task = relationship("Task", back_populates="task_clicks")  # Связь с таблицей Task
     user = relationship("User", back_populates="task_clicks")  # Связь с таблицей User
+
+    __table_args__ = (
+        Index('ix_task_clicks_user_task', 'user_id', 'task_id'),
+        # Последний клик по задаче - проверка простоя в sweeper'е
+        Index('ix_task_clicks_task_clicked', 'task_id', 'clicked_at'),
+        # Пользователь выполняет задачу не больше одного раза
+        UniqueConstraint('task_id', 'user_id', name='uq_task_clicks_task_user'),
+    )
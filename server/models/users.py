@@ -1,6 +1,6 @@
 # server/models/user.py
 
-from sqlalchemy import Column, BigInteger, String, Boolean, ForeignKey, TIMESTAMP, text
+from sqlalchemy import Column, BigInteger, String, Boolean, ForeignKey, TIMESTAMP, text, Index
 from sqlalchemy.orm import relationship
 from .base import Base
 
@@ -34,6 +34,11 @@ class User(Base):
     language = relationship("Language", back_populates="users")
     tasks = relationship("Task", back_populates="user")
     referrals_record = relationship("Referral", back_populates="referrer", foreign_keys="Referral.referrer_id")
+    referrals_received = relationship("Referral", back_populates="referred", foreign_keys="Referral.referred_id")
     wallet_transactions = relationship("WalletTransaction", back_populates="user")
     logs = relationship("Log", back_populates="user")
     task_clicks = relationship("TaskClick", back_populates="user", cascade="all, delete-orphan")  # Обратная связь с TaskClick
+
+    __table_args__ = (
+        Index('ix_users_created_at', 'created_at'),
+    )
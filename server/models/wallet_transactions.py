@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DECIMAL, ForeignKey, TIMESTAMP, text, BigInteger
+from sqlalchemy import Column, Integer, String, Enum, DECIMAL, ForeignKey, TIMESTAMP, text, BigInteger, Index
 from sqlalchemy.orm import relationship
 
 from .base import Base
@@ -19,4 +19,10 @@ class WalletTransaction(Base):
         server_default=text('CURRENT_TIMESTAMP')
     )
 
-    user = relationship("User", back_populates="wallet_transactions")
\ No newline at end of file
+    user = relationship("User", back_populates="wallet_transactions")
+
+    __table_args__ = (
+        Index('ix_wallet_transactions_user_created', 'user_id', 'created_at'),
+        # Пакетное проведение по hash транзакции
+        Index('ix_wallet_transactions_hash', 'transaction_hash'),
+    )
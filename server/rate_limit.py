@@ -0,0 +1,119 @@
+# server/rate_limit.py
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Tuple
+
+from fastapi import Depends, HTTPException
+
+from server.cache import caches
+from server.dependencies import get_session_user
+from server.schemas.user import SessionUser
+
+# Ведро на маршрут: (ёмкость - сколько запросов подряд, пополнение - запросов в секунду).
+# Переопределяется переменной RATE_LIMIT_<МАРШРУТ>="ёмкость:пополнение", например RATE_LIMIT_CLAIM_TASK="20:5"
+DEFAULT_RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "claim_task": (10, 2),
+    "create_task": (5, 0.5),
+    "auth": (5, 0.1),
+}
+# Верхняя граница числа вёдер на маршрут
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+
+def _route_limit(route: str) -> Tuple[float, float]:
+    value = os.getenv(f"RATE_LIMIT_{route.upper()}")
+    if not value:
+        return DEFAULT_RATE_LIMITS[route]
+    capacity, refill_rate = value.split(":")
+    return float(capacity), float(refill_rate)
+
+
+class TokenBucketLimiter:
+    """Token bucket на ключ (telegram_id или адрес клиента).
+
+    Ведро хранит остаток токенов и время последнего обращения, токены
+    досчитываются лениво при следующем запросе. Вёдра лежат в OrderedDict
+    в порядке последнего обращения: ведро, простоявшее дольше полного
+    пополнения, неотличимо от нового, поэтому очистка снимает такие вёдра
+    с начала словаря - O(1) амортизированно на запрос.
+    """
+
+    def __init__(self, route: str, capacity: float, refill_rate: float, max_keys: int):
+        self.route = route
+        self.capacity = capacity
+        self.refill_rate = refill_rate
+        self.max_keys = max_keys
+        self.idle_after = capacity / refill_rate
+        self._buckets: "OrderedDict[Hashable, Tuple[float, float]]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+        self.evicted = 0
+        caches[f"rate_limit:{route}"] = self
+
+    def _evict(self, now: float) -> None:
+        while self._buckets:
+            key, (tokens, updated) = next(iter(self._buckets.items()))
+            if now - updated < self.idle_after and len(self._buckets) <= self.max_keys:
+                break
+            self._buckets.popitem(last=False)
+            self.evicted += 1
+
+    def acquire(self, key: Hashable) -> float:
+        # 0 - запрос разрешён, иначе через сколько секунд появится токен
+        now = time.monotonic()
+        self._evict(now)
+        bucket = self._buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.capacity
+        else:
+            tokens, updated = bucket
+            tokens = min(self.capacity, tokens + (now - updated) * self.refill_rate)
+
+        if tokens >= 1:
+            self._buckets[key] = (tokens - 1, now)
+            self.allowed += 1
+            return 0.0
+        self._buckets[key] = (tokens, now)
+        self.rejected += 1
+        return (1 - tokens) / self.refill_rate
+
+    def check(self, key: Hashable) -> None:
+        retry_after = self.acquire(key)
+        if retry_after:
+            raise HTTPException(
+                status_code=429,
+                detail="Too many requests",
+                headers={"Retry-After": str(math.ceil(retry_after))}
+            )
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "refill_rate": self.refill_rate,
+            "buckets": len(self._buckets),
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+            "evicted": self.evicted,
+        }
+
+
+limiters: Dict[str, TokenBucketLimiter] = {
+    route: TokenBucketLimiter(route, *_route_limit(route), RATE_LIMIT_MAX_KEYS)
+    for route in DEFAULT_RATE_LIMITS
+}
+
+
+def rate_limited_user(route: str):
+    """Зависимость вместо get_session_user: отказ 429 до открытия сессии БД.
+
+    В сигнатуре эндпоинта должна стоять раньше ``Depends(get_session)``.
+    """
+    limiter = limiters[route]
+
+    async def dependency(current_user: SessionUser = Depends(get_session_user)) -> SessionUser:
+        limiter.check(current_user.telegram_id)
+        return current_user
+
+    return dependency
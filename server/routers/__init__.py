@@ -4,3 +4,5 @@ from .task import router as task
 from .users import router as users
 from .news import router as news
 from .wallet_transactions import router as wallet_transactions
+from .internal import router as internal
+from .texts import router as texts
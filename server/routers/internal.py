@@ -0,0 +1,52 @@
+# server/routers/internal.py
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.cache import caches
+from server.crud.points import get_balance_as_of
+from server.database import get_session
+from server.dependencies import get_session_user
+from server.schemas.user import SessionUser
+from server.services.reference_data import reference_data
+
+router = APIRouter()
+
+# Список ID администраторов
+ADMIN_IDS = [7154683616, 1801021065]
+
+
+def require_admin(current_user: SessionUser = Depends(get_session_user)) -> SessionUser:
+    if current_user.telegram_id not in ADMIN_IDS:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    return current_user
+
+
+@router.get("/stats")
+async def get_internal_stats(current_user: SessionUser = Depends(require_admin)):
+    return {
+        "caches": {name: cache.stats() for name, cache in caches.items()},
+    }
+
+
+@router.get("/points/{telegram_id}/balance")
+async def get_points_balance(
+    telegram_id: int,
+    as_of: Optional[datetime] = Query(None, description="Момент времени в часовом поясе БД, как points_ledger.created_at; по умолчанию - сейчас"),
+    current_user: SessionUser = Depends(require_admin),
+    db: AsyncSession = Depends(get_session)
+):
+    # NOW() БД, а не часы процесса: журнал заполняется CURRENT_TIMESTAMP
+    as_of = as_of or (await db.execute(select(func.now()))).scalar_one()
+    balance = await get_balance_as_of(db, telegram_id, as_of)
+    return {"telegram_id": telegram_id, "as_of": as_of, "balance": balance}
+
+
+@router.post("/reference-data/reload")
+async def reload_reference_data(current_user: SessionUser = Depends(require_admin)):
+    # После ручной правки task_status/task_types/languages в БД, не дожидаясь периодического обновления
+    await reference_data.load()
+    return reference_data.stats()
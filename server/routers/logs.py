@@ -1,12 +1,26 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Request
+from typing import Union
 import logging
 
+from server.schemas.log import FrontendLogBatch, FrontendLogEvent
+from server.security import decode_session_token
+from server.services.log_ingest import log_ingestor
+
 router = APIRouter()
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Приём телеметрии фронтенда: одно событие или пачка {"events": [...]}, запись в logs идёт фоном
 @router.post("/")
-async def log_from_frontend(data: dict):
-    logger.info(f"Frontend log: {data}")
-    return {"status": "success"}
+async def log_from_frontend(data: Union[FrontendLogBatch, FrontendLogEvent], request: Request):
+    # Пользователь - только из подписанного токена, без обращения к БД; анонимные события тоже принимаются
+    user_id = None
+    authorization = request.headers.get('Authorization', '')
+    if authorization.startswith('Bearer '):
+        session_user = decode_session_token(authorization[7:])
+        if session_user:
+            user_id = session_user.id
+
+    events = data.events if isinstance(data, FrontendLogBatch) else [data]
+    accepted = sum(log_ingestor.submit(user_id, event.action, event.details) for event in events)
+    return {"status": "success", "accepted": accepted, "dropped": len(events) - accepted}
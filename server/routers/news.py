@@ -1,45 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 import logging
 
 from server.database import get_session
 from server.models import News
-from server.schemas.news import NewsCreate, NewsUpdate, NewsOut
-from server.schemas.user import UserResponse
-from server.dependencies import get_current_user  # Импортируем вашу функцию
+from server.schemas.news import NewsCreate, NewsUpdate, NewsOut, NewsSummary
+from server.schemas.user import SessionUser
+from server.dependencies import get_session_user  # Импортируем вашу функцию
+from server.pagination import NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.services.news_cache import news_cache
+from server.etag import etag_response
 
 router = APIRouter()
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Список ID администраторов
 ADMIN_IDS = [7154683616, 1801021065]  # Замените на реальные ID администраторов
 
-# Получение списка новостей
-@router.get("/get_all_news/", response_model=List[NewsOut])
-async def get_news(session: AsyncSession = Depends(get_session)):
+def _counted(response: Response) -> Response:
+    # Доля 304 в статистике кэша показывает, сколько клиентов обходятся без тела
+    if response.status_code == 304:
+        news_cache.not_modified += 1
+    return response
+
+# Получение списка новостей (краткие карточки из кэша, keyset-пагинация, курсор в X-Next-Cursor)
+@router.get("/get_all_news/", response_model=List[NewsSummary])
+async def get_news(
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE)
+):
     try:
-        result = await session.execute(select(News).order_by(News.created_at.desc()))
-        news_items = result.scalars().all()
-        return news_items
+        body, etag, next_cursor = await news_cache.page(cursor, limit)
+        return _counted(etag_response(request, body, etag, {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None))
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"Ошибка при получении списка новостей: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
-# Получение конкретной новости
+# Получение конкретной новости (полный текст из того же кэша)
 @router.get("/get_news/{news_id}", response_model=NewsOut)
-async def get_news_item(news_id: int, session: AsyncSession = Depends(get_session)):
+async def get_news_item(news_id: int, request: Request):
     try:
-        result = await session.execute(select(News).where(News.id == news_id))
-        news_item = result.scalar_one_or_none()
-        if not news_item:
+        cached = await news_cache.item(news_id)
+        if not cached:
             logger.warning(f"Новость с ID {news_id} не найдена")
             raise HTTPException(status_code=404, detail="Новость не найдена")
-        return news_item
+        body, etag = cached
+        return _counted(etag_response(request, body, etag))
     except HTTPException as http_exc:
         raise http_exc
     except Exception as e:
@@ -50,7 +63,7 @@ async def get_news_item(news_id: int, session: AsyncSession = Depends(get_sessio
 @router.post("/create/", response_model=NewsOut, status_code=201)
 async def create_news(
     news: NewsCreate,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: SessionUser = Depends(get_session_user),
     session: AsyncSession = Depends(get_session)
 ):
     try:
@@ -61,6 +74,7 @@ async def create_news(
         session.add(new_news)
         await session.commit()
         await session.refresh(new_news)
+        news_cache.invalidate()
         logger.info(f"Новость с ID {new_news.id} создана пользователем {current_user.telegram_id}")
         return new_news
     except HTTPException as http_exc:
@@ -74,7 +88,7 @@ async def create_news(
 async def update_news(
     news_id: int,
     news: NewsUpdate,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: SessionUser = Depends(get_session_user),
     session: AsyncSession = Depends(get_session)
 ):
     try:
@@ -91,6 +105,7 @@ async def update_news(
         session.add(news_item)
         await session.commit()
         await session.refresh(news_item)
+        news_cache.invalidate()
         logger.info(f"Новость с ID {news_id} обновлена пользователем {current_user.telegram_id}")
         return news_item
     except HTTPException as http_exc:
@@ -103,7 +118,7 @@ async def update_news(
 @router.delete("/delete/{news_id}", status_code=204)
 async def delete_news(
     news_id: int,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: SessionUser = Depends(get_session_user),
     session: AsyncSession = Depends(get_session)
 ):
     try:
@@ -117,6 +132,7 @@ async def delete_news(
             raise HTTPException(status_code=404, detail="Новость не найдена")
         await session.delete(news_item)
         await session.commit()
+        news_cache.invalidate()
         logger.info(f"Новость с ID {news_id} удалена пользователем {current_user.telegram_id}")
         return
     except HTTPException as http_exc:
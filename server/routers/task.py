@@ -2,14 +2,18 @@
 import logging
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from server.schemas.task import TaskCreate, TaskInDBBase, ClaimTaskRequest, FinishTaskRequest
+from server.schemas.task import TaskCreate, TaskInDBBase, ClaimTaskRequest, ClaimTaskResponse, FinishTaskRequest
 from server.crud.task import create_task, get_active_tasks_by_user_id, get_tasks_with_type, claim_task_in_db, finish_task_in_db, get_archived_tasks_by_user_id
 from server.database import get_session
-from server.schemas.user import UserResponse
-from server.dependencies import get_current_user
+from server.schemas.user import SessionUser
+from server.dependencies import get_session_user
+from server.pagination import NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from server.services.claim_buffer import claim_buffer
+from server.idempotency import IDEMPOTENCY_HEADER, run_idempotent
+from server.rate_limit import rate_limited_user
 
 router = APIRouter()
 
@@ -18,53 +22,68 @@ logger = logging.getLogger(__name__)
 @router.post("/create", response_model=TaskInDBBase)
 async def create_new_task(
     task: TaskCreate,
-    current_user: UserResponse = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    current_user: SessionUser = Depends(rate_limited_user("create_task")),
     db: AsyncSession = Depends(get_session)
 ):
-    try:
-        new_task = await create_task(db, current_user.telegram_id, task)
-        return new_task
-    except ValueError as e:
-        logging.error(f"ValueError creating task: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    except HTTPException as e:
-        # Пробрасываем HTTPException дальше
-        raise e
-    except Exception as e:
-        logging.error(f"Error creating task: {e}")
-        raise HTTPException(status_code=500, detail="Internal server error")
+    async def handler():
+        try:
+            new_task = await create_task(db, current_user.telegram_id, task)
+            return TaskInDBBase.from_orm(new_task)
+        except ValueError as e:
+            logger.error(f"ValueError creating task: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except HTTPException as e:
+            # Пробрасываем HTTPException дальше
+            raise e
+        except Exception as e:
+            logger.error(f"Error creating task: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+
+    # Повтор с тем же Idempotency-Key не списывает баллы второй раз
+    return await run_idempotent(idempotency_key, current_user.telegram_id, "task.create", task, handler)
 
 @router.get("/get_active_tasks", response_model=List[TaskInDBBase])
 async def get_user_tasks(
+    response: Response,
     task_type_id: Optional[int] = Query(None, description="Фильтр по типу задачи"),
-    current_user: UserResponse = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: SessionUser = Depends(get_session_user),
     db: AsyncSession = Depends(get_session)
 ):
     try:
-        # Получаем активные задачи пользователя
-        tasks = await get_active_tasks_by_user_id(db, current_user.telegram_id)
-
-        # Если указан task_type_id, то фильтруем задачи по типу
-        if task_type_id is not None:
-            tasks = [task for task in tasks if task.task_type_id == task_type_id]
+        # Получаем активные задачи пользователя, фильтр по типу - на стороне БД
+        tasks, next_cursor = await get_active_tasks_by_user_id(db, current_user.telegram_id, task_type_id, cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
-        logger.info(f"Fetched tasks for user {current_user.username}")
+        logger.debug("Fetched tasks for user %s", current_user.telegram_id)
         return tasks
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching tasks for user {current_user.id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch tasks")
 
 @router.get("/get_archived_tasks", response_model=List[TaskInDBBase])
 async def get_archived_tasks(
-    current_user: UserResponse = Depends(get_current_user),
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: SessionUser = Depends(get_session_user),
     db: AsyncSession = Depends(get_session)
 ):
     try:
         # Получаем архивные задачи пользователя
-        tasks = await get_archived_tasks_by_user_id(db, current_user.telegram_id)
+        tasks, next_cursor = await get_archived_tasks_by_user_id(db, current_user.telegram_id, cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
 
-        logger.info(f"Fetched archived tasks for user {current_user.username}")
+        logger.debug("Fetched archived tasks for user %s", current_user.telegram_id)
         return tasks
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching archived tasks for user {current_user.id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch archived tasks")
@@ -72,49 +91,64 @@ async def get_archived_tasks(
 
 @router.get("/get_tasks_with_type", response_model=List[TaskInDBBase])
 async def get_user_tasks(
+    response: Response,
     task_type_id: Optional[int] = Query(None, description="Фильтр по типу задачи"),
-    current_user: UserResponse = Depends(get_current_user),
+    cursor: Optional[str] = Query(None, description="Курсор из заголовка X-Next-Cursor"),
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    current_user: SessionUser = Depends(get_session_user),
     db: AsyncSession = Depends(get_session)
 ):
     try:
-        logger.info(f"1")
-        tasks = await get_tasks_with_type(db, current_user.telegram_id, task_type_id)
-        logger.info(f"Fetched tasks for user {current_user} with task_type_id={task_type_id}: {tasks}")
+        tasks, next_cursor = await get_tasks_with_type(
+            db, current_user.telegram_id, task_type_id, current_user.is_premium, cursor, limit
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+        logger.debug("Fetched %d tasks for user %s with task_type_id=%s", len(tasks), current_user.telegram_id, task_type_id)
         return tasks
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error fetching tasks for user {current_user.id}: {e}")
         raise HTTPException(status_code=500, detail="Failed to fetch tasks")
 
 
-@router.post("/claim_task")
+@router.post("/claim_task", response_model=ClaimTaskResponse)
 async def claim_task(
     task: ClaimTaskRequest,
-    current_user: UserResponse = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    current_user: SessionUser = Depends(rate_limited_user("claim_task")),
     db: AsyncSession = Depends(get_session)
 ):
-    try:
-        claimed_task = await claim_task_in_db(db, task.task_id, current_user.telegram_id)
-        return {"status": "success", "task": claimed_task}
-    except ValueError as e:
-        logging.error(f"Error claiming task: {e}")
-        raise HTTPException(status_code=400, detail=str(e))
-    except Exception as e:
-        logging.error(f"Error claiming task: {e}")
-        raise HTTPException(status_code=500, detail="Failed to claim task")
+    async def handler():
+        try:
+            # Write-behind: claim подтверждается по in-memory состоянию, в БД уходит пачкой
+            if claim_buffer.has_capacity():
+                return await claim_buffer.submit(db, task.task_id, current_user.telegram_id)
+            claimed_task = await claim_task_in_db(db, task.task_id, current_user.telegram_id)
+            return {"status": "success", "queued": False, "task_id": task.task_id, "task": TaskInDBBase.from_orm(claimed_task)}
+        except ValueError as e:
+            logger.error(f"Error claiming task: {e}")
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logger.error(f"Error claiming task: {e}")
+            raise HTTPException(status_code=500, detail="Failed to claim task")
+
+    return await run_idempotent(idempotency_key, current_user.telegram_id, "task.claim", task, handler)
 
 
 @router.post("/finish_task")
 async def finish_task(
     request: FinishTaskRequest,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: SessionUser = Depends(get_session_user),
     db: AsyncSession = Depends(get_session)
 ):
     try:
         task = await finish_task_in_db(db, request.task_id, current_user.telegram_id)
         return {"status": "success", "task": task}
     except ValueError as e:
-        logging.error(f"Error finishing task: {e}")
+        logger.error(f"Error finishing task: {e}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
-        logging.error(f"Error finishing task: {e}")
+        logger.error(f"Error finishing task: {e}")
         raise HTTPException(status_code=500, detail="Failed to finish task")
\ No newline at end of file
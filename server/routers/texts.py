@@ -0,0 +1,22 @@
+from fastapi import APIRouter, HTTPException, Request
+from typing import Dict
+import logging
+
+from server.etag import etag_response
+from server.services.text_catalog import text_catalog
+
+router = APIRouter()
+
+logger = logging.getLogger(__name__)
+
+# Полный набор текстов языка для мини-приложения; недостающие переводы уже заполнены из fallback-языка
+@router.get("/{language_code}", response_model=Dict[str, str])
+async def get_texts(language_code: str, request: Request):
+    cached = text_catalog.bundle_body(language_code)
+    if cached is None:
+        raise HTTPException(status_code=404, detail="Тексты не найдены")
+    body, etag = cached
+    response = etag_response(request, body, etag, {"Content-Language": text_catalog.resolve_language(language_code)})
+    if response.status_code == 304:
+        text_catalog.not_modified += 1
+    return response
@@ -1,20 +1,25 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from typing import List
+from typing import List, Optional
 import logging
 
 from server.database import get_session
 from server.models import WalletTransaction, User
-from server.schemas.wallet_transaction import WalletTransactionCreate, WalletTransactionUpdate, WalletTransactionOut
-from server.schemas.user import UserResponse
-from server.dependencies import get_current_user  # Функция для получения текущего пользователя
+from server.schemas.wallet_transaction import WalletTransactionCreate, WalletTransactionUpdate, WalletTransactionOut, WalletSettlementRequest, WalletSettlementResult
+from server.schemas.user import SessionUser
+from server.dependencies import get_session_user
+from server.cache import user_cache
+from server.crud.points import PointsReason, post_points
+from server.crud.wallet import points_for_amount
+from server.services.wallet_settlement import settle
+from server.idempotency import IDEMPOTENCY_HEADER, run_idempotent
+from server.pagination import paginate, NEXT_CURSOR_HEADER, DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter()
 
 # Настройка логирования
 logger = logging.getLogger(__name__)
-logging.basicConfig(level=logging.INFO)
 
 # Список ID администраторов
 ADMIN_IDS = [7154683616, 1801021065]  # Замените на реальные ID администраторов
@@ -23,39 +28,50 @@ ADMIN_IDS = [7154683616, 1801021065]  # Замените на реальные I
 @router.post("/transactions/", response_model=WalletTransactionOut, status_code=201)
 async def create_wallet_transaction(
     transaction: WalletTransactionCreate,
-    current_user: UserResponse = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(None, alias=IDEMPOTENCY_HEADER),
+    current_user: SessionUser = Depends(get_session_user),
     session: AsyncSession = Depends(get_session)
 ):
-    try:
-        # Проверяем, что пользователь создает транзакцию для себя
-        if current_user.id != transaction.user_id:
-            raise HTTPException(status_code=403, detail="Вы не можете создать транзакцию для другого пользователя")
+    async def handler():
+        try:
+            # Проверяем, что пользователь создает транзакцию для себя
+            if current_user.id != transaction.user_id:
+                raise HTTPException(status_code=403, detail="Вы не можете создать транзакцию для другого пользователя")
 
-        # Создаем новую транзакцию
-        new_transaction = WalletTransaction(
-            user_id=transaction.user_id,
-            wallet_address=transaction.wallet_address,
-            amount=transaction.amount,
-            transaction_type=transaction.transaction_type,
-            status='pending'
-        )
-        session.add(new_transaction)
-        await session.commit()
-        await session.refresh(new_transaction)
-        logger.info(f"Транзакция {new_transaction.id} создана пользователем {current_user.id}")
-        return new_transaction
-    except HTTPException as http_exc:
-        raise http_exc
-    except Exception as e:
-        logger.error(f"Ошибка при создании транзакции: {e}")
-        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+            # Создаем новую транзакцию
+            new_transaction = WalletTransaction(
+                user_id=transaction.user_id,
+                wallet_address=transaction.wallet_address,
+                amount=transaction.amount,
+                transaction_type=transaction.transaction_type,
+                status='pending'
+            )
+            session.add(new_transaction)
+            await session.flush()
+            await session.refresh(new_transaction)
+            # Ответ собирается до commit: ошибка сериализации откатывает транзакцию, а не отдаёт 500
+            # за уже записанную строку (повтор с тем же Idempotency-Key создал бы вторую)
+            response = WalletTransactionOut.model_validate(new_transaction)
+            await session.commit()
+            logger.info(f"Транзакция {new_transaction.id} создана пользователем {current_user.id}")
+            return response
+        except HTTPException as http_exc:
+            raise http_exc
+        except Exception as e:
+            logger.error(f"Ошибка при создании транзакции: {e}")
+            raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+    # Повтор с тем же Idempotency-Key не создаёт вторую транзакцию
+    return await run_idempotent(
+        idempotency_key, current_user.telegram_id, "wallet.create", transaction, handler, status_code=201
+    )
 
 # Обновление статуса транзакции (только для администраторов)
 @router.put("/transactions/{transaction_id}/", response_model=WalletTransactionOut)
 async def update_wallet_transaction(
     transaction_id: int,
     transaction_update: WalletTransactionUpdate,
-    current_user: UserResponse = Depends(get_current_user),
+    current_user: SessionUser = Depends(get_session_user),
     session: AsyncSession = Depends(get_session)
 ):
     try:
@@ -65,28 +81,27 @@ async def update_wallet_transaction(
         if not transaction:
             raise HTTPException(status_code=404, detail="Транзакция не найдена")
 
+        # Повторное проведение не начисляет баллы второй раз
+        was_completed = transaction.status == 'completed'
+
         # Обновляем поля транзакции
         for var, value in transaction_update.dict(exclude_unset=True).items():
             setattr(transaction, var, value)
 
         # Если статус обновлен на 'completed', обновляем баланс пользователя
-        if transaction_update.status == 'completed':
+        user = None
+        if transaction_update.status == 'completed' and not was_completed:
             # Получаем пользователя
             result = await session.execute(select(User).where(User.id == transaction.user_id))
             user = result.scalar_one_or_none()
             if user:
-                points = 0
-                if (transaction.amount == 3):
-                    points = 1500
-                elif (transaction.amount == 10):
-                    points = 5000
-                elif (transaction.amount == 50):
-                    points = 25000
-                user.points += int(points)
-                session.add(user)
+                points = points_for_amount(transaction.amount) or 0
+                await post_points(session, user.telegram_id, int(points), PointsReason.WALLET_DEPOSIT, transaction.id)
 
         session.add(transaction)
         await session.commit()
+        if transaction_update.status == 'completed' and user:
+            user_cache.invalidate(user.telegram_id)
         await session.refresh(transaction)
         logger.info(f"Транзакция {transaction_id} обновлена пользователем {current_user.id}")
         return transaction
@@ -96,18 +111,39 @@ async def update_wallet_transaction(
         logger.error(f"Ошибка при обновлении транзакции {transaction_id}: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
 
-# Получение всех транзакций текущего пользователя
+# Пакетное проведение транзакций (только для администраторов)
+@router.post("/transactions/settle/", response_model=List[WalletSettlementResult])
+async def settle_wallet_transactions_batch(
+    request: WalletSettlementRequest,
+    current_user: SessionUser = Depends(get_session_user)
+):
+    if current_user.telegram_id not in ADMIN_IDS:
+        raise HTTPException(status_code=403, detail="Доступ запрещен")
+    try:
+        results = await settle(request.transaction_ids, request.transaction_hashes, request.status)
+        logger.info(f"Проведено транзакций: {sum(1 for r in results if r['result'] == 'settled')} из {len(results)}")
+        return results
+    except Exception as e:
+        logger.error(f"Ошибка при пакетном проведении транзакций: {e}")
+        raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
+
+# Получение транзакций текущего пользователя (keyset-пагинация, курсор в X-Next-Cursor)
 @router.get("/transactions/", response_model=List[WalletTransactionOut])
 async def get_wallet_transactions(
-    current_user: UserResponse = Depends(get_current_user),
+    response: Response,
+    cursor: Optional[str] = Query(None),
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    current_user: SessionUser = Depends(get_session_user),
     session: AsyncSession = Depends(get_session)
 ):
     try:
-        result = await session.execute(
-            select(WalletTransaction).where(WalletTransaction.user_id == current_user.id).order_by(WalletTransaction.created_at.desc())
-        )
-        transactions = result.scalars().all()
+        query = select(WalletTransaction).where(WalletTransaction.user_id == current_user.id)
+        transactions, next_cursor = await paginate(session, query, WalletTransaction, cursor, limit)
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
         return transactions
+    except HTTPException as http_exc:
+        raise http_exc
     except Exception as e:
         logger.error(f"Ошибка при получении транзакций пользователя {current_user.id}: {e}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
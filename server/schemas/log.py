@@ -1,5 +1,8 @@
-from pydantic import BaseModel
-from typing import Optional
+from pydantic import BaseModel, root_validator, validator
+from typing import Any, List, Optional
+
+# Предел числа событий в одной пачке от фронтенда
+LOG_BATCH_MAX_EVENTS = 100
 
 class LogBase(BaseModel):
     user_id: Optional[int]
@@ -14,4 +17,32 @@ class LogInDB(LogBase):
     created_at: Optional[str] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+class FrontendLogEvent(BaseModel):
+    # Событие телеметрии мини-приложения; пользователь берётся из сессии, а не из тела
+    action: str
+    details: Optional[Any] = None
+
+    @root_validator(pre=True)
+    def wrap_legacy_payload(cls, values):
+        # Старые клиенты присылают произвольный словарь без action - сохраняем его целиком в details
+        if isinstance(values, dict) and "action" not in values:
+            return {"action": "frontend_log", "details": values}
+        return values
+
+    @validator('action')
+    def validate_action(cls, v):
+        v = v.strip()
+        if not v or len(v) > 255:
+            raise ValueError("action must be 1-255 characters")
+        return v
+
+class FrontendLogBatch(BaseModel):
+    events: List[FrontendLogEvent]
+
+    @validator('events')
+    def validate_events(cls, v):
+        if len(v) > LOG_BATCH_MAX_EVENTS:
+            raise ValueError(f"at most {LOG_BATCH_MAX_EVENTS} events per batch")
+        return v
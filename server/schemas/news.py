@@ -19,4 +19,14 @@ class NewsOut(NewsBase):
     created_at: datetime.datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class NewsSummary(BaseModel):
+    # Карточка для ленты, без content
+    id: int
+    title: str
+    description: Optional[str] = None
+    created_at: datetime.datetime
+
+    class Config:
+        from_attributes = True
@@ -1,7 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import Optional
 from datetime import datetime
 
+from server.services.reference_data import reference_data
+
 class TaskBase(BaseModel):
     task_type_id: int
     name: str
@@ -26,11 +28,31 @@ class TaskInDBBase(TaskBase):
     created_at: datetime
     updated_at: datetime
 
+    # Названия из справочников в памяти, без JOIN с task_types/task_status
+    task_type_name: Optional[str] = None
+    status_name: Optional[str] = None
+
+    @validator('task_type_name', always=True)
+    def fill_task_type_name(cls, v, values):
+        return v or reference_data.task_type_name(values.get('task_type_id'))
+
+    @validator('status_name', always=True)
+    def fill_status_name(cls, v, values):
+        return v or reference_data.status_name(values.get('status_id'))
+
     class Config:
         from_attributes = True
 
 class ClaimTaskRequest(BaseModel):
     task_id: int
 
+class ClaimTaskResponse(BaseModel):
+    status: str
+    task_id: int
+    # True - claim принят в буфер write-behind и будет записан в БД пачкой
+    queued: bool
+    # Задача после claim; при queued=True строка в БД ещё не обновлена и task не заполняется
+    task: Optional[TaskInDBBase] = None
+
 class FinishTaskRequest(BaseModel):
     task_id: int
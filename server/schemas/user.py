@@ -50,3 +50,13 @@ class UserResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+class AuthResponse(UserResponse):
+    session_token: str
+
+class SessionUser(BaseModel):
+    # Данные, которые несёт подписанный сессионный токен
+    id: int
+    telegram_id: int
+    is_premium: bool = False
+    language_code: Optional[str] = 'en'
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional
 from decimal import Decimal
 from datetime import datetime
 
@@ -39,4 +39,21 @@ class WalletTransactionOut(BaseModel):
     created_at: datetime
 
     class Config:
-        orm_mode = True
+        from_attributes = True
+
+class WalletSettlementRequest(BaseModel):
+    transaction_ids: List[int] = []
+    transaction_hashes: List[str] = []
+    status: str = 'completed'  # 'completed' или 'failed'
+
+    @validator('status')
+    def validate_status(cls, v):
+        if v not in ('completed', 'failed'):
+            raise ValueError("status must be 'completed' or 'failed'")
+        return v
+
+class WalletSettlementResult(BaseModel):
+    key: str  # id или hash из запроса
+    transaction_id: Optional[int] = None
+    result: str  # 'settled', 'already_completed', 'not_found', 'no_tier'
+    points: int = 0
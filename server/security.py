@@ -0,0 +1,160 @@
+# server/security.py
+import base64
+import hashlib
+import hmac
+import json
+import logging
+import os
+import string
+import time
+from collections import OrderedDict
+from typing import Optional
+from urllib.parse import unquote, parse_qsl
+
+from dotenv import load_dotenv
+
+from server.schemas.user import SessionUser
+
+logger = logging.getLogger(__name__)
+
+load_dotenv()
+
+BOT_TOKEN = os.getenv("BOT_TOKEN", '7379330461:AAFANy49VXwlHwhmZgt99_emw3YW1VZncIw')
+
+# Время жизни сессионного токена (секунды)
+SESSION_TTL = int(os.getenv("SESSION_TTL", "86400"))
+# Максимальное количество проверенных initData в LRU
+INIT_DATA_CACHE_SIZE = int(os.getenv("INIT_DATA_CACHE_SIZE", "4096"))
+
+# Ключи вычисляются один раз при импорте, а не на каждый запрос
+WEBAPP_SECRET_KEY = hmac.new(b"WebAppData", BOT_TOKEN.encode(), hashlib.sha256).digest()
+SESSION_SECRET_KEY = (
+    os.getenv("SESSION_SECRET", "").encode()
+    or hmac.new(b"SessionToken", BOT_TOKEN.encode(), hashlib.sha256).digest()
+)
+REFERRAL_SECRET_KEY = (
+    os.getenv("REFERRAL_SECRET", "").encode()
+    or hmac.new(b"ReferralCode", BOT_TOKEN.encode(), hashlib.sha256).digest()
+)
+
+# Реферальный код - перестановка telegram_id (сеть Фейстеля на 50 битах) в base36.
+# 36**10 > 2**50, поэтому код всегда укладывается в users.referral_code (String(10)).
+REFERRAL_CODE_LENGTH = 10
+REFERRAL_CODE_ALPHABET = string.digits + string.ascii_uppercase
+_FEISTEL_HALF_BITS = 25
+_FEISTEL_HALF_MASK = (1 << _FEISTEL_HALF_BITS) - 1
+_FEISTEL_ROUNDS = 4
+
+# hash -> (исходная строка initData, разобранные поля)
+_verified_init_data: "OrderedDict[str, tuple[str, dict]]" = OrderedDict()
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def parse_telegram_init_data(init_data: str) -> Optional[dict]:
+    """Проверяет подпись initData и возвращает его поля (без hash) или None."""
+    try:
+        parsed_data = dict(parse_qsl(unquote(init_data)))
+        received_hash = parsed_data.pop('hash', '')
+
+        cached = _verified_init_data.get(received_hash)
+        if cached is not None and cached[0] == init_data:
+            _verified_init_data.move_to_end(received_hash)
+            return cached[1]
+
+        data_check_string = '\n'.join(sorted(f"{k}={v}" for k, v in parsed_data.items()))
+        calculated_hash = hmac.new(WEBAPP_SECRET_KEY, data_check_string.encode(), hashlib.sha256).hexdigest()
+
+        if not hmac.compare_digest(calculated_hash, received_hash):
+            logger.error(f"HMAC Mismatch: {calculated_hash} vs {received_hash}")
+            return None
+
+        _verified_init_data[received_hash] = (init_data, parsed_data)
+        if len(_verified_init_data) > INIT_DATA_CACHE_SIZE:
+            _verified_init_data.popitem(last=False)
+        return parsed_data
+    except Exception as e:
+        logger.error(f"Error during Telegram data verification: {str(e)}")
+        return None
+
+
+def verify_telegram_init_data(init_data: str) -> bool:
+    return parse_telegram_init_data(init_data) is not None
+
+
+def create_session_token(user) -> str:
+    # Компактный payload: короткие ключи, без пробелов
+    payload = {
+        "i": user.id,
+        "t": user.telegram_id,
+        "p": bool(user.is_premium),
+        "l": user.language_code,
+        "e": int(time.time()) + SESSION_TTL,
+    }
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    signature = hmac.new(SESSION_SECRET_KEY, body.encode(), hashlib.sha256).digest()
+    return f"{body}.{_b64encode(signature)}"
+
+
+def decode_session_token(token: str) -> Optional[SessionUser]:
+    try:
+        body, signature = token.split(".", 1)
+        expected = hmac.new(SESSION_SECRET_KEY, body.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            return None
+
+        payload = json.loads(_b64decode(body))
+        if payload["e"] < time.time():
+            return None
+
+        return SessionUser(
+            id=payload["i"],
+            telegram_id=payload["t"],
+            is_premium=payload["p"],
+            language_code=payload["l"],
+        )
+    except (ValueError, KeyError, TypeError):
+        return None
+
+
+def _feistel_round(round_index: int, half: int) -> int:
+    digest = hmac.new(REFERRAL_SECRET_KEY, bytes([round_index]) + half.to_bytes(4, "big"), hashlib.sha256).digest()
+    return int.from_bytes(digest[:4], "big") & _FEISTEL_HALF_MASK
+
+
+def encode_referral_code(telegram_id: int) -> str:
+    if not 0 <= telegram_id < 1 << (2 * _FEISTEL_HALF_BITS):
+        raise ValueError(f"telegram_id {telegram_id} is out of referral code range")
+
+    left, right = telegram_id >> _FEISTEL_HALF_BITS, telegram_id & _FEISTEL_HALF_MASK
+    for round_index in range(_FEISTEL_ROUNDS):
+        left, right = right, left ^ _feistel_round(round_index, right)
+    value = (left << _FEISTEL_HALF_BITS) | right
+
+    chars = []
+    for _ in range(REFERRAL_CODE_LENGTH):
+        value, digit = divmod(value, 36)
+        chars.append(REFERRAL_CODE_ALPHABET[digit])
+    return ''.join(reversed(chars))
+
+
+def decode_referral_code(code: str) -> Optional[int]:
+    if len(code) != REFERRAL_CODE_LENGTH:
+        return None
+    try:
+        value = int(code, 36)
+    except ValueError:
+        return None
+    if value >> (2 * _FEISTEL_HALF_BITS):
+        return None
+
+    left, right = value >> _FEISTEL_HALF_BITS, value & _FEISTEL_HALF_MASK
+    for round_index in reversed(range(_FEISTEL_ROUNDS)):
+        left, right = right ^ _feistel_round(round_index, left), left
+    return (left << _FEISTEL_HALF_BITS) | right
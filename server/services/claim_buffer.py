@@ -0,0 +1,279 @@
+# server/services/claim_buffer.py
+import asyncio
+import logging
+import os
+import time
+from collections import Counter, deque
+from datetime import datetime
+from typing import Deque, List, NamedTuple
+
+from sqlalchemy import case, insert, select, tuple_, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from server.cache import caches, user_cache
+from server.crud.points import PointsReason, claim_reward, post_points_many
+from server.crud.task import apply_claim
+from server.database import async_session
+from server.models import ClaimDeadLetter, Task, TaskClick
+from server.services.claimed_tasks import claimed_task_index
+from server.services.task_catalog import task_catalog
+from server.services.reference_data import TaskStatusId
+
+logger = logging.getLogger(__name__)
+
+# Режим write-behind выключен по умолчанию: claim пишется в БД синхронно
+CLAIM_WRITE_BEHIND = os.getenv("CLAIM_WRITE_BEHIND", "0") == "1"
+# Интервал сброса - это и окно потери подтверждённых claim при падении процесса
+CLAIM_FLUSH_INTERVAL_MS = int(os.getenv("CLAIM_FLUSH_INTERVAL_MS", "50"))
+CLAIM_FLUSH_MAX_ITEMS = int(os.getenv("CLAIM_FLUSH_MAX_ITEMS", "500"))
+# При переполнении очереди claim выполняется синхронно
+CLAIM_QUEUE_MAX_DEPTH = int(os.getenv("CLAIM_QUEUE_MAX_DEPTH", "10000"))
+# Сколько раз claim повторяется при ошибках БД, прежде чем попасть в claim_dead_letters
+CLAIM_MAX_ATTEMPTS = int(os.getenv("CLAIM_MAX_ATTEMPTS", "5"))
+
+
+class PendingClaim(NamedTuple):
+    task_id: int
+    telegram_id: int
+    points: int
+    accepted_at: float
+    # Время подтверждения в UTC - для записи в claim_dead_letters
+    accepted_utc: datetime
+    attempts: int = 0
+
+
+class ClaimBuffer:
+    """Буфер отложенной записи claim.
+
+    ``submit`` проверяет claim по in-memory состоянию (каталог заданий и
+    индекс выполненных задач), сразу отражает его там и ставит в очередь.
+    Фоновый ``run`` раз в ``flush_interval`` или при накоплении
+    ``max_items`` записей пишет пачку одним multi-row INSERT в task_clicks,
+    двумя сгруппированными UPDATE (completed_clicks и points) и записью в
+    журнал баллов в одной транзакции. Если пачка не проходит целиком
+    (конкурентный воркер успел заполнить квоту или записать тот же клик),
+    она откатывается и применяется поштучно через apply_claim.
+
+    Claim уже подтверждён клиенту, поэтому не теряется молча: при ошибке
+    БД он повторяется на следующих сбросах (до ``max_attempts`` раз), а
+    отвергнутый (квота, дубль) или исчерпавший повторы записывается в
+    claim_dead_letters для сверки и виден в статистике.
+    """
+
+    def __init__(self, enabled: bool, flush_interval_ms: int, max_items: int, max_depth: int, max_attempts: int):
+        self.enabled = enabled
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.max_attempts = max(max_attempts, 1)
+        self._queue: Deque[PendingClaim] = deque()
+        # Claim, не применённые из-за ошибки БД, - ждут следующего сброса
+        self._retry: Deque[PendingClaim] = deque()
+        # Записи для claim_dead_letters, которые ещё не удалось сохранить
+        self._dead_letters: List[dict] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.accepted = 0
+        self.flushed = 0
+        self.batches = 0
+        self.fallbacks = 0
+        self.retried = 0
+        self.dead_lettered = 0
+        self.last_flush_ms = 0.0
+        self.max_lag_ms = 0.0
+        caches["claim_buffer"] = self
+
+    def has_capacity(self) -> bool:
+        return self.enabled and not self._stopping and len(self._queue) < self.max_depth
+
+    async def submit(self, db, task_id: int, telegram_id: int) -> dict:
+        row = task_catalog.row(task_id)
+        if row is None:
+            raise ValueError(f"Task {task_id} is not available")
+        if task_catalog.remaining[row] <= 0:
+            raise ValueError(f"Task {task_id} has no clicks left")
+
+        claimed = await claimed_task_index.get(db, telegram_id)
+        if task_id in claimed:
+            raise ValueError(f"Task {task_id} already claimed by user {telegram_id}")
+
+        points = claim_reward(int(task_catalog.rewards[row]))
+        task_catalog.record_claim(task_id)
+        claimed_task_index.record(telegram_id, task_id)
+        self._queue.append(PendingClaim(task_id, telegram_id, points, time.monotonic(), datetime.utcnow()))
+        self.accepted += 1
+        if len(self._queue) >= self.max_items:
+            self._wakeup.set()
+        # Та же схема, что и у синхронного claim; строки задачи до записи в БД нет
+        return {"status": "success", "queued": True, "task_id": task_id, "task": None}
+
+    def _take_batch(self) -> List[PendingClaim]:
+        batch = []
+        while self._queue and len(batch) < self.max_items:
+            batch.append(self._queue.popleft())
+        return batch
+
+    async def _write_batch(self, batch: List[PendingClaim]) -> bool:
+        clicks_per_task = Counter(claim.task_id for claim in batch)
+
+        async with async_session() as db:
+            try:
+                # Клик мог быть записан другим воркером - тогда пачка идёт поштучно
+                existing = await db.execute(
+                    select(TaskClick.id).where(
+                        tuple_(TaskClick.task_id, TaskClick.user_id).in_(
+                            [(claim.task_id, claim.telegram_id) for claim in batch]
+                        )
+                    ).limit(1)
+                )
+                if existing.first() is not None:
+                    return False
+
+                await db.execute(insert(TaskClick).values(
+                    [{"task_id": claim.task_id, "user_id": claim.telegram_id} for claim in batch]
+                ))
+
+                increments = case(clicks_per_task, value=Task.id)
+                result = await db.execute(
+                    update(Task)
+                    .where(
+                        Task.id.in_(list(clicks_per_task)),
+                        Task.status_id == TaskStatusId.ACTIVE,
+                        # Горячие задачи со слотами счётчика идут поштучно через apply_claim
+                        Task.counter_shards == 0,
+                        Task.completed_clicks + increments <= Task.total_clicks
+                    )
+                    .values(completed_clicks=Task.completed_clicks + increments)
+                )
+                if result.rowcount != len(clicks_per_task):
+                    await db.rollback()
+                    return False
+
+                await post_points_many(db, [
+                    (claim.telegram_id, claim.points, PointsReason.TASK_CLAIM, claim.task_id) for claim in batch
+                ])
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                logger.warning(f"Batched claim flush failed, falling back to single claims: {e}")
+                return False
+
+        for telegram_id in {claim.telegram_id for claim in batch}:
+            user_cache.invalidate(telegram_id)
+        return True
+
+    def _dead_letter(self, claim: PendingClaim, error: str, details: str) -> None:
+        self.dead_lettered += 1
+        self._dead_letters.append({
+            "task_id": claim.task_id,
+            "user_id": claim.telegram_id,
+            "points": claim.points,
+            "attempts": claim.attempts,
+            "error": error,
+            "details": details,
+            "accepted_at": claim.accepted_utc,
+        })
+        logger.error(f"Queued claim {claim.task_id} by {claim.telegram_id} moved to dead letters ({error}): {details}")
+
+    async def _apply_one_by_one(self, batch: List[PendingClaim], final: bool = False) -> None:
+        for claim in batch:
+            claim = claim._replace(attempts=claim.attempts + 1)
+            async with async_session() as db:
+                try:
+                    await apply_claim(db, claim.task_id, claim.telegram_id)
+                    self.flushed += 1
+                except ValueError as e:
+                    # Claim уже подтверждён клиенту, но применить его нельзя (квота, дубль) - повтор не поможет
+                    self._dead_letter(claim, "rejected", str(e))
+                except SQLAlchemyError as e:
+                    if final or claim.attempts >= self.max_attempts:
+                        self._dead_letter(claim, "failed", str(e))
+                    else:
+                        self.retried += 1
+                        self._retry.append(claim)
+                        logger.warning(f"Failed to apply queued claim {claim.task_id} by {claim.telegram_id}, will retry: {e}")
+
+    async def _save_dead_letters(self) -> None:
+        if not self._dead_letters:
+            return
+        rows, self._dead_letters = self._dead_letters, []
+        async with async_session() as db:
+            try:
+                await db.execute(insert(ClaimDeadLetter).values(rows))
+                await db.commit()
+            except SQLAlchemyError as e:
+                await db.rollback()
+                # Остаются в памяти (видны в stats) до следующей попытки
+                self._dead_letters = rows + self._dead_letters
+                logger.error(f"Failed to save {len(rows)} claim dead letters: {e}")
+
+    async def flush(self, final: bool = False) -> None:
+        # Повторы - раз за сброс, чтобы недоступная БД не крутила цикл вхолостую
+        if self._retry:
+            retry = list(self._retry)
+            self._retry.clear()
+            await self._apply_one_by_one(retry, final)
+
+        # Пачки пишутся строго по очереди, в порядке поступления
+        while self._queue:
+            batch = self._take_batch()
+            started = time.monotonic()
+            self.max_lag_ms = max(self.max_lag_ms, (started - batch[0].accepted_at) * 1000)
+            if await self._write_batch(batch):
+                self.flushed += len(batch)
+            else:
+                self.fallbacks += 1
+                await self._apply_one_by_one(batch, final)
+            self.batches += 1
+            self.last_flush_ms = (time.monotonic() - started) * 1000
+
+        await self._save_dead_letters()
+
+    async def run(self) -> None:
+        if not self.enabled:
+            return
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing claim buffer: {e}")
+            if self._stopping:
+                return
+
+    async def close(self, runner: "asyncio.Task") -> None:
+        # Новые claim больше не принимаются, фоновый цикл дописывает очередь и выходит.
+        # Отмена посреди пачки потеряла бы её, поэтому дожидаемся штатного завершения.
+        self._stopping = True
+        self._wakeup.set()
+        await runner
+        # Последний сброс: повторять больше некому, неприменённые claim уходят в claim_dead_letters
+        await self.flush(final=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "queue_depth": len(self._queue),
+            "max_depth": self.max_depth,
+            "flush_interval_ms": self.flush_interval * 1000,
+            "max_items": self.max_items,
+            "accepted": self.accepted,
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "fallbacks": self.fallbacks,
+            "retry_depth": len(self._retry),
+            "retried": self.retried,
+            "dead_lettered": self.dead_lettered,
+            "dead_letters_unsaved": len(self._dead_letters),
+            "last_flush_ms": round(self.last_flush_ms, 2),
+            "max_lag_ms": round(self.max_lag_ms, 2),
+        }
+
+
+claim_buffer = ClaimBuffer(
+    CLAIM_WRITE_BEHIND, CLAIM_FLUSH_INTERVAL_MS, CLAIM_FLUSH_MAX_ITEMS, CLAIM_QUEUE_MAX_DEPTH, CLAIM_MAX_ATTEMPTS
+)
@@ -0,0 +1,172 @@
+# server/services/claimed_tasks.py
+import asyncio
+import logging
+import os
+import sys
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.cache import caches
+from server.models import TaskClick
+
+logger = logging.getLogger(__name__)
+
+# Бюджет памяти на весь индекс и время жизни записи пользователя
+CLAIMED_INDEX_MAX_BYTES = int(os.getenv("CLAIMED_INDEX_MAX_BYTES", str(64 * 1024 * 1024)))
+CLAIMED_INDEX_TTL = float(os.getenv("CLAIMED_INDEX_TTL", "300"))
+# Сколько новых id копится в буфере до слияния в отсортированный массив
+_MERGE_THRESHOLD = 64
+_SET_ENTRY_BYTES = 64
+
+
+class ClaimedSet:
+    """Точное множество task_id одного пользователя.
+
+    Основная часть - отсортированный массив int32 (4 байта на задачу),
+    свежие клики копятся в маленьком set и периодически вливаются в массив.
+    """
+
+    __slots__ = ("ids", "recent", "expires_at")
+
+    def __init__(self, task_ids, expires_at: float):
+        self.ids = np.unique(np.asarray(task_ids, dtype=np.int32))
+        self.recent = set()
+        self.expires_at = expires_at
+
+    def add(self, task_id: int) -> None:
+        if task_id in self:
+            return
+        self.recent.add(task_id)
+        if len(self.recent) >= _MERGE_THRESHOLD:
+            self.ids = np.union1d(self.ids, np.fromiter(self.recent, dtype=np.int32, count=len(self.recent)))
+            self.recent.clear()
+
+    def __contains__(self, task_id: int) -> bool:
+        if task_id in self.recent:
+            return True
+        position = np.searchsorted(self.ids, task_id)
+        return position < len(self.ids) and self.ids[position] == task_id
+
+    def contains_many(self, task_ids: np.ndarray) -> np.ndarray:
+        mask = np.isin(task_ids, self.ids)
+        if self.recent:
+            mask |= np.isin(task_ids, np.fromiter(self.recent, dtype=np.int32, count=len(self.recent)))
+        return mask
+
+    def __len__(self) -> int:
+        return len(self.ids) + len(self.recent)
+
+    @property
+    def nbytes(self) -> int:
+        return self.ids.nbytes + sys.getsizeof(self.recent) + len(self.recent) * _SET_ENTRY_BYTES
+
+
+class ClaimedTaskIndex:
+    """LRU-индекс "какие задачи пользователь уже выполнил".
+
+    Множество пользователя лениво загружается из task_clicks при первом
+    обращении, дополняется в claim_task_in_db и вытесняется по LRU, когда
+    суммарный объём превышает бюджет памяти.
+    """
+
+    def __init__(self, max_bytes: int, ttl: float):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.nbytes = 0
+        self._sets: "OrderedDict[int, ClaimedSet]" = OrderedDict()
+        self._loading: Dict[int, asyncio.Future] = {}
+        self._pending: Dict[int, List[int]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        caches["claimed_tasks"] = self
+
+    def peek(self, user_id: int) -> Optional[ClaimedSet]:
+        claimed = self._sets.get(user_id)
+        if claimed is None or claimed.expires_at < time.monotonic():
+            return None
+        return claimed
+
+    async def get(self, db: AsyncSession, user_id: int) -> ClaimedSet:
+        claimed = self.peek(user_id)
+        if claimed is not None:
+            self._sets.move_to_end(user_id)
+            self.hits += 1
+            return claimed
+
+        self.misses += 1
+        loading = self._loading.get(user_id)
+        if loading is not None:
+            return await asyncio.shield(loading)
+
+        future = asyncio.get_running_loop().create_future()
+        self._loading[user_id] = future
+        self._pending[user_id] = []
+        try:
+            result = await db.execute(select(TaskClick.task_id).where(TaskClick.user_id == user_id))
+            claimed = ClaimedSet(result.scalars().all(), time.monotonic() + self.ttl)
+            # Клики, записанные пока шла загрузка
+            for task_id in self._pending[user_id]:
+                claimed.add(task_id)
+            self._store(user_id, claimed)
+            future.set_result(claimed)
+            return claimed
+        except Exception as e:
+            future.set_exception(e)
+            # Исключение уже отдано вызывающему, ожидающие получат его через future
+            future.exception()
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self._loading.pop(user_id, None)
+            self._pending.pop(user_id, None)
+
+    def _store(self, user_id: int, claimed: ClaimedSet) -> None:
+        previous = self._sets.pop(user_id, None)
+        if previous is not None:
+            self.nbytes -= previous.nbytes
+        self._sets[user_id] = claimed
+        self.nbytes += claimed.nbytes
+        while self.nbytes > self.max_bytes and len(self._sets) > 1:
+            _, evicted = self._sets.popitem(last=False)
+            self.nbytes -= evicted.nbytes
+            self.evictions += 1
+
+    def record(self, user_id: int, task_id: int) -> None:
+        if user_id in self._pending:
+            self._pending[user_id].append(task_id)
+        claimed = self._sets.get(user_id)
+        if claimed is None:
+            return
+        before = claimed.nbytes
+        claimed.add(task_id)
+        self.nbytes += claimed.nbytes - before
+
+    def invalidate(self, user_id: int) -> None:
+        claimed = self._sets.pop(user_id, None)
+        if claimed is not None:
+            self.nbytes -= claimed.nbytes
+
+    def stats(self) -> dict:
+        users = len(self._sets)
+        lookups = self.hits + self.misses
+        return {
+            "users": users,
+            "task_ids": sum(len(claimed) for claimed in self._sets.values()),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "bytes_per_user": round(self.nbytes / users, 1) if users else 0.0,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+claimed_task_index = ClaimedTaskIndex(CLAIMED_INDEX_MAX_BYTES, CLAIMED_INDEX_TTL)
@@ -0,0 +1,160 @@
+# server/services/feed_scheduler.py
+import base64
+import json
+import os
+import time
+from typing import List, Optional, Tuple
+
+import numpy as np
+from fastapi import HTTPException
+
+from server.services.task_catalog import TaskCatalog, task_catalog
+
+# Сколько заданий одного создателя может стоять в ленте подряд, прежде чем очередь перейдёт к другим
+FEED_CREATOR_CAP = int(os.getenv("FEED_CREATOR_CAP", "2"))
+# Как часто можно пересчитывать приоритетный порядок при изменениях каталога (секунды)
+FEED_RANK_REBUILD_INTERVAL = float(os.getenv("FEED_RANK_REBUILD_INTERVAL", "1"))
+# Окно, в течение которого порядок внутри одного приоритета для пользователя стабилен
+FEED_DIVERSITY_WINDOW = int(os.getenv("FEED_DIVERSITY_WINDOW", "3600"))
+
+_HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_UINT64_LIMIT = 2 ** 64
+
+
+class FeedScheduler:
+    """Ранжирование ленты поверх TaskCatalog.
+
+    Приоритетный порядок (награда за клик, затем порядок остатка кликов)
+    и границы приоритетных корзин пересчитываются только при изменении
+    каталога. На запрос остаётся отобрать доступные пользователю задания,
+    перемешать их внутри корзины детерминированно для пользователя и
+    разложить по раундам: в каждом раунде создатель получает не больше
+    FEED_CREATOR_CAP мест.
+    """
+
+    def __init__(self, catalog: TaskCatalog, creator_cap: int, rebuild_interval: float):
+        self.catalog = catalog
+        self.creator_cap = max(creator_cap, 1)
+        self.rebuild_interval = rebuild_interval
+        self._version = -1
+        self._built_at = 0.0
+        self.ranked_ids = np.zeros(0, dtype=np.int64)
+        self.ranked_creators = np.zeros(0, dtype=np.int64)
+        self.ranked_buckets = np.zeros(0, dtype=np.int64)
+
+    def _rebuild(self) -> None:
+        catalog = self.catalog
+        n = catalog.size
+        rewards = catalog.rewards[:n]
+        remaining_tiers = np.log2(np.maximum(catalog.remaining[:n], 1)).astype(np.int32)
+
+        order = np.lexsort((-remaining_tiers, -rewards))
+        self.ranked_ids = catalog.ids[:n][order]
+        self.ranked_creators = catalog.creators[:n][order]
+
+        # Номер корзины растёт при каждой смене пары (награда, порядок остатка)
+        ranked_rewards = rewards[order]
+        ranked_tiers = remaining_tiers[order]
+        changes = (np.diff(ranked_rewards) != 0) | (np.diff(ranked_tiers) != 0)
+        self.ranked_buckets = np.concatenate(([0], np.cumsum(changes))).astype(np.int64)
+
+        self._version = catalog.version
+        self._built_at = time.monotonic()
+
+    def _ensure_ranked(self) -> None:
+        if self._version == self.catalog.version:
+            return
+        if self._version < 0 or time.monotonic() - self._built_at >= self.rebuild_interval:
+            self._rebuild()
+
+    def order(self, candidate_ids: np.ndarray, seed: int) -> Tuple[np.ndarray, np.ndarray]:
+        # Возвращает задания в порядке выдачи и их ключи (раунд, корзина, jitter), по которым порядок строго возрастает
+        self._ensure_ranked()
+        positions = np.flatnonzero(np.isin(self.ranked_ids, candidate_ids))
+        if len(positions) == 0:
+            return np.zeros(0, dtype=np.int64), np.zeros((0, 3), dtype=np.uint64)
+
+        ids = self.ranked_ids[positions]
+        creators = self.ranked_creators[positions]
+        buckets = self.ranked_buckets[positions]
+
+        # Разнообразие: внутри корзины порядок зависит от пользователя и окна времени.
+        # xor и умножение на нечётное по модулю 2**64 - биекции, поэтому jitter у заданий не совпадает
+        jitter = (ids.astype(np.uint64) ^ np.uint64(seed)) * _HASH_MULTIPLIER
+        in_bucket = np.lexsort((jitter, buckets))
+        ids, creators = ids[in_bucket], creators[in_bucket]
+        buckets, jitter = buckets[in_bucket], jitter[in_bucket]
+
+        # Порядковый номер задания среди заданий того же создателя
+        by_creator = np.argsort(creators, kind="stable")
+        sorted_creators = creators[by_creator]
+        group_starts = np.flatnonzero(np.r_[True, sorted_creators[1:] != sorted_creators[:-1]])
+        group_sizes = np.diff(np.r_[group_starts, len(sorted_creators)])
+        creator_rank = np.empty(len(ids), dtype=np.int64)
+        creator_rank[by_creator] = np.arange(len(ids)) - np.repeat(group_starts, group_sizes)
+
+        # Справедливость: сначала лучшие FEED_CREATOR_CAP заданий каждого создателя, затем следующие
+        rounds = creator_rank // self.creator_cap
+        fair = np.lexsort((np.arange(len(ids)), rounds))
+        keys = np.column_stack((rounds.astype(np.uint64), buckets.astype(np.uint64), jitter))
+        return ids[fair], keys[fair]
+
+    def page(
+        self,
+        candidate_ids: np.ndarray,
+        claimed,
+        user_id: int,
+        cursor: Optional[str],
+        limit: int
+    ) -> Tuple[List[int], Optional[str]]:
+        if cursor:
+            seed, after = decode_feed_cursor(cursor)
+        else:
+            seed, after = feed_seed(user_id), None
+
+        # Порядок строится до исключения выполненных заданий: claim пользователя не сдвигает раунды остальных
+        ordered, keys = self.order(candidate_ids, seed)
+        if after is not None and len(ordered):
+            # Keyset: продолжаем строго после последнего выданного ключа, а не с числового смещения
+            rounds, buckets, jitter = keys[:, 0], keys[:, 1], keys[:, 2]
+            last_round, last_bucket, last_jitter = (np.uint64(value) for value in after)
+            later = (rounds > last_round) | ((rounds == last_round) & (
+                (buckets > last_bucket) | ((buckets == last_bucket) & (jitter > last_jitter))
+            ))
+            ordered, keys = ordered[later], keys[later]
+        if claimed is not None and len(claimed) and len(ordered):
+            fresh = ~claimed.contains_many(ordered)
+            ordered, keys = ordered[fresh], keys[fresh]
+
+        page_ids = ordered[:limit].tolist()
+        next_cursor = None
+        if len(ordered) > limit:
+            next_cursor = encode_feed_cursor(seed, [int(value) for value in keys[limit - 1]])
+        return page_ids, next_cursor
+
+
+def feed_seed(user_id: int) -> int:
+    window = int(time.time()) // FEED_DIVERSITY_WINDOW
+    return ((user_id * 0x9E3779B1) ^ (window * 0x85EBCA6B)) & 0xFFFFFFFFFFFF
+
+
+def encode_feed_cursor(seed: int, last_key: List[int]) -> str:
+    raw = json.dumps([seed, last_key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_feed_cursor(cursor: str) -> Tuple[int, Tuple[int, int, int]]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        seed, (round_, bucket, jitter) = json.loads(raw)
+        values = (int(seed), int(round_), int(bucket), int(jitter))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    # Все значения попадают в np.uint64: вне диапазона это OverflowError, то есть 500 вместо 400
+    if not all(0 <= value < _UINT64_LIMIT for value in values):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    seed, round_, bucket, jitter = values
+    return seed, (round_, bucket, jitter)
+
+
+feed_scheduler = FeedScheduler(task_catalog, FEED_CREATOR_CAP, FEED_RANK_REBUILD_INTERVAL)
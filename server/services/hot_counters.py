@@ -0,0 +1,221 @@
+# server/services/hot_counters.py
+import asyncio
+import logging
+import os
+from collections import Counter
+from typing import Dict, Iterable
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from server.cache import caches
+from server.database import async_session
+from server.models import Task, TaskClickShard
+from server.services.reference_data import TaskStatusId
+
+logger = logging.getLogger(__name__)
+
+# Сколько слотов счётчика получает горячая задача
+HOT_TASK_SHARDS = int(os.getenv("HOT_TASK_SHARDS", "16"))
+# Окно наблюдения за нагрузкой на задачу (секунды)
+HOT_TASK_WINDOW = float(os.getenv("HOT_TASK_WINDOW", "5"))
+# UPDATE счётчика дольше этого порога считается ожиданием блокировки строки задачи
+HOT_TASK_LOCK_WAIT_MS = float(os.getenv("HOT_TASK_LOCK_WAIT_MS", "20"))
+# Столько медленных claim за окно переводят задачу на шардированный счётчик
+HOT_TASK_PROMOTE_SLOW_CLAIMS = int(os.getenv("HOT_TASK_PROMOTE_SLOW_CLAIMS", "10"))
+# Меньше стольких claim за окно (по всем воркерам, прирост clicks в слотах) - окно считается холодным
+HOT_TASK_COOL_CLAIMS = int(os.getenv("HOT_TASK_COOL_CLAIMS", "10"))
+# Столько холодных окон подряд нужно, чтобы свернуть слоты обратно - защита от переключений туда-обратно
+HOT_TASK_COOL_WINDOWS = int(os.getenv("HOT_TASK_COOL_WINDOWS", "3"))
+
+
+async def fold_counter_shards(db, task_id: int) -> None:
+    # Переносит клики из слотов в tasks.completed_clicks в транзакции вызывающего.
+    # Строка задачи блокируется первой, как и в любом другом изменении задачи.
+    shards = (await db.execute(
+        select(Task.counter_shards).where(Task.id == task_id).with_for_update()
+    )).scalar_one_or_none()
+    if not shards:
+        return
+    folded = (await db.execute(
+        select(func.coalesce(func.sum(TaskClickShard.clicks), 0))
+        .where(TaskClickShard.task_id == task_id)
+        .with_for_update()
+    )).scalar_one()
+    await db.execute(
+        update(Task)
+        .where(Task.id == task_id)
+        .values(completed_clicks=Task.completed_clicks + folded, counter_shards=0)
+    )
+    await db.execute(delete(TaskClickShard).where(TaskClickShard.task_id == task_id))
+    hot_counters.forget(task_id)
+
+
+async def apply_shard_counts(db, tasks: Iterable) -> None:
+    # completed_clicks в ответах = значение в строке задачи + сумма по слотам.
+    # set_committed_value не помечает объект изменённым, сумма не попадёт в UPDATE.
+    sharded = {task.id: task for task in tasks if task.counter_shards}
+    if not sharded:
+        return
+    result = await db.execute(
+        select(TaskClickShard.task_id, func.sum(TaskClickShard.clicks))
+        .where(TaskClickShard.task_id.in_(list(sharded)))
+        .group_by(TaskClickShard.task_id)
+    )
+    for task_id, clicks in result.all():
+        task = sharded[task_id]
+        set_committed_value(task, "completed_clicks", (task.completed_clicks or 0) + int(clicks or 0))
+
+
+class HotCounterRegistry:
+    """Горячие задачи и их шардированные счётчики кликов.
+
+    Пока задача холодная, claim увеличивает tasks.completed_clicks.
+    Если за окно HOT_TASK_WINDOW набирается достаточно claim, ждавших
+    блокировку строки задачи, остаток квоты (total_clicks -
+    completed_clicks) делится между HOT_TASK_SHARDS слотами в
+    task_click_shards, и claim увеличивает случайный слот в пределах
+    его бюджета. Сумма бюджетов равна остатку квоты, поэтому total_clicks
+    не превышается. Остывшая задача сворачивается обратно в
+    completed_clicks.
+
+    Медленные claim видит только свой воркер, поэтому перевод решается по
+    ним. Остывание оценивается по общему состоянию - приросту clicks в
+    слотах за окно, одинаковому для всех воркеров, - и только после
+    HOT_TASK_COOL_WINDOWS холодных окон подряд.
+    """
+
+    def __init__(self, shards: int, window: float):
+        self.shards = max(shards, 2)
+        self.window = window
+        self.sharded: Dict[int, int] = {}
+        self._slow = Counter()
+        # Сумма clicks по слотам на прошлом обходе и число холодных окон подряд
+        self._shard_clicks: Dict[int, int] = {}
+        self._cool_windows = Counter()
+        self.promotions = 0
+        self.collapses = 0
+        caches["hot_counters"] = self
+
+    def shards_of(self, task_id: int) -> int:
+        return self.sharded.get(task_id, 0)
+
+    def mark_sharded(self, task_id: int, shards: int) -> None:
+        # Задачу мог перевести другой воркер - узнаём об этом по counter_shards
+        self.sharded[task_id] = shards
+
+    def forget(self, task_id: int) -> None:
+        self.sharded.pop(task_id, None)
+        self._shard_clicks.pop(task_id, None)
+        self._cool_windows.pop(task_id, None)
+
+    def observe(self, task_id: int, elapsed_ms: float) -> None:
+        if elapsed_ms >= HOT_TASK_LOCK_WAIT_MS:
+            self._slow[task_id] += 1
+
+    async def promote(self, task_id: int) -> None:
+        async with async_session() as db:
+            task = (await db.execute(
+                select(Task).where(Task.id == task_id, Task.status_id == TaskStatusId.ACTIVE).with_for_update()
+            )).scalar_one_or_none()
+            if task is None or task.counter_shards:
+                await db.rollback()
+                return
+            remaining = task.total_clicks - (task.completed_clicks or 0)
+            if remaining < self.shards * 2:
+                # Квота почти исчерпана - делить нечего
+                await db.rollback()
+                return
+            base, extra = divmod(remaining, self.shards)
+            await db.execute(insert(TaskClickShard).values([
+                {"task_id": task_id, "shard": shard, "budget": base + (1 if shard < extra else 0), "clicks": 0}
+                for shard in range(self.shards)
+            ]))
+            await db.execute(update(Task).where(Task.id == task_id).values(counter_shards=self.shards))
+            await db.commit()
+        self.sharded[task_id] = self.shards
+        self.promotions += 1
+        logger.info(f"Task {task_id} promoted to {self.shards} counter shards")
+
+    async def collapse(self, task_id: int) -> None:
+        async with async_session() as db:
+            await fold_counter_shards(db, task_id)
+            await db.commit()
+        self.forget(task_id)
+        self.collapses += 1
+        logger.info(f"Task {task_id} counter shards collapsed")
+
+    async def _shard_click_totals(self, task_ids) -> Dict[int, int]:
+        async with async_session() as db:
+            result = await db.execute(
+                select(TaskClickShard.task_id, func.sum(TaskClickShard.clicks))
+                .where(TaskClickShard.task_id.in_(task_ids))
+                .group_by(TaskClickShard.task_id)
+            )
+            return {task_id: int(clicks or 0) for task_id, clicks in result.all()}
+
+    async def _cooled_down(self) -> list:
+        if not self.sharded:
+            return []
+        totals = await self._shard_click_totals(list(self.sharded))
+        cooled = []
+        for task_id in list(self.sharded):
+            if task_id not in totals:
+                # Слоты уже свернул другой воркер
+                self.forget(task_id)
+                continue
+            previous = self._shard_clicks.get(task_id)
+            self._shard_clicks[task_id] = totals[task_id]
+            if previous is None or totals[task_id] < previous:
+                # Первое наблюдение или слоты пересозданы - только запоминаем точку отсчёта
+                continue
+            if totals[task_id] - previous < HOT_TASK_COOL_CLAIMS:
+                self._cool_windows[task_id] += 1
+            else:
+                self._cool_windows.pop(task_id, None)
+            if self._cool_windows[task_id] >= HOT_TASK_COOL_WINDOWS:
+                cooled.append(task_id)
+        return cooled
+
+    async def maintain(self) -> None:
+        slow = self._slow
+        self._slow = Counter()
+
+        for task_id, count in slow.items():
+            if count >= HOT_TASK_PROMOTE_SLOW_CLAIMS and task_id not in self.sharded:
+                try:
+                    await self.promote(task_id)
+                except Exception as e:
+                    logger.error(f"Error promoting task {task_id} to counter shards: {e}")
+
+        for task_id in await self._cooled_down():
+            try:
+                await self.collapse(task_id)
+            except Exception as e:
+                logger.error(f"Error collapsing counter shards of task {task_id}: {e}")
+
+    async def load(self) -> None:
+        async with async_session() as db:
+            result = await db.execute(select(Task.id, Task.counter_shards).where(Task.counter_shards > 0))
+            self.sharded = {task_id: shards for task_id, shards in result.all()}
+
+    async def maintain_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.window)
+            try:
+                await self.maintain()
+            except Exception as e:
+                logger.error(f"Error maintaining hot counters: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "sharded_tasks": len(self.sharded),
+            "shards_per_task": self.shards,
+            "cooling_tasks": sum(1 for windows in self._cool_windows.values() if windows),
+            "window": self.window,
+            "promotions": self.promotions,
+            "collapses": self.collapses,
+        }
+
+
+hot_counters = HotCounterRegistry(HOT_TASK_SHARDS, HOT_TASK_WINDOW)
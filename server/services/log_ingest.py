@@ -0,0 +1,204 @@
+# server/services/log_ingest.py
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+from collections import deque
+from typing import Any, Deque, List, NamedTuple, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError, SQLAlchemyError
+
+from server.cache import caches
+from server.database import async_session
+from server.models import Log
+
+logger = logging.getLogger(__name__)
+
+LOG_FLUSH_INTERVAL_MS = int(os.getenv("LOG_FLUSH_INTERVAL_MS", "1000"))
+LOG_FLUSH_MAX_ITEMS = int(os.getenv("LOG_FLUSH_MAX_ITEMS", "500"))
+LOG_QUEUE_MAX_DEPTH = int(os.getenv("LOG_QUEUE_MAX_DEPTH", "20000"))
+# Поведение при заполнении очереди: drop - отбрасывать новые события только когда очередь полна,
+# sample - начиная с LOG_SAMPLE_THRESHOLD заполнения принимать всё меньшую долю событий
+LOG_QUEUE_FULL_POLICY = os.getenv("LOG_QUEUE_FULL_POLICY", "sample")
+LOG_SAMPLE_THRESHOLD = float(os.getenv("LOG_SAMPLE_THRESHOLD", "0.5"))
+# Предел сериализованного details одного события (байты); длиннее - обрезается
+LOG_DETAILS_MAX_BYTES = int(os.getenv("LOG_DETAILS_MAX_BYTES", "4096"))
+
+
+class PendingLog(NamedTuple):
+    user_id: Optional[int]
+    action: str
+    details: Optional[str]
+    accepted_at: float
+
+
+class LogIngestor:
+    """Очередь записи фронтенд-логов в таблицу logs.
+
+    ``submit`` только кладёт событие в ограниченную очередь и никогда не
+    ждёт БД. Фоновый ``run`` раз в ``flush_interval`` или при накоплении
+    ``max_items`` событий пишет пачку одним multi-row INSERT. Телеметрия
+    не критична: при переполнении события отбрасываются (или сэмплируются),
+    пачка, не записанная из-за недоступной БД, не повторяется. Если пачку
+    отверг один плохой ряд (например, user_id, которого нет в users), она
+    пишется поштучно, а событие с несуществующим пользователем
+    сохраняется без user_id.
+    """
+
+    def __init__(self, flush_interval_ms: int, max_items: int, max_depth: int, policy: str,
+                 sample_threshold: float, details_max_bytes: int):
+        if policy not in ("drop", "sample"):
+            raise ValueError(f"Unknown LOG_QUEUE_FULL_POLICY: {policy}")
+        self.flush_interval = flush_interval_ms / 1000
+        self.max_items = max_items
+        self.max_depth = max_depth
+        self.policy = policy
+        self.sample_from = int(max_depth * sample_threshold)
+        self.details_max_bytes = details_max_bytes
+        self._queue: Deque[PendingLog] = deque()
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self.accepted = 0
+        self.dropped = 0
+        self.sampled_out = 0
+        self.truncated = 0
+        self.flushed = 0
+        self.failed = 0
+        self.fallbacks = 0
+        self.unlinked = 0
+        self.batches = 0
+        self.last_flush_ms = 0.0
+        caches["log_ingest"] = self
+
+    def _admit(self) -> bool:
+        depth = len(self._queue)
+        if self._stopping or depth >= self.max_depth:
+            self.dropped += 1
+            return False
+        if self.policy == "sample" and depth > self.sample_from:
+            # Доля принимаемых событий линейно падает от 1 на пороге до 0 у полной очереди
+            if random.random() >= (self.max_depth - depth) / (self.max_depth - self.sample_from):
+                self.sampled_out += 1
+                return False
+        return True
+
+    def _serialize_details(self, details: Any) -> Optional[str]:
+        if details is None:
+            return None
+        raw = details if isinstance(details, str) else json.dumps(details, ensure_ascii=False, default=str)
+        encoded = raw.encode()
+        if len(encoded) > self.details_max_bytes:
+            self.truncated += 1
+            raw = encoded[:self.details_max_bytes].decode(errors="ignore")
+        return raw
+
+    def submit(self, user_id: Optional[int], action: str, details: Any) -> bool:
+        if not self._admit():
+            return False
+        self._queue.append(PendingLog(user_id, action, self._serialize_details(details), time.monotonic()))
+        self.accepted += 1
+        if len(self._queue) >= self.max_items:
+            self._wakeup.set()
+        return True
+
+    def _take_batch(self) -> List[PendingLog]:
+        batch = []
+        while self._queue and len(batch) < self.max_items:
+            batch.append(self._queue.popleft())
+        return batch
+
+    async def _insert(self, rows: List[dict]) -> None:
+        async with async_session() as db:
+            await db.execute(insert(Log).values(rows))
+            await db.commit()
+
+    async def _write_one_by_one(self, batch: List[PendingLog]) -> None:
+        self.fallbacks += 1
+        for event in batch:
+            row = {"user_id": event.user_id, "action": event.action, "details": event.details}
+            try:
+                await self._insert([row])
+                self.flushed += 1
+                continue
+            except IntegrityError as e:
+                if row["user_id"] is None:
+                    self.failed += 1
+                    logger.warning(f"Rejected frontend log event {event.action!r}: {e}")
+                    continue
+            except SQLAlchemyError as e:
+                self.failed += 1
+                logger.warning(f"Rejected frontend log event {event.action!r}: {e}")
+                continue
+            # logs.user_id ссылается на users.id: событие полезнее сохранить без привязки, чем потерять
+            row["user_id"] = None
+            try:
+                await self._insert([row])
+                self.flushed += 1
+                self.unlinked += 1
+            except SQLAlchemyError as e:
+                self.failed += 1
+                logger.warning(f"Rejected frontend log event {event.action!r}: {e}")
+
+    async def flush(self) -> None:
+        while self._queue:
+            batch = self._take_batch()
+            started = time.monotonic()
+            try:
+                await self._insert([
+                    {"user_id": event.user_id, "action": event.action, "details": event.details}
+                    for event in batch
+                ])
+                self.flushed += len(batch)
+            except (IntegrityError, DataError) as e:
+                # Пачку отверг конкретный ряд, а не недоступная БД
+                logger.warning(f"Batched frontend log insert rejected, writing one by one: {e}")
+                await self._write_one_by_one(batch)
+            except SQLAlchemyError as e:
+                self.failed += len(batch)
+                logger.error(f"Failed to write {len(batch)} frontend log events: {e}")
+            self.batches += 1
+            self.last_flush_ms = (time.monotonic() - started) * 1000
+
+    async def run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Error flushing frontend logs: {e}")
+            if self._stopping:
+                return
+
+    async def close(self, runner: "asyncio.Task") -> None:
+        # Принятые события дописываются до остановки
+        self._stopping = True
+        self._wakeup.set()
+        await runner
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "policy": self.policy,
+            "queue_depth": len(self._queue),
+            "accepted": self.accepted,
+            "dropped": self.dropped,
+            "sampled_out": self.sampled_out,
+            "truncated": self.truncated,
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "fallbacks": self.fallbacks,
+            "unlinked": self.unlinked,
+            "batches": self.batches,
+            "last_flush_ms": round(self.last_flush_ms, 2),
+        }
+
+
+log_ingestor = LogIngestor(LOG_FLUSH_INTERVAL_MS, LOG_FLUSH_MAX_ITEMS, LOG_QUEUE_MAX_DEPTH,
+                           LOG_QUEUE_FULL_POLICY, LOG_SAMPLE_THRESHOLD, LOG_DETAILS_MAX_BYTES)
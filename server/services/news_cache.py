@@ -0,0 +1,129 @@
+# server/services/news_cache.py
+import asyncio
+import logging
+import os
+import time
+from bisect import bisect_left
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from server.database import async_session
+from server.cache import caches
+from server.etag import serialize_with_etag
+from server.models import News
+from server.pagination import DEFAULT_PAGE_SIZE, decode_cursor, encode_cursor
+from server.schemas.news import NewsOut, NewsSummary
+
+logger = logging.getLogger(__name__)
+
+# Срок жизни снимка (секунды): за это время подхватываются правки, сделанные через другие воркеры
+NEWS_CACHE_TTL = float(os.getenv("NEWS_CACHE_TTL", "300"))
+# Сколько сериализованных страниц ленты держать на один снимок
+NEWS_CACHE_MAX_PAGES = int(os.getenv("NEWS_CACHE_MAX_PAGES", "256"))
+
+# (тело ответа, ETag)
+CachedBody = Tuple[bytes, str]
+
+
+class _Snapshot:
+    # Неизменяемый снимок таблицы news: краткие карточки по возрастанию (created_at, id) и полные тела по id
+    def __init__(self, rows: List[News]):
+        rows = sorted(rows, key=lambda row: (row.created_at or datetime.min, row.id))
+        self.keys = [(row.created_at or datetime.min, row.id) for row in rows]
+        self.summaries = [NewsSummary.model_validate(row).model_dump() for row in rows]
+        self.items: Dict[int, CachedBody] = {
+            row.id: serialize_with_etag(NewsOut.model_validate(row).model_dump()) for row in rows
+        }
+        self.pages: Dict[Tuple[Optional[str], int], Tuple[bytes, str, Optional[str]]] = {}
+        self.loaded_at = time.monotonic()
+
+
+class NewsCache:
+    """In-process кэш новостей с готовыми телами ответов и ETag.
+
+    Новости меняются только админом, поэтому таблица целиком держится в
+    памяти снимком, который сбрасывается при create/update/delete и по
+    TTL. Страницы ленты сериализуются один раз на снимок; ETag - хэш тела.
+    """
+
+    def __init__(self, ttl: float, max_pages: int):
+        self.ttl = ttl
+        self.max_pages = max_pages
+        self._snapshot: Optional[_Snapshot] = None
+        # Растёт при каждой инвалидации; загрузка, начатая до неё, не сохраняет устаревший снимок
+        self._generation = 0
+        self._lock = asyncio.Lock()
+        self.hits = 0
+        self.loads = 0
+        self.invalidations = 0
+        self.not_modified = 0
+        caches["news"] = self
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._snapshot = None
+        self.invalidations += 1
+
+    def _fresh(self) -> Optional[_Snapshot]:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - snapshot.loaded_at < self.ttl:
+            return snapshot
+        return None
+
+    async def _get_snapshot(self) -> _Snapshot:
+        snapshot = self._fresh()
+        if snapshot is not None:
+            self.hits += 1
+            return snapshot
+        async with self._lock:
+            # Пока ждали блокировку, снимок мог загрузить другой запрос
+            snapshot = self._fresh()
+            if snapshot is not None:
+                self.hits += 1
+                return snapshot
+            generation = self._generation
+            async with async_session() as db:
+                rows = (await db.execute(select(News))).scalars().all()
+            snapshot = _Snapshot(rows)
+            self.loads += 1
+            if generation == self._generation:
+                self._snapshot = snapshot
+            return snapshot
+
+    async def page(self, cursor: Optional[str], limit: int = DEFAULT_PAGE_SIZE) -> Tuple[bytes, str, Optional[str]]:
+        # Лента от новых к старым, keyset-курсор тот же, что и у остальных списков.
+        # Ключ страницы - ровно те (cursor, limit), с которыми она сохраняется ниже
+        snapshot = await self._get_snapshot()
+        cached = snapshot.pages.get((cursor, limit))
+        if cached is not None:
+            return cached
+
+        end = bisect_left(snapshot.keys, decode_cursor(cursor)) if cursor else len(snapshot.keys)
+        start = max(0, end - limit)
+        next_cursor = encode_cursor(*snapshot.keys[start]) if start > 0 else None
+        body, etag = serialize_with_etag(snapshot.summaries[start:end][::-1])
+
+        if len(snapshot.pages) >= self.max_pages:
+            snapshot.pages.clear()
+        snapshot.pages[(cursor, limit)] = (body, etag, next_cursor)
+        return body, etag, next_cursor
+
+    async def item(self, news_id: int) -> Optional[CachedBody]:
+        snapshot = await self._get_snapshot()
+        return snapshot.items.get(news_id)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "items": len(snapshot.items) if snapshot else 0,
+            "pages": len(snapshot.pages) if snapshot else 0,
+            "hits": self.hits,
+            "loads": self.loads,
+            "invalidations": self.invalidations,
+            "not_modified": self.not_modified,
+        }
+
+
+news_cache = NewsCache(NEWS_CACHE_TTL, NEWS_CACHE_MAX_PAGES)
@@ -0,0 +1,125 @@
+# server/services/points_snapshots.py
+import asyncio
+import logging
+import os
+import time
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import func, insert, select, tuple_
+
+from server.cache import caches
+from server.database import async_session
+from server.models import PointsLedger, PointsSnapshot
+
+logger = logging.getLogger(__name__)
+
+# Сколько записей журнала сворачивается за одну транзакцию
+POINTS_SNAPSHOT_BATCH_SIZE = int(os.getenv("POINTS_SNAPSHOT_BATCH_SIZE", "5000"))
+# Пауза между проходами (секунды); хвост журнала для "баланса на дату" не длиннее этого окна
+POINTS_SNAPSHOT_INTERVAL = float(os.getenv("POINTS_SNAPSHOT_INTERVAL", "900"))
+# Записи моложе этого порога не сворачиваются: транзакция с меньшим id могла ещё не закоммититься
+POINTS_SNAPSHOT_LAG = int(os.getenv("POINTS_SNAPSHOT_LAG", "60"))
+
+
+class PointsSnapshotter:
+    """Периодическая свёртка журнала баллов в снапшоты балансов.
+
+    Журнал читается по первичному ключу от водяного знака (максимальный
+    ledger_id среди снапшотов). Для каждого пользователя из пачки
+    записывается новый снапшот: баланс предыдущего снапшота плюс сумма
+    его записей в пачке.
+    """
+
+    def __init__(self, batch_size: int, interval: float, lag: int):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.lag = lag
+        self.watermark: Optional[int] = None
+        self.compacted = 0
+        self.snapshots = 0
+        self.last_pass_ms = 0.0
+        caches["points_snapshots"] = self
+
+    async def _compact_batch(self) -> bool:
+        async with async_session() as db:
+            # created_at заполняет CURRENT_TIMESTAMP, поэтому отсчёт - от часов БД, а не процесса
+            cutoff = (await db.execute(select(func.now()))).scalar_one() - timedelta(seconds=self.lag)
+            if self.watermark is None:
+                self.watermark = (await db.execute(
+                    select(func.coalesce(func.max(PointsSnapshot.ledger_id), 0))
+                )).scalar_one()
+
+            rows = (await db.execute(
+                select(PointsLedger.id, PointsLedger.user_id, PointsLedger.delta, PointsLedger.created_at)
+                .where(PointsLedger.id > self.watermark)
+                .order_by(PointsLedger.id)
+                .limit(self.batch_size)
+            )).all()
+            # Берём только префикс старше cutoff, чтобы водяной знак не перепрыгнул незакоммиченный id
+            ready = []
+            for row in rows:
+                if row.created_at > cutoff:
+                    break
+                ready.append(row)
+            if not ready:
+                return False
+
+            totals = {}
+            for row in ready:
+                ledger_id, delta, created_at = totals.get(row.user_id, (0, 0, row.created_at))
+                totals[row.user_id] = (row.id, delta + row.delta, max(created_at, row.created_at))
+
+            # Предыдущий снапшот - не новее начала пачки, даже если другой воркер уже ушёл дальше
+            latest = (
+                select(PointsSnapshot.user_id, func.max(PointsSnapshot.ledger_id))
+                .where(PointsSnapshot.user_id.in_(list(totals)), PointsSnapshot.ledger_id <= self.watermark)
+                .group_by(PointsSnapshot.user_id)
+            )
+            previous = dict((await db.execute(
+                select(PointsSnapshot.user_id, PointsSnapshot.balance)
+                .where(tuple_(PointsSnapshot.user_id, PointsSnapshot.ledger_id).in_(latest))
+            )).all())
+
+            await db.execute(insert(PointsSnapshot).values([
+                {
+                    "user_id": user_id,
+                    "ledger_id": ledger_id,
+                    "balance": previous.get(user_id, 0) + delta,
+                    "created_at": created_at,
+                }
+                for user_id, (ledger_id, delta, created_at) in totals.items()
+            ]))
+            await db.commit()
+
+        self.watermark = ready[-1].id
+        self.compacted += len(ready)
+        self.snapshots += len(totals)
+        return len(ready) == self.batch_size
+
+    async def compact(self) -> None:
+        started = time.monotonic()
+        while await self._compact_batch():
+            await asyncio.sleep(0)
+        self.last_pass_ms = (time.monotonic() - started) * 1000
+
+    async def run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.compact()
+            except Exception as e:
+                # Водяной знак перечитается из БД: пачка могла не закоммититься
+                self.watermark = None
+                logger.error(f"Error compacting points ledger: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "watermark": self.watermark,
+            "compacted": self.compacted,
+            "snapshots": self.snapshots,
+            "last_pass_ms": round(self.last_pass_ms, 2),
+        }
+
+
+points_snapshotter = PointsSnapshotter(POINTS_SNAPSHOT_BATCH_SIZE, POINTS_SNAPSHOT_INTERVAL, POINTS_SNAPSHOT_LAG)
@@ -0,0 +1,121 @@
+# server/services/reference_data.py
+import asyncio
+import logging
+import os
+from types import MappingProxyType
+from typing import Dict, List, Mapping, Optional
+
+from sqlalchemy import select
+
+from server.cache import caches
+from server.database import async_session
+from server.models import Language, TaskStatus, TaskType
+
+logger = logging.getLogger(__name__)
+
+# Период перечитывания справочников (секунды); правки админа через API применяются сразу через reload()
+REFERENCE_DATA_REFRESH_INTERVAL = float(os.getenv("REFERENCE_DATA_REFRESH_INTERVAL", "300"))
+
+
+class TaskStatusId:
+    # Строки task_status, на которые опирается код
+    ACTIVE = 1
+    COMPLETED = 2
+    STOPPED = 3
+
+    # Задача больше не показывается в ленте и попадает в архив создателя
+    ARCHIVED = (COMPLETED, STOPPED)
+
+
+class TaskTypeId:
+    # Строки task_types, на которые опирается код
+    BOT = 1
+    CHANNEL_SUBSCRIPTION = 2
+
+
+class _Snapshot:
+    # Неизменяемый снимок справочников; заменяется целиком одним присваиванием
+    def __init__(self, task_statuses: Dict[int, str], task_types: Dict[int, str], languages: Dict[str, str]):
+        self.task_statuses: Mapping[int, str] = MappingProxyType(task_statuses)
+        self.task_types: Mapping[int, str] = MappingProxyType(task_types)
+        self.languages: Mapping[str, str] = MappingProxyType(languages)
+
+
+class ReferenceData:
+    """Справочники task_status, task_types и languages в памяти.
+
+    Таблицы крошечные и меняются только админом, поэтому читаются целиком
+    при старте, периодически и после правок через API. Названия статусов
+    и типов подставляются в ответы из памяти, без JOIN.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._snapshot = _Snapshot({}, {}, {})
+        self.loaded = False
+        self.reloads = 0
+        caches["reference_data"] = self
+
+    async def load(self) -> None:
+        async with async_session() as db:
+            task_statuses = dict((await db.execute(select(TaskStatus.id, TaskStatus.status))).all())
+            task_types = dict((await db.execute(select(TaskType.id, TaskType.name))).all())
+            languages = dict((await db.execute(select(Language.code, Language.name))).all())
+        self._snapshot = _Snapshot(task_statuses, task_types, languages)
+        self.loaded = True
+        self.reloads += 1
+
+        missing = [
+            status_id for status_id in (TaskStatusId.ACTIVE, TaskStatusId.COMPLETED, TaskStatusId.STOPPED)
+            if status_id not in task_statuses
+        ]
+        if missing:
+            logger.warning(f"task_status rows expected by the code are missing: {missing}")
+
+    async def reload(self) -> None:
+        # Вызывается после изменения справочников; ошибка не должна ломать сам запрос админа
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Error reloading reference data: {e}")
+
+    async def ensure_loaded(self) -> None:
+        # Для процессов без lifespan (админ-бот)
+        if not self.loaded:
+            await self.load()
+
+    async def refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.reload()
+
+    def status_name(self, status_id: Optional[int]) -> Optional[str]:
+        return self._snapshot.task_statuses.get(status_id)
+
+    def task_type_name(self, task_type_id: Optional[int]) -> Optional[str]:
+        return self._snapshot.task_types.get(task_type_id)
+
+    def is_task_type(self, task_type_id: int) -> bool:
+        # До первой загрузки (нет БД при старте) не отвергаем типы - проверку сделает внешний ключ
+        return not self.loaded or task_type_id in self._snapshot.task_types
+
+    def task_type_ids(self) -> List[int]:
+        return sorted(self._snapshot.task_types)
+
+    def language_name(self, code: Optional[str]) -> Optional[str]:
+        return self._snapshot.languages.get(code)
+
+    def is_language(self, code: str) -> bool:
+        return code in self._snapshot.languages
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        return {
+            "task_statuses": dict(snapshot.task_statuses),
+            "task_types": dict(snapshot.task_types),
+            "languages": len(snapshot.languages),
+            "reloads": self.reloads,
+        }
+
+
+reference_data = ReferenceData(REFERENCE_DATA_REFRESH_INTERVAL)
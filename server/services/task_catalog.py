@@ -0,0 +1,151 @@
+# server/services/task_catalog.py
+import asyncio
+import logging
+import os
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from server.database import async_session
+from server.models import Task
+from server.services.hot_counters import apply_shard_counts
+from server.services.reference_data import TaskStatusId
+
+logger = logging.getLogger(__name__)
+
+# Период полной перезагрузки каталога: подхватывает изменения других воркеров
+TASK_CATALOG_REFRESH_INTERVAL = float(os.getenv("TASK_CATALOG_REFRESH_INTERVAL", "30"))
+_INITIAL_CAPACITY = 1024
+
+
+class TaskCatalog:
+    """Колоночный in-memory каталог заданий, доступных для ленты.
+
+    Каждое поле хранится в отдельном numpy-массиве, строка ``i`` во всех
+    массивах описывает одно задание. Удаление - перестановка с последней
+    строкой, поэтому живые строки всегда занимают ``[0, size)``.
+    """
+
+    def __init__(self, capacity: int = _INITIAL_CAPACITY):
+        self.size = 0
+        # Растёт при каждом изменении; по нему планировщик ленты понимает, что пора пересчитать ранжирование
+        self.version = 0
+        self._rows: Dict[int, int] = {}
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int) -> None:
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        self.creators = np.zeros(capacity, dtype=np.int64)
+        self.task_types = np.zeros(capacity, dtype=np.int32)
+        self.rewards = np.zeros(capacity, dtype=np.int32)
+        self.remaining = np.zeros(capacity, dtype=np.int32)
+        self.premium_only = np.zeros(capacity, dtype=np.bool_)
+        self.statuses = np.zeros(capacity, dtype=np.int8)
+
+    def _columns(self):
+        return (self.ids, self.creators, self.task_types, self.rewards,
+                self.remaining, self.premium_only, self.statuses)
+
+    def _grow(self) -> None:
+        old_columns = self._columns()
+        self._allocate(len(self.ids) * 2)
+        for new, old in zip(self._columns(), old_columns):
+            new[:self.size] = old[:self.size]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, task_id: int) -> bool:
+        return task_id in self._rows
+
+    def row(self, task_id: int) -> Optional[int]:
+        return self._rows.get(task_id)
+
+    def upsert(self, task) -> None:
+        remaining = task.total_clicks - (task.completed_clicks or 0)
+        if task.status_id != TaskStatusId.ACTIVE or remaining <= 0:
+            self.remove(task.id)
+            return
+
+        row = self._rows.get(task.id)
+        if row is None:
+            if self.size == len(self.ids):
+                self._grow()
+            row = self.size
+            self.size += 1
+            self._rows[task.id] = row
+
+        self.ids[row] = task.id
+        self.creators[row] = task.user_id
+        self.task_types[row] = task.task_type_id
+        self.rewards[row] = task.reward_per_click
+        self.remaining[row] = remaining
+        self.premium_only[row] = bool(task.is_premium_only)
+        self.statuses[row] = task.status_id
+        self.version += 1
+
+    def remove(self, task_id: int) -> None:
+        row = self._rows.pop(task_id, None)
+        if row is None:
+            return
+        last = self.size - 1
+        if row != last:
+            for column in self._columns():
+                column[row] = column[last]
+            self._rows[int(self.ids[row])] = row
+        self.size = last
+        self.version += 1
+
+    def record_claim(self, task_id: int) -> None:
+        row = self._rows.get(task_id)
+        if row is None:
+            return
+        self.remaining[row] -= 1
+        self.version += 1
+        if self.remaining[row] <= 0:
+            self.remove(task_id)
+
+    def eligible_mask(self, user_id: int, is_premium: bool, task_type_id: Optional[int] = None) -> np.ndarray:
+        n = self.size
+        mask = self.creators[:n] != user_id
+        mask &= self.remaining[:n] > 0
+        if task_type_id is not None:
+            mask &= self.task_types[:n] == task_type_id
+        if not is_premium:
+            mask &= ~self.premium_only[:n]
+        return mask
+
+    def candidate_ids(self, user_id: int, is_premium: bool, task_type_id: Optional[int] = None) -> np.ndarray:
+        return self.ids[:self.size][self.eligible_mask(user_id, is_premium, task_type_id)]
+
+    def replace(self, tasks: List) -> None:
+        self.size = 0
+        self._rows.clear()
+        self.version += 1
+        for task in tasks:
+            self.upsert(task)
+
+    async def load(self) -> None:
+        async with async_session() as db:
+            result = await db.execute(
+                select(Task).where(
+                    Task.status_id == TaskStatusId.ACTIVE,
+                    Task.completed_clicks < Task.total_clicks
+                )
+            )
+            tasks = result.scalars().all()
+            await apply_shard_counts(db, tasks)
+            self.replace(tasks)
+        logger.info(f"Task catalog loaded: {self.size} active tasks")
+
+    async def refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(TASK_CATALOG_REFRESH_INTERVAL)
+            try:
+                await self.load()
+            except Exception as e:
+                logger.error(f"Error refreshing task catalog: {e}")
+
+
+task_catalog = TaskCatalog()
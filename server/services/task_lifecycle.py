@@ -0,0 +1,158 @@
+# server/services/task_lifecycle.py
+import asyncio
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import and_, exists, func, literal_column, or_, select, update
+
+from server.cache import caches, user_cache
+from server.database import async_session
+from server.crud.points import PointsReason, post_points_many
+from server.models import Task, TaskClick
+from server.services.reference_data import TaskStatusId
+from server.services.task_catalog import task_catalog
+
+logger = logging.getLogger(__name__)
+
+# Сколько активных задач просматривается за одну транзакцию
+TASK_SWEEP_BATCH_SIZE = int(os.getenv("TASK_SWEEP_BATCH_SIZE", "200"))
+# Пауза между пачками, чтобы не конкурировать с живыми запросами за блокировки и пул соединений
+TASK_SWEEP_PAUSE_MS = int(os.getenv("TASK_SWEEP_PAUSE_MS", "200"))
+# Пауза между полными проходами (секунды)
+TASK_SWEEP_INTERVAL = float(os.getenv("TASK_SWEEP_INTERVAL", "300"))
+# Задача без кликов дольше этого срока считается заброшенной
+TASK_STALE_DAYS = int(os.getenv("TASK_STALE_DAYS", "14"))
+# Предельный срок жизни задачи
+TASK_EXPIRE_DAYS = int(os.getenv("TASK_EXPIRE_DAYS", "60"))
+
+Cursor = Tuple[datetime, int]
+
+
+class TaskLifecycleSweeper:
+    """Фоновый перевод задач из статуса active.
+
+    Обходит активные задачи пачками по (created_at, id). Каждая пачка
+    обрабатывается в одной транзакции: набравшие total_clicks задачи
+    становятся completed, а истёкшие и заброшенные - stopped.
+    Неиспользованный резерв возвращается создателю по той же формуле,
+    что и в finish_task_in_db. Задачи с шардированным счётчиком
+    пропускаются: их сначала сворачивает hot_counters.
+    """
+
+    def __init__(self, batch_size: int, pause_ms: int, interval: float):
+        self.batch_size = batch_size
+        self.pause = pause_ms / 1000
+        self.interval = interval
+        self.passes = 0
+        self.scanned = 0
+        self.completed = 0
+        self.stopped = 0
+        self.refunded_points = 0
+        self.last_pass_ms = 0.0
+        caches["task_lifecycle"] = self
+
+    async def _sweep_batch(self, after: Optional[Cursor]) -> Optional[Cursor]:
+        # Границы считает сама БД: created_at и clicked_at заполняет CURRENT_TIMESTAMP в её часовом поясе
+        stale_cutoff = func.now() - literal_column(f"INTERVAL {int(TASK_STALE_DAYS)} DAY")
+        expire_cutoff = func.now() - literal_column(f"INTERVAL {int(TASK_EXPIRE_DAYS)} DAY")
+
+        async with async_session() as db:
+            # Страница читается только по индексу (status_id, created_at)
+            query = select(Task.id, Task.created_at).where(Task.status_id == TaskStatusId.ACTIVE)
+            if after:
+                created_at, task_id = after
+                query = query.where(or_(
+                    Task.created_at > created_at,
+                    and_(Task.created_at == created_at, Task.id > task_id)
+                ))
+            page = (await db.execute(query.order_by(Task.created_at, Task.id).limit(self.batch_size))).all()
+            if not page:
+                return None
+            self.scanned += len(page)
+
+            recent_click = exists().where(TaskClick.task_id == Task.id, TaskClick.clicked_at >= stale_cutoff)
+            result = await db.execute(
+                select(
+                    Task.id,
+                    Task.user_id,
+                    (Task.completed_clicks >= Task.total_clicks).label("is_full"),
+                    or_(
+                        Task.created_at < expire_cutoff,
+                        and_(Task.created_at < stale_cutoff, ~recent_click)
+                    ).label("is_idle"),
+                    (Task.reserved_points - Task.completed_clicks * Task.reward_per_click).label("refund"),
+                )
+                .where(
+                    Task.id.in_([row.id for row in page]),
+                    Task.status_id == TaskStatusId.ACTIVE,
+                    Task.counter_shards == 0
+                )
+                .with_for_update()
+            )
+
+            transitions = defaultdict(list)
+            refunds = []
+            for row in result.all():
+                if row.is_full:
+                    transitions[TaskStatusId.COMPLETED].append(row.id)
+                elif row.is_idle:
+                    transitions[TaskStatusId.STOPPED].append(row.id)
+                else:
+                    continue
+                refunds.append((row.user_id, int(row.refund), PointsReason.TASK_REFUND, row.id))
+
+            if transitions:
+                for status_id, task_ids in transitions.items():
+                    await db.execute(update(Task).where(Task.id.in_(task_ids)).values(status_id=status_id))
+                # Один UPDATE на пользователя, даже если у создателя несколько задач в пачке
+                await post_points_many(db, refunds)
+                await db.commit()
+
+        for task_ids in transitions.values():
+            for task_id in task_ids:
+                task_catalog.remove(task_id)
+        for telegram_id, _, _, _ in refunds:
+            user_cache.invalidate(telegram_id)
+        self.completed += len(transitions[TaskStatusId.COMPLETED])
+        self.stopped += len(transitions[TaskStatusId.STOPPED])
+        self.refunded_points += sum(delta for _, delta, _, _ in refunds)
+
+        last = page[-1]
+        return last.created_at, last.id
+
+    async def sweep(self) -> None:
+        started = time.monotonic()
+        cursor = None
+        while True:
+            cursor = await self._sweep_batch(cursor)
+            if cursor is None:
+                break
+            await asyncio.sleep(self.pause)
+        self.passes += 1
+        self.last_pass_ms = (time.monotonic() - started) * 1000
+
+    async def run_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                logger.error(f"Error sweeping task lifecycle: {e}")
+
+    def stats(self) -> dict:
+        return {
+            "batch_size": self.batch_size,
+            "passes": self.passes,
+            "scanned": self.scanned,
+            "completed": self.completed,
+            "stopped": self.stopped,
+            "refunded_points": self.refunded_points,
+            "last_pass_ms": round(self.last_pass_ms, 2),
+        }
+
+
+task_lifecycle = TaskLifecycleSweeper(TASK_SWEEP_BATCH_SIZE, TASK_SWEEP_PAUSE_MS, TASK_SWEEP_INTERVAL)
@@ -0,0 +1,149 @@
+# server/services/text_catalog.py
+import asyncio
+import logging
+import os
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+from sqlalchemy import func, select
+
+from server.cache import caches
+from server.database import async_session
+from server.etag import serialize_with_etag
+from server.models import BotText
+
+logger = logging.getLogger(__name__)
+
+# Язык, тексты которого подставляются вместо отсутствующих переводов
+TEXT_FALLBACK_LANGUAGE = os.getenv("TEXT_FALLBACK_LANGUAGE", "en")
+# Период проверки штампа версии (секунды); перезагрузка только если он изменился
+TEXT_CATALOG_REFRESH_INTERVAL = float(os.getenv("TEXT_CATALOG_REFRESH_INTERVAL", "60"))
+
+# (число строк, максимальный id, время последнего изменения)
+VersionStamp = Tuple[int, int, Optional[object]]
+
+
+class _CatalogState:
+    # Неизменяемое состояние каталога; заменяется целиком одним присваиванием
+    def __init__(self, version: Optional[VersionStamp], texts: Dict[str, Dict[str, str]], fallback: str):
+        self.version = version
+        base = texts.get(fallback, {})
+        # В каждом языке уже есть все ключи: недостающие взяты из fallback-языка
+        self.bundles: Dict[str, Mapping[str, str]] = {
+            code: MappingProxyType({**base, **language_texts}) for code, language_texts in texts.items()
+        }
+        self.bodies = {code: serialize_with_etag(dict(bundle)) for code, bundle in self.bundles.items()}
+
+
+class _KeepMissing(dict):
+    # Неизвестный плейсхолдер остаётся в тексте как есть
+    def __missing__(self, key: str) -> str:
+        return "{" + key + "}"
+
+
+class TextCatalog:
+    """In-memory каталог текстов бота и мини-приложения.
+
+    Все пары (message_key, language_code) -> text_content загружаются
+    одним запросом в неизменяемые словари по языкам. Фоновая проверка
+    дешёвым агрегатным запросом сравнивает штамп версии таблицы и при
+    изменении перечитывает её и подменяет состояние целиком, поэтому
+    читатели никогда не видят наполовину обновлённый каталог.
+    """
+
+    def __init__(self, fallback: str, refresh_interval: float):
+        self.fallback = fallback
+        self.refresh_interval = refresh_interval
+        self._state = _CatalogState(None, {}, fallback)
+        self.reloads = 0
+        self.checks = 0
+        self.misses = 0
+        self.format_errors = 0
+        self.not_modified = 0
+        caches["texts"] = self
+
+    @staticmethod
+    async def _version(db) -> VersionStamp:
+        row = (await db.execute(
+            select(func.count(BotText.id), func.coalesce(func.max(BotText.id), 0), func.max(BotText.updated_at))
+        )).one()
+        return int(row[0]), int(row[1]), row[2]
+
+    async def load(self) -> None:
+        async with async_session() as db:
+            version = await self._version(db)
+            rows = (await db.execute(
+                select(BotText.language_code, BotText.message_key, BotText.text_content)
+            )).all()
+        texts: Dict[str, Dict[str, str]] = {}
+        for language_code, message_key, text_content in rows:
+            texts.setdefault(language_code, {})[message_key] = text_content
+        self._state = _CatalogState(version, texts, self.fallback)
+        self.reloads += 1
+        logger.info(f"Text catalog loaded: {len(rows)} texts in {len(texts)} languages")
+
+    async def refresh(self) -> bool:
+        self.checks += 1
+        async with async_session() as db:
+            version = await self._version(db)
+        if version == self._state.version:
+            return False
+        await self.load()
+        return True
+
+    async def refresh_forever(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing text catalog: {e}")
+
+    def resolve_language(self, language_code: Optional[str]) -> str:
+        # "ru-RU" -> "ru"; неизвестный язык -> fallback
+        bundles = self._state.bundles
+        if language_code:
+            language_code = language_code.lower()
+            if language_code in bundles:
+                return language_code
+            base = language_code.split("-")[0]
+            if base in bundles:
+                return base
+        return self.fallback
+
+    def get(self, message_key: str, language_code: Optional[str] = None, **params) -> str:
+        bundle = self._state.bundles.get(self.resolve_language(language_code), {})
+        text_content = bundle.get(message_key)
+        if text_content is None:
+            # Ключа нет ни в языке, ни в fallback - отдаём сам ключ, чтобы пропуск был заметен
+            self.misses += 1
+            return message_key
+        if not params:
+            return text_content
+        try:
+            return text_content.format_map(_KeepMissing(params))
+        except (ValueError, IndexError, AttributeError, KeyError) as e:
+            # Текст правит админ: битый шаблон не должен ронять обработчик бота
+            self.format_errors += 1
+            logger.warning(f"Bad placeholders in text {message_key!r} ({language_code}): {e}")
+            return text_content
+
+    def bundle_body(self, language_code: Optional[str]) -> Optional[Tuple[bytes, str]]:
+        state = self._state
+        return state.bodies.get(self.resolve_language(language_code))
+
+    def stats(self) -> dict:
+        state = self._state
+        return {
+            "languages": len(state.bundles),
+            "texts": sum(len(bundle) for bundle in state.bundles.values()),
+            "version": str(state.version),
+            "reloads": self.reloads,
+            "checks": self.checks,
+            "misses": self.misses,
+            "format_errors": self.format_errors,
+            "not_modified": self.not_modified,
+        }
+
+
+text_catalog = TextCatalog(TEXT_FALLBACK_LANGUAGE, TEXT_CATALOG_REFRESH_INTERVAL)
@@ -0,0 +1,55 @@
+# python -m server.services.wallet_settlement [completed|failed] < ids.txt
+#
+# Сверка пополнений за период: на вход - id или hash транзакций, по одному
+# в строке (число считается id, остальное - hash). Транзакции проводятся
+# пачками по WALLET_SETTLEMENT_BATCH_SIZE, каждая пачка - одна транзакция БД.
+import asyncio
+import json
+import os
+import sys
+from typing import List, Sequence
+
+from server.crud.wallet import settle_wallet_transactions
+from server.database import async_session, engine
+
+WALLET_SETTLEMENT_BATCH_SIZE = int(os.getenv("WALLET_SETTLEMENT_BATCH_SIZE", "500"))
+
+
+async def settle(transaction_ids: Sequence[int], transaction_hashes: Sequence[str], status: str) -> List[dict]:
+    # Пачки ограничивают время удержания блокировок строк транзакций и пользователей
+    results = []
+    batch = WALLET_SETTLEMENT_BATCH_SIZE
+    for start in range(0, len(transaction_ids), batch):
+        async with async_session() as db:
+            results += await settle_wallet_transactions(db, transaction_ids[start:start + batch], [], status)
+    for start in range(0, len(transaction_hashes), batch):
+        async with async_session() as db:
+            results += await settle_wallet_transactions(db, [], transaction_hashes[start:start + batch], status)
+    return results
+
+
+async def _main(status: str, keys: List[str]) -> List[dict]:
+    transaction_ids = [int(key) for key in keys if key.isdigit()]
+    transaction_hashes = [key for key in keys if not key.isdigit()]
+    try:
+        return await settle(transaction_ids, transaction_hashes, status)
+    finally:
+        await engine.dispose()
+
+
+def main() -> int:
+    status = sys.argv[1] if len(sys.argv) > 1 else 'completed'
+    if status not in ('completed', 'failed'):
+        print("status must be 'completed' or 'failed'")
+        return 2
+    keys = [line.strip() for line in sys.stdin if line.strip()]
+    results = asyncio.run(_main(status, keys))
+    for result in results:
+        print(json.dumps(result))
+    settled = sum(1 for result in results if result["result"] == "settled")
+    print(f"\n{settled} of {len(results)} transactions settled", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,246 @@
+# server/static_assets.py
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import re
+from collections import Counter
+from typing import Dict, List, NamedTuple, Optional
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, PlainTextResponse, Response
+
+from server.cache import caches
+
+try:
+    import brotli
+except ImportError:  # brotli есть в requirements, но без него просто не будет br-вариантов
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.getenv("STATIC_DIR", "server/static")
+# Файлы с хэшем в имени (assetsDir сборщика) отдаются как immutable
+STATIC_HASHED_PREFIX = os.getenv("STATIC_HASHED_PREFIX", "assets/")
+# Файлы крупнее держатся на диске и отдаются через sendfile, мелкие - из памяти
+STATIC_INLINE_MAX_BYTES = int(os.getenv("STATIC_INLINE_MAX_BYTES", str(1024 * 1024)))
+# TTL index.html: короткий, чтобы новый бандл подхватывался без сброса кэша WebView
+STATIC_INDEX_MAX_AGE = int(os.getenv("STATIC_INDEX_MAX_AGE", "60"))
+# TTL прочих файлов без хэша (иконки, tonconnect-manifest.json)
+STATIC_DEFAULT_MAX_AGE = int(os.getenv("STATIC_DEFAULT_MAX_AGE", "300"))
+# Сжатый вариант хранится, только если он меньше оригинала хотя бы на столько
+_MIN_COMPRESSION_GAIN = 0.9
+
+_COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "application/xml",
+                       "application/manifest+json", "image/svg+xml", "application/wasm")
+_IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+# Критичные для первого рендера ресурсы из index.html
+_MODULE_SCRIPT = re.compile(r'<script[^>]*type="module"[^>]*src="([^"]+)"')
+_STYLESHEET = re.compile(r'<link[^>]*rel="stylesheet"[^>]*href="([^"]+)"')
+_MODULE_PRELOAD = re.compile(r'<link[^>]*rel="modulepreload"[^>]*href="([^"]+)"')
+
+
+class AssetVariant(NamedTuple):
+    # Одно представление файла: содержимое в памяти либо путь для sendfile
+    body: Optional[bytes]
+    path: Optional[str]
+    size: int
+    etag: str
+
+
+class StaticAsset(NamedTuple):
+    media_type: str
+    cache_control: str
+    # encoding ('br', 'gzip', 'identity') -> вариант
+    variants: Dict[str, AssetVariant]
+    link: Optional[str]
+
+
+def _etag(digest: str, encoding: str) -> str:
+    # У каждого представления свой сильный ETag: байты gzip и br различаются
+    suffix = "" if encoding == "identity" else f"-{encoding}"
+    return f'"{digest[:32]}{suffix}"'
+
+
+def _accepted_encodings(header: str) -> Dict[str, float]:
+    accepted = {}
+    for item in header.split(","):
+        name, _, params = item.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            accepted[name.strip().lower()] = quality
+    return accepted
+
+
+class StaticBundle:
+    """ASGI-приложение для бандла мини-приложения.
+
+    При старте обходит каталог и строит манифест: хэш содержимого, размер
+    и заранее сжатые gzip/brotli-варианты каждого файла. Запрос обслуживается
+    поиском по манифесту, без обращения к файловой системе для мелких
+    файлов. Пути без расширения отдаются index.html (маршрутизация SPA).
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._assets: Optional[Dict[str, StaticAsset]] = None
+        self.files = 0
+        self.raw_bytes = 0
+        self.compressed_bytes = Counter()
+        self.served = Counter()
+        self.not_modified = 0
+        caches["static"] = self
+
+    def load(self) -> None:
+        assets = {}
+        files = 0
+        raw_bytes = 0
+        compressed_bytes = Counter()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+                if relative.endswith((".gz", ".br")):
+                    continue
+                with open(path, "rb") as file:
+                    body = file.read()
+                assets[relative] = self._build_asset(relative, path, body)
+                files += 1
+                raw_bytes += len(body)
+                for encoding, variant in assets[relative].variants.items():
+                    if encoding != "identity":
+                        compressed_bytes[encoding] += variant.size
+
+        index = assets.get("index.html")
+        if index is not None:
+            assets["index.html"] = index._replace(link=self._preload_links(index, assets))
+
+        self._assets = assets
+        self.files = files
+        self.raw_bytes = raw_bytes
+        self.compressed_bytes = compressed_bytes
+        logger.info(f"Static bundle loaded: {files} files, {raw_bytes} bytes, compressed {dict(compressed_bytes)}")
+
+    def _build_asset(self, relative: str, path: str, body: bytes) -> StaticAsset:
+        media_type = mimetypes.guess_type(relative)[0] or "application/octet-stream"
+        if relative == "index.html":
+            cache_control = f"public, max-age={STATIC_INDEX_MAX_AGE}, must-revalidate"
+        elif relative.startswith(STATIC_HASHED_PREFIX):
+            cache_control = _IMMUTABLE_CACHE_CONTROL
+        else:
+            cache_control = f"public, max-age={STATIC_DEFAULT_MAX_AGE}"
+
+        digest = hashlib.sha256(body).hexdigest()
+        inline = len(body) <= STATIC_INLINE_MAX_BYTES
+        variants = {"identity": AssetVariant(body if inline else None, None if inline else path,
+                                             len(body), _etag(digest, "identity"))}
+        if media_type.startswith(_COMPRESSIBLE_TYPES):
+            if inline:
+                candidates = {"gzip": lambda: gzip.compress(body, compresslevel=9, mtime=0)}
+                if brotli is not None:
+                    candidates["br"] = lambda: brotli.compress(body, quality=11)
+                for encoding, compress in candidates.items():
+                    compressed = compress()
+                    if len(compressed) < len(body) * _MIN_COMPRESSION_GAIN:
+                        variants[encoding] = AssetVariant(compressed, None, len(compressed), _etag(digest, encoding))
+            else:
+                # Крупные файлы сжимает сборка: рядом лежат .gz/.br, их тоже отдаём через sendfile
+                for encoding, extension in (("gzip", ".gz"), ("br", ".br")):
+                    if os.path.exists(path + extension):
+                        size = os.path.getsize(path + extension)
+                        variants[encoding] = AssetVariant(None, path + extension, size, _etag(digest, encoding))
+        return StaticAsset(media_type, cache_control, variants, None)
+
+    def _preload_links(self, index: StaticAsset, assets: Dict[str, StaticAsset]) -> Optional[str]:
+        html = index.variants["identity"].body
+        if html is None:
+            return None
+        html = html.decode("utf-8", errors="replace")
+        links: List[str] = []
+        for pattern, rel in ((_MODULE_SCRIPT, "rel=modulepreload"),
+                             (_MODULE_PRELOAD, "rel=modulepreload"),
+                             (_STYLESHEET, "rel=preload; as=style")):
+            for href in pattern.findall(html):
+                link = f"<{href}>; {rel}"
+                # Только свои файлы из манифеста: внешние скрипты (telegram-web-app.js) не трогаем
+                if href.lstrip("/") in assets and link not in links:
+                    links.append(link)
+        return ", ".join(links) or None
+
+    def _resolve(self, path: str) -> Optional[StaticAsset]:
+        relative = path.lstrip("/")
+        if relative == "" or relative.endswith("/"):
+            relative += "index.html"
+        asset = self._assets.get(relative)
+        if asset is None and "." not in relative.rsplit("/", 1)[-1] and not relative.startswith("api/"):
+            asset = self._assets.get("index.html")
+        return asset
+
+    def _choose(self, asset: StaticAsset, accept_encoding: str) -> str:
+        if len(asset.variants) == 1:
+            return "identity"
+        accepted = _accepted_encodings(accept_encoding)
+        for encoding in ("br", "gzip"):
+            if encoding in asset.variants and accepted.get(encoding, accepted.get("*", 0)) > 0:
+                return encoding
+        return "identity"
+
+    async def __call__(self, scope, receive, send) -> None:
+        if self._assets is None:
+            self.load()
+        request = Request(scope, receive)
+        if request.method not in ("GET", "HEAD"):
+            response = PlainTextResponse("Method Not Allowed", status_code=405, headers={"Allow": "GET, HEAD"})
+            await response(scope, receive, send)
+            return
+
+        asset = self._resolve(scope["path"])
+        if asset is None:
+            await PlainTextResponse("Not Found", status_code=404)(scope, receive, send)
+            return
+
+        encoding = self._choose(asset, request.headers.get("accept-encoding", ""))
+        variant = asset.variants[encoding]
+        headers = {"ETag": variant.etag, "Cache-Control": asset.cache_control}
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        if asset.link:
+            headers["Link"] = asset.link
+
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and variant.etag in [tag.strip() for tag in if_none_match.split(",")]:
+            self.not_modified += 1
+            await Response(status_code=304, headers=headers)(scope, receive, send)
+            return
+
+        self.served[encoding] += 1
+        if variant.body is not None:
+            headers["Content-Length"] = str(variant.size)
+            body = b"" if request.method == "HEAD" else variant.body
+            response = Response(body, media_type=asset.media_type, headers=headers)
+        else:
+            response = FileResponse(variant.path, media_type=asset.media_type, headers=headers,
+                                    method=request.method)
+        await response(scope, receive, send)
+
+    def stats(self) -> dict:
+        return {
+            "files": self.files,
+            "raw_bytes": self.raw_bytes,
+            "compressed_bytes": dict(self.compressed_bytes),
+            "served": dict(self.served),
+            "not_modified": self.not_modified,
+        }
+
+
+static_bundle = StaticBundle(STATIC_DIR)
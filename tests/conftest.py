@@ -0,0 +1,63 @@
+# tests/conftest.py
+import pytest
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy import BigInteger
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.pool import StaticPool
+
+from server.database import async_session
+from server.dependencies import get_session_user
+from server.idempotency import idempotency_cache
+from server.models import Base, User
+from server.schemas.user import SessionUser
+
+
+# В SQLite автоинкремент есть только у INTEGER PRIMARY KEY
+@compiles(BigInteger, "sqlite")
+def _bigint_as_integer(type_, compiler, **kw):
+    return "INTEGER"
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def db_engine():
+    # БД в памяти вместо MySQL; общий sessionmaker перенаправляется на неё на время теста
+    engine = create_async_engine("sqlite+aiosqlite://", poolclass=StaticPool)
+    # bot_texts объявляет MySQL-специфичный ON UPDATE CURRENT_TIMESTAMP, в тестах эта таблица не нужна
+    tables = [table for table in Base.metadata.sorted_tables if table.name != "bot_texts"]
+    previous_bind = async_session.kw["bind"]
+    async_session.configure(bind=engine)
+    idempotency_cache.clear()
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all, tables=tables)
+        yield engine
+    finally:
+        async_session.configure(bind=previous_bind)
+        await engine.dispose()
+
+
+@pytest.fixture
+async def user(db_engine):
+    async with async_session() as db:
+        db.add(User(id=1, telegram_id=1001, username="alice", points=0, referral_code="ALICE00001"))
+        await db.commit()
+    return SessionUser(id=1, telegram_id=1001, is_premium=False, language_code="en")
+
+
+@pytest.fixture
+async def client(user):
+    # Без lifespan: фоновые задачи и загрузка кэшей при старте обращаются к MySQL
+    from server.main import app
+
+    app.dependency_overrides[get_session_user] = lambda: user
+    try:
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as http:
+            yield http
+    finally:
+        app.dependency_overrides.pop(get_session_user, None)
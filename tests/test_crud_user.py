@@ -0,0 +1,86 @@
+# tests/test_crud_user.py
+from types import SimpleNamespace
+
+import pytest
+
+import server.crud.user as crud_user
+from server.crud.user import get_user_by_referral_code, signup_user
+from server.database import async_session
+from server.models import Referral, User
+from server.schemas.user import UserCreate
+from server.security import encode_referral_code
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_referral_code_resolves_by_telegram_id(db_engine):
+    code = encode_referral_code(2002)
+    async with async_session() as db:
+        db.add(User(id=2, telegram_id=2002, referral_code=code))
+        await db.commit()
+        assert (await get_user_by_referral_code(db, code.lower())).id == 2
+
+
+async def test_referral_code_falls_back_to_stored_column(db_engine):
+    # Код разбирается в telegram_id 3003, но сохранён у другого пользователя (выдан со старым секретом)
+    code = encode_referral_code(3003)
+    async with async_session() as db:
+        db.add(User(id=3, telegram_id=4004, referral_code=code))
+        await db.commit()
+        assert (await get_user_by_referral_code(db, code)).id == 3
+
+
+def _table_name(stmt):
+    # У insert() - таблица, у select() её нет
+    table = getattr(stmt, "table", None)
+    return table.name if table is not None else None
+
+
+class _SignupSession:
+    # INSERT IGNORE - синтаксис MySQL, в SQLite его не выполнить: сессия отвечает rowcount как MySQL
+    def __init__(self, user_rowcount):
+        self.user_rowcount = user_rowcount
+        self.statements = []
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        table = _table_name(stmt)
+        if table == User.__tablename__:
+            return SimpleNamespace(rowcount=self.user_rowcount, lastrowid=5 if self.user_rowcount else 0)
+        if table == Referral.__tablename__:
+            return SimpleNamespace(rowcount=1)
+        return SimpleNamespace(scalar_one=lambda: User(id=5, telegram_id=5005))
+
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def paid_bonuses(monkeypatch):
+    paid = []
+
+    async def fake_post_points(db, telegram_id, amount, reason, ref_id):
+        paid.append((telegram_id, amount))
+
+    monkeypatch.setattr(crud_user, "post_points", fake_post_points)
+    return paid
+
+
+async def test_signup_pays_referral_bonus_once(paid_bonuses):
+    referrer = User(id=1, telegram_id=1001)
+    db = _SignupSession(user_rowcount=1)
+    assert (await signup_user(db, UserCreate(telegram_id=5005), referrer)).id == 5
+    assert paid_bonuses == [(1001, crud_user.REFERRAL_BONUS)]
+    assert any(_table_name(stmt) == Referral.__tablename__ for stmt in db.statements)
+
+
+async def test_duplicate_signup_skips_referral_and_bonus(paid_bonuses):
+    # Повторная регистрация (вторая вкладка): INSERT IGNORE вернул 0, пользователь уже есть
+    referrer = User(id=1, telegram_id=1001)
+    db = _SignupSession(user_rowcount=0)
+    assert (await signup_user(db, UserCreate(telegram_id=5005), referrer)).id == 5
+    assert paid_bonuses == []
+    assert not any(_table_name(stmt) == Referral.__tablename__ for stmt in db.statements)
@@ -0,0 +1,30 @@
+# tests/test_feed_scheduler.py
+import base64
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from server.services.feed_scheduler import decode_feed_cursor, encode_feed_cursor
+
+
+def _cursor(payload) -> str:
+    return base64.urlsafe_b64encode(json.dumps(payload).encode()).rstrip(b"=").decode()
+
+
+def test_cursor_round_trip():
+    assert decode_feed_cursor(encode_feed_cursor(7, [0, 3, 2 ** 64 - 1])) == (7, (0, 3, 2 ** 64 - 1))
+
+
+@pytest.mark.parametrize("payload", [
+    [-1, [0, 0, 0]],
+    [1, [0, -5, 0]],
+    [1, [0, 0, 2 ** 64]],
+    [2 ** 70, [0, 0, 0]],
+    [1, [0, 0]],
+    "not a cursor",
+])
+def test_tampered_cursor_is_rejected(payload):
+    with pytest.raises(HTTPException) as error:
+        decode_feed_cursor(_cursor(payload))
+    assert error.value.status_code == 400
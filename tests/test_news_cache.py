@@ -0,0 +1,44 @@
+# tests/test_news_cache.py
+from datetime import datetime, timedelta
+
+import pytest
+
+from server.database import async_session
+from server.models import News
+from server.services.news_cache import news_cache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def news(db_engine):
+    started = datetime(2024, 1, 1)
+    async with async_session() as db:
+        db.add_all([
+            News(id=index, title=f"News {index}", description="short", content="full text",
+                 created_at=started + timedelta(hours=index))
+            for index in range(1, 4)
+        ])
+        await db.commit()
+    news_cache.invalidate()
+    yield
+    news_cache.invalidate()
+
+
+async def test_snapshot_serves_feed_and_items(client, news):
+    feed = await client.get("/api/news/get_all_news/")
+    assert feed.status_code == 200
+    assert [item["id"] for item in feed.json()] == [3, 2, 1]
+    assert "content" not in feed.json()[0]
+
+    item = await client.get("/api/news/get_news/2")
+    assert item.status_code == 200
+    assert item.json()["content"] == "full text"
+
+
+async def test_default_page_is_served_from_cache(news):
+    first = await news_cache.page(None)
+    second = await news_cache.page(None)
+    # Тело из кэша - тот же объект, а не заново сериализованная лента
+    assert second[0] is first[0]
+    assert len(news_cache._snapshot.pages) == 1
@@ -0,0 +1,38 @@
+# tests/test_pagination.py
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+
+from server.database import async_session
+from server.models import WalletTransaction
+from server.pagination import DEFAULT_PAGE_SIZE, NEXT_CURSOR_HEADER
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def transactions(user):
+    started = datetime(2024, 1, 1)
+    async with async_session() as db:
+        db.add_all([
+            WalletTransaction(user_id=user.id, wallet_address="EQ-test", amount=Decimal("1"),
+                              transaction_type="deposit", status="pending",
+                              created_at=started + timedelta(minutes=index))
+            for index in range(DEFAULT_PAGE_SIZE + 5)
+        ])
+        await db.commit()
+
+
+async def test_list_without_limit_is_paged(client, transactions):
+    first = await client.get("/api/wallet/transactions/")
+    assert first.status_code == 200
+    assert len(first.json()) == DEFAULT_PAGE_SIZE
+    cursor = first.headers[NEXT_CURSOR_HEADER]
+
+    second = await client.get("/api/wallet/transactions/", params={"cursor": cursor})
+    assert len(second.json()) == 5
+    assert NEXT_CURSOR_HEADER not in second.headers
+
+    seen = [item["id"] for item in first.json() + second.json()]
+    assert len(set(seen)) == DEFAULT_PAGE_SIZE + 5
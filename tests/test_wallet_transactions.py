@@ -0,0 +1,31 @@
+# tests/test_wallet_transactions.py
+import pytest
+from sqlalchemy import func, select
+
+from server.database import async_session
+from server.idempotency import IDEMPOTENCY_HEADER, IDEMPOTENT_REPLAY_HEADER
+from server.models import WalletTransaction
+
+pytestmark = pytest.mark.anyio
+
+PAYLOAD = {"user_id": 1, "wallet_address": "EQ-test", "amount": "1.5", "transaction_type": "deposit"}
+
+
+async def _count_transactions() -> int:
+    async with async_session() as db:
+        return (await db.execute(select(func.count()).select_from(WalletTransaction))).scalar_one()
+
+
+async def test_create_then_retry_returns_the_same_transaction(client):
+    headers = {IDEMPOTENCY_HEADER: "wallet-create-1"}
+
+    first = await client.post("/api/wallet/transactions/", json=PAYLOAD, headers=headers)
+    assert first.status_code == 201
+    assert first.json()["status"] == "pending"
+
+    retry = await client.post("/api/wallet/transactions/", json=PAYLOAD, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers[IDEMPOTENT_REPLAY_HEADER] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+
+    assert await _count_transactions() == 1